@@ -0,0 +1,140 @@
+#
+# Copyright Cloudlab URV 2020
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+# Modules imported by each entry point of cloudbutton
+ENTRY_POINTS = {
+    'client': 'cloudbutton.engine.executor',
+    'multiprocessing': 'cloudbutton.multiprocessing',
+    'cloud_proxy': 'cloudbutton.cloud_proxy',
+    'handler': 'cloudbutton.engine.agent.handler'
+}
+
+# Cumulative import time budget of each entry point, in milliseconds
+IMPORT_TIME_BUDGETS = {
+    'client': 250,
+    'multiprocessing': 60,
+    'cloud_proxy': 250,
+    'handler': 250
+}
+
+# Modules that no entry point may import, they are imported on first use
+DEFERRED_MODULES = ['pika', 'numpy', 'pandas', 'tqdm', 'matplotlib', 'pylab', 'seaborn',
+                    'requests', 'distutils', 'asyncio', 'cloudbutton.engine.plots',
+                    'cloudbutton.engine.compute.backends', 'cloudbutton.engine.storage.backends']
+
+DEFAULT_RUNS = 5
+DEFAULT_TOLERANCE = 0.2
+
+
+def measure_import_time(module, runs=DEFAULT_RUNS):
+    """
+    Imports a module in fresh interpreters with 'python -X importtime'.
+    :param module: name of the module to import
+    :param runs: number of interpreters, the fastest one is kept
+    :return: cumulative import time of the module in ms, and the modules it imported
+    """
+    env = os.environ.copy()
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_dir, env.get('PYTHONPATH')]))
+
+    import_time = None
+    imported_modules = set()
+    for _ in range(runs):
+        cmd = [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)]
+        proc = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, universal_newlines=True)
+        if proc.returncode != 0:
+            raise ImportError('Unable to import {}:\n{}'.format(module, proc.stderr))
+
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if not cumulative.strip().isdigit():
+                # Header line
+                continue
+            name = name.strip()
+            imported_modules.add(name)
+            if name == module:
+                run_time = int(cumulative) / 1000
+                import_time = run_time if import_time is None else min(import_time, run_time)
+
+    return import_time, imported_modules
+
+
+def run_importtime_benchmark(runs=DEFAULT_RUNS, tolerance=DEFAULT_TOLERANCE,
+                             baseline=None, save_baseline=None):
+    """
+    Measures the import time of the cloudbutton entry points and checks that
+    they do not exceed their budget, or their baseline plus the tolerance.
+    :param runs: number of measures of each entry point
+    :param tolerance: allowed regression over the baseline, as a fraction of it
+    :param baseline: path of a json file with the import time of each entry point
+    :param save_baseline: path of the json file where the measured times are saved
+    :return: True if no entry point regressed
+    """
+    limits = dict(IMPORT_TIME_BUDGETS)
+    if baseline:
+        with open(baseline) as f:
+            limits.update({entry_point: import_time * (1 + tolerance)
+                           for entry_point, import_time in json.load(f).items()})
+
+    passed = True
+    import_times = {}
+    for entry_point, module in ENTRY_POINTS.items():
+        import_time, imported_modules = measure_import_time(module, runs)
+        import_times[entry_point] = import_time
+        eager_modules = sorted(name for name in imported_modules
+                               if any(name == deferred or name.startswith(deferred + '.')
+                                      for deferred in DEFERRED_MODULES))
+        regressed = import_time > limits[entry_point]
+        passed = passed and not regressed and not eager_modules
+
+        print('{:<16} {:>8.1f} ms  (limit {:.1f} ms)  {}'
+              .format(entry_point, import_time, limits[entry_point],
+                      'REGRESSION' if regressed else 'ok'))
+        if eager_modules:
+            print('{:<16} imports deferred modules: {}'.format('', ', '.join(eager_modules)))
+
+    if save_baseline:
+        with open(save_baseline, 'w') as f:
+            json.dump(import_times, f, indent=4)
+
+    return passed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmark the import time of Cloudbutton's entry points",
+                                     usage='python -m cloudbutton.benchmarks [-r RUNS] [-b BASELINE] [-s BASELINE]')
+    parser.add_argument('-r', '--runs', type=int, metavar='', default=DEFAULT_RUNS,
+                        help='number of measures of each entry point')
+    parser.add_argument('-t', '--tolerance', type=float, metavar='', default=DEFAULT_TOLERANCE,
+                        help='allowed regression over the baseline, as a fraction of it')
+    parser.add_argument('-b', '--baseline', metavar='', default=None,
+                        help='json file with the import time of each entry point')
+    parser.add_argument('-s', '--save-baseline', metavar='', default=None,
+                        help='save the measured import times to a json file')
+    args = parser.parse_args()
+
+    if not run_importtime_benchmark(args.runs, args.tolerance, args.baseline, args.save_baseline):
+        sys.exit(1)
@@ -22,6 +22,7 @@ import cloudbutton.engine as eng
 from cloudbutton.cli.runtime.cli import runtime
 from cloudbutton.cli import clean_all
 from cloudbutton.tests import print_help, run_tests
+from cloudbutton.benchmarks import run_importtime_benchmark, DEFAULT_RUNS, DEFAULT_TOLERANCE
 
 
 def set_debug(debug):
@@ -72,6 +73,16 @@ def verify(test, config, debug):
         run_tests(test, config)
 
 
+@cli.command('importtime')
+@click.option('--runs', '-r', default=DEFAULT_RUNS, help='number of measures of each entry point')
+@click.option('--tolerance', '-t', default=DEFAULT_TOLERANCE, help='allowed regression over the baseline')
+@click.option('--baseline', '-b', default=None, help='json file with the import time of each entry point')
+@click.option('--save-baseline', '-s', default=None, help='save the measured import times to a json file')
+def importtime(runs, tolerance, baseline, save_baseline):
+    if not run_importtime_benchmark(runs, tolerance, baseline, save_baseline):
+        raise click.ClickException('The import time of cloudbutton regressed')
+
+
 cli.add_command(runtime)
 
 if __name__ == '__main__':
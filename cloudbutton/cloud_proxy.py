@@ -54,8 +54,21 @@ class CloudStorage(InternalStorage):
 
 class CloudFileProxy:
     def __init__(self, cloud_storage=None):
-        self._storage = cloud_storage or CloudStorage()
-        self.path = _path(self._storage)
+        self._cloud_storage = cloud_storage
+        self._path_proxy = None
+
+    @property
+    def _storage(self):
+        # Created on first use, so importing this module builds no client
+        if self._cloud_storage is None:
+            self._cloud_storage = CloudStorage()
+        return self._cloud_storage
+
+    @property
+    def path(self):
+        if self._path_proxy is None:
+            self._path_proxy = _path(self._storage)
+        return self._path_proxy
 
     def __getattr__(self, name):
         # we only reach here if the attr is not defined
@@ -164,9 +177,9 @@ def cloud_open(filename, mode='r', cloud_storage=None):
     if 'r' in mode:
         if 'b' in mode:
             # we could get_data(stream=True) but some streams are not seekable
-            return io.BytesIO(storage.get_data(filename))
+            return io.BytesIO(storage.get_cached_data(filename))
         else:
-            return io.StringIO(storage.get_data(filename).decode())
+            return io.StringIO(storage.get_cached_data(filename).decode())
 
     if 'w' in mode:
         action = partial(storage.put_data, filename)
@@ -177,18 +190,12 @@ def cloud_open(filename, mode='r', cloud_storage=None):
 
 
 if not is_cloudbutton_function():
-    try:
-        _storage = CloudStorage()
-    except FileNotFoundError:
-        # should never happen unless we are using
-        # this module classes for other purposes
-        os = None
-        open = None
-    else:
-        os = CloudFileProxy(_storage)
-        open = partial(cloud_open, cloud_storage=_storage)
+    os = CloudFileProxy()
+
+    def open(filename, mode='r'):
+        return cloud_open(filename, mode=mode, cloud_storage=os._storage)
 else:
     # should never be used unless we explicitly import
     # inside a function, which is not a good practice
     os = None
-    open = None
\ No newline at end of file
+    open = None
@@ -17,8 +17,10 @@
 #
 
 import os
+import copy
 import json
 import tempfile
+import threading
 import importlib
 import logging.config
 from cloudbutton.version import __version__
@@ -38,6 +40,7 @@ JOBS_PREFIX = "cloudbutton.jobs"
 TEMP_PREFIX = "cloudbutton.jobs/tmp"
 LOGS_PREFIX = "cloudbutton.logs"
 RUNTIMES_PREFIX = "cloudbutton.runtimes"
+SORT_PREFIX = "cloudbutton.sort"
 
 
 MAX_AGG_DATA_SIZE = 4  # 4MiB
@@ -47,6 +50,9 @@ CONFIG_DIR = os.path.join(HOME_DIR, '.cloudbutton')
 CONFIG_FILE = os.path.join(CONFIG_DIR, 'config')
 CACHE_DIR = os.path.join(CONFIG_DIR, 'cache')
 
+_config_cache = {'source': None, 'configs': {}}
+_config_cache_lock = threading.Lock()
+
 
 def load_yaml_config(config_filename):
     import yaml
@@ -93,24 +99,59 @@ def get_default_config_filename():
     return config_filename
 
 
+def _default_config_source():
+    """
+    Returns the identifier of the default configuration, which changes when
+    the configuration changes, and a function that loads it
+    """
+    if 'CLOUDBUTTON_CONFIG' in os.environ:
+        config_json = os.environ['CLOUDBUTTON_CONFIG']
+        return ('env', config_json), lambda: json.loads(config_json)
+
+    config_filename = get_default_config_filename()
+    if config_filename is None:
+        raise ValueError("could not find configuration file")
+    stat = os.stat(config_filename)
+    source = ('file', config_filename, stat.st_mtime_ns, stat.st_size)
+    return source, lambda: load_yaml_config(config_filename)
+
+
 def default_config(config_data=None, config_overwrite={}):
     """
     First checks .cloudbutton_config
     then checks CLOUDBUTTON_CONFIG_FILE environment variable
     then ~/.cloudbutton_config
+
+    The default configuration is loaded and resolved once per process, and
+    again only when the configuration file is modified. Every call returns
+    its own copy, so callers can modify it.
     """
     logger.info('Cloudbutton toolkit v{}'.format(__version__))
     logger.debug("Loading configuration")
 
-    if not config_data:
-        if 'CLOUDBUTTON_CONFIG' in os.environ:
-            config_data = json.loads(os.environ.get('CLOUDBUTTON_CONFIG'))
+    if config_data:
+        return _resolve_config(config_data, config_overwrite)
+
+    source, load_config_data = _default_config_source()
+    overwrite_key = json.dumps(config_overwrite, sort_keys=True, default=str)
+
+    with _config_cache_lock:
+        if _config_cache['source'] != source:
+            _config_cache['source'] = source
+            _config_cache['configs'] = {}
+        configs = _config_cache['configs']
+        if overwrite_key not in configs:
+            configs[overwrite_key] = _resolve_config(load_config_data(), config_overwrite)
         else:
-            config_filename = get_default_config_filename()
-            if config_filename is None:
-                raise ValueError("could not find configuration file")
-            config_data = load_yaml_config(config_filename)
+            logger.debug("Using the cached configuration")
+        return copy.deepcopy(configs[overwrite_key])
 
+
+def _resolve_config(config_data, config_overwrite):
+    """
+    Validates the configuration and completes it with the defaults of the
+    compute and storage backends
+    """
     if 'cloudbutton' not in config_data:
         raise Exception("cloudbutton section is mandatory in configuration")
 
@@ -154,6 +195,8 @@ def extract_storage_config(config):
     storage_config[sb]['user_agent'] = 'cloudbutton/{}'.format(__version__)
     if 'storage_backend_region' in config['cloudbutton']:
         storage_config[sb]['region'] = config['cloudbutton']['storage_backend_region']
+    if 'storage_cache' in config['cloudbutton']:
+        storage_config['cache'] = config['cloudbutton']['storage_cache']
 
     return storage_config
 
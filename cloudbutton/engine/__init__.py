@@ -15,7 +15,14 @@
 # limitations under the License.
 #
 
-from .executor import FunctionExecutor
+
+def __getattr__(name):
+    # The executor is imported on first use, so that importing any engine
+    # module (e.g. from the function handler) does not import the whole client
+    if name == 'FunctionExecutor':
+        from .executor import FunctionExecutor
+        return FunctionExecutor
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
 
 
 def ibm_cf_executor(config=None, runtime=None, runtime_memory=None,
@@ -25,6 +32,7 @@ def ibm_cf_executor(config=None, runtime=None, runtime_memory=None,
     """
     Function executor for IBM Cloud Functions
     """
+    from .executor import FunctionExecutor
     compute_backend = 'ibm_cf'
     return FunctionExecutor(
         config=config, runtime=runtime, runtime_memory=runtime_memory,
@@ -44,6 +52,7 @@ def knative_executor(config=None, runtime=None, runtime_memory=None, workers=Non
     """
     Function executor for Knative
     """
+    from .executor import FunctionExecutor
     compute_backend = 'knative'
     return FunctionExecutor(
         config=config, runtime=runtime, runtime_memory=runtime_memory,
@@ -64,6 +73,7 @@ def openwhisk_executor(config=None, runtime=None, runtime_memory=None,
     """
     Function executor for OpenWhisk
     """
+    from .executor import FunctionExecutor
     compute_backend = 'openwhisk'
     return FunctionExecutor(
         config=config, runtime=runtime, runtime_memory=runtime_memory,
@@ -83,6 +93,7 @@ def function_executor(config=None, runtime=None, runtime_memory=None,
     """
     Generic function executor
     """
+    from .executor import FunctionExecutor
     return FunctionExecutor(
         config=config, runtime=runtime,
         runtime_memory=runtime_memory,
@@ -103,6 +114,7 @@ def local_executor(config=None, workers=None, storage_backend=None,
     """
     Localhost function executor
     """
+    from .executor import FunctionExecutor
     compute_backend = 'localhost'
 
     if storage_backend is None:
@@ -124,6 +136,7 @@ def docker_executor(config=None, runtime=None, workers=None,
     """
     Docker function executor
     """
+    from .executor import FunctionExecutor
     compute_backend = 'docker'
 
     if storage_backend is None:
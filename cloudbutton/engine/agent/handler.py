@@ -18,21 +18,20 @@
 
 import os
 import sys
-import pika
 import time
 import json
 import pickle
 import logging
 import traceback
 from threading import Thread
+from collections import OrderedDict
 from multiprocessing import Process, Pipe
-from distutils.util import strtobool
 
 from cloudbutton import version
-from cloudbutton.engine.utils import sizeof_fmt
-from cloudbutton.config import extract_storage_config
+from cloudbutton.engine.utils import sizeof_fmt, strtobool
 from cloudbutton.engine.storage import InternalStorage
 from cloudbutton.engine.agent.jobrunner import JobRunner
+from cloudbutton.engine.agent.zygote import Zygote
 from cloudbutton.engine.agent.utils import get_memory_usage
 from cloudbutton.config import cloud_logging_config, JOBS_PREFIX, STORAGE_FOLDER
 from cloudbutton.engine.storage.utils import create_output_key, create_status_key, create_init_key
@@ -42,43 +41,77 @@ logging.getLogger('pika').setLevel(logging.CRITICAL)
 logger = logging.getLogger('handler')
 
 LIBS_PATH = '/action/cloudbutton/engine/libs'
-
-
-def function_handler(event):
+JOBRUNNER_THREAD_NAME = 'JobRunner'
+JOB_MANIFEST_CACHE_SIZE = 32
+
+_internal_storages = {}
+# Manifests of the jobs that already ran in this process
+_job_manifests = OrderedDict()
+_zygote = None
+
+
+def get_internal_storage(storage_config):
+    """
+    Returns the InternalStorage of a storage configuration, reused by the
+    calls that run in the same process
+    """
+    storage_key = json.dumps(storage_config, sort_keys=True)
+    if storage_key not in _internal_storages:
+        _internal_storages[storage_key] = InternalStorage(storage_config)
+    return _internal_storages[storage_key]
+
+
+def get_job_manifest(internal_storage, executor_id, job_id):
+    """
+    Returns the manifest of a job, downloaded once by the calls of the job
+    that run in the same process
+    """
+    manifest_key = (executor_id, job_id)
+    if manifest_key in _job_manifests:
+        _job_manifests.move_to_end(manifest_key)
+        return _job_manifests[manifest_key]
+
+    manifest = internal_storage.get_job_manifest(executor_id, job_id)
+    _job_manifests[manifest_key] = manifest
+    if len(_job_manifests) > JOB_MANIFEST_CACHE_SIZE:
+        _job_manifests.popitem(last=False)
+    return manifest
+
+
+def get_zygote(cloudbutton_config):
+    """
+    Returns the zygote of this container, starting it if it is not running
+    or its configuration changed
+    """
+    global _zygote
+    preload_modules = cloudbutton_config.get('warm_start_modules', [])
+    isolate = cloudbutton_config.get('warm_start_isolation', True)
+
+    if _zygote is not None and (not _zygote.is_alive() or _zygote.isolate != isolate
+                                or _zygote.preload_modules != list(preload_modules)):
+        _zygote.stop()
+        _zygote = None
+    if _zygote is None:
+        _zygote = Zygote(preload_modules, isolate)
+    return _zygote
+
+
+def function_handler(event, channel=None):
+    """
+    Runs a function call
+    :param event: call payload
+    :param channel: LocalChannel of the localhost compute backend, if enabled
+    """
     start_tstamp = time.time()
 
-    log_level = event['log_level']
-    cloud_logging_config(log_level)
-    logger.debug("Action handler started")
-
-    extra_env = event.get('extra_env', {})
-    os.environ.update(extra_env)
-
-    os.environ.update({'CLOUDBUTTON_FUNCTION': 'True',
-                       'PYTHONUNBUFFERED': 'True'})
-
-    config = event['config']
     call_id = event['call_id']
     job_id = event['job_id']
     executor_id = event['executor_id']
-    exec_id = "{}/{}/{}".format(executor_id, job_id, call_id)
-    logger.info("Execution-ID: {}".format(exec_id))
+    storage_config = event['storage_config']
+    internal_storage = get_internal_storage(storage_config)
 
-    runtime_name = event['runtime_name']
-    runtime_memory = event['runtime_memory']
-    execution_timeout = event['execution_timeout']
-    logger.debug("Runtime name: {}".format(runtime_name))
-    logger.debug("Runtime memory: {}MB".format(runtime_memory))
-    logger.debug("Function timeout: {}s".format(execution_timeout))
-
-    func_key = event['func_key']
-    data_key = event['data_key']
-    data_byte_range = event['data_byte_range']
-
-    storage_config = extract_storage_config(config)
-    internal_storage = InternalStorage(storage_config)
-
-    call_status = CallStatus(config, internal_storage)
+    # Created before reading the job manifest, so that its failures are reported too
+    call_status = CallStatus(None, internal_storage, channel)
     call_status.response['host_submit_tstamp'] = event['host_submit_tstamp']
     call_status.response['start_tstamp'] = start_tstamp
     context_dict = {
@@ -91,6 +124,7 @@ def function_handler(event):
     call_status.response.update(context_dict)
 
     show_memory_peak = strtobool(os.environ.get('SHOW_MEMORY_PEAK', 'False'))
+    extra_env = {}
 
     try:
         if version.__version__ != event['cloudbutton_version']:
@@ -98,11 +132,43 @@ def function_handler(event):
                    .format(event['cloudbutton_version'], version.__version__))
             raise RuntimeError('HANDLER', msg)
 
+        manifest = get_job_manifest(internal_storage, executor_id, job_id)
+
+        log_level = manifest['log_level']
+        cloud_logging_config(log_level)
+        logger.debug("Action handler started")
+
+        # The compute backend may add variables to the ones of the job
+        extra_env = dict(manifest['extra_env'])
+        extra_env.update(event.get('extra_env', {}))
+        os.environ.update(extra_env)
+
+        os.environ.update({'CLOUDBUTTON_FUNCTION': 'True',
+                           'PYTHONUNBUFFERED': 'True'})
+
+        config = manifest['config']
+        call_status.set_config(config)
+        exec_id = "{}/{}/{}".format(executor_id, job_id, call_id)
+        logger.info("Execution-ID: {}".format(exec_id))
+
+        runtime_name = manifest['runtime_name']
+        runtime_memory = manifest['runtime_memory']
+        execution_timeout = manifest['execution_timeout']
+        logger.debug("Runtime name: {}".format(runtime_name))
+        logger.debug("Runtime memory: {}MB".format(runtime_memory))
+        logger.debug("Function timeout: {}s".format(execution_timeout))
+
+        func_key = manifest['func_key']
+        data_key = manifest['data_key']
+        data_byte_range = event['data_byte_range']
+
         # send init status event
         call_status.send('__init__')
 
         # call_status.response['free_disk_bytes'] = free_disk_space("/tmp")
-        custom_env = {'CLOUDBUTTON_CONFIG': json.dumps(config),
+        # The resolved config of the executor, which default_config() loads
+        # once per worker process
+        custom_env = {'CLOUDBUTTON_CONFIG': json.dumps(config, separators=(',', ':')),
                       'CLOUDBUTTON_EXECUTION_ID': exec_id,
                       'PYTHONPATH': "{}:{}".format(os.getcwd(), LIBS_PATH)}
         os.environ.update(custom_env)
@@ -131,10 +197,21 @@ def function_handler(event):
             memory_monitor.start()
 
         handler_conn, jobrunner_conn = Pipe()
-        jobrunner = JobRunner(jobrunner_config, jobrunner_conn, internal_storage)
         logger.debug('Starting JobRunner process')
         local_execution = strtobool(os.environ.get('__PW_LOCAL_EXECUTION', 'False'))
-        jrp = Thread(target=jobrunner.run) if local_execution else Process(target=jobrunner.run)
+        if local_execution:
+            # A daemon, so that a timed out call does not keep its worker alive
+            jobrunner = JobRunner(jobrunner_config, jobrunner_conn, internal_storage, channel)
+            jrp = Thread(target=jobrunner.run, name=JOBRUNNER_THREAD_NAME)
+            jrp.daemon = True
+        elif config['cloudbutton'].get('warm_start', False):
+            # Runs in the pre-imported zygote of this container, which was forked
+            # before this call, so it gets the environment of the call
+            jrp = get_zygote(config['cloudbutton']).run(jobrunner_config, jobrunner_conn,
+                                                        storage_config, dict(os.environ))
+        else:
+            jobrunner = JobRunner(jobrunner_config, jobrunner_conn, internal_storage, channel)
+            jrp = Process(target=jobrunner.run)
         jrp.start()
 
         jrp.join(execution_timeout)
@@ -160,6 +237,11 @@ def function_handler(event):
 
         if not handler_conn.poll():
             logger.error('No completion message received from JobRunner process')
+            exitcode = getattr(jrp, 'exitcode', None)
+            if exitcode is not None and exitcode > 0:
+                # The JobRunner failed with an exception, it was not killed by a signal
+                msg = 'JobRunner process failed with exit code {}'.format(exitcode)
+                raise Exception('HANDLER', msg)
             logger.debug('Assuming memory overflow...')
             # Only 1 message is returned by jobrunner when it finishes.
             # If no message, this means that the jobrunner process was killed.
@@ -194,23 +276,32 @@ def function_handler(event):
         call_status.send('__end__')
 
         for key in extra_env:
-            os.environ.pop(key)
+            os.environ.pop(key, None)
 
         logger.info("Finished")
 
 
 class CallStatus:
 
-    def __init__(self, cloudbutton_config, internal_storage):
-        self.config = cloudbutton_config
-        self.rabbitmq_monitor = self.config['cloudbutton'].get('rabbitmq_monitor', False)
+    def __init__(self, cloudbutton_config, internal_storage, channel=None):
+        self.channel = channel
         self.store_status = strtobool(os.environ.get('__PW_STORE_STATUS', 'True'))
         self.internal_storage = internal_storage
         self.response = {'exception': False}
+        self.set_config(cloudbutton_config)
+
+    def set_config(self, cloudbutton_config):
+        # Without a config, the statuses are only stored in the storage backend
+        self.config = cloudbutton_config
+        self.rabbitmq_monitor = (cloudbutton_config is not None and
+                                 cloudbutton_config['cloudbutton'].get('rabbitmq_monitor', False))
 
     def send(self, event_type):
         self.response['type'] = event_type
         if self.store_status:
+            if self.channel is not None:
+                self.channel.send_status(self.response)
+                return
             if self.rabbitmq_monitor:
                 self._send_status_rabbitmq()
             if not self.rabbitmq_monitor or event_type == '__end__':
@@ -249,6 +340,7 @@ class CallStatus:
         rabbit_amqp_url = self.config['rabbitmq'].get('amqp_url')
         status_sent = False
         output_query_count = 0
+        import pika
         params = pika.URLParameters(rabbit_amqp_url)
         exchange = 'cloudbutton-{}-{}'.format(executor_id, job_id)
 
@@ -23,7 +23,7 @@ from multiprocessing import Process, Queue
 from concurrent.futures import ThreadPoolExecutor
 
 from cloudbutton.engine.compute import Compute
-from cloudbutton.engine.invoker import JobMonitor
+from cloudbutton.engine.invoker import JobMonitor, create_job_manifest, create_call_payload
 from cloudbutton.engine.storage import InternalStorage
 from cloudbutton.version import __version__
 from cloudbutton.config import cloud_logging_config, extract_compute_config, extract_storage_config
@@ -61,8 +61,8 @@ class FunctionInvoker:
         self.config = config
         self.num_invokers = num_invokers
         self.log_level = log_level
-        storage_config = extract_storage_config(self.config)
-        self.internal_storage = InternalStorage(storage_config)
+        self.storage_config = extract_storage_config(self.config)
+        self.internal_storage = InternalStorage(self.storage_config)
         compute_config = extract_compute_config(self.config)
 
         self.remote_invoker = self.config['cloudbutton'].get('remote_invoker', False)
@@ -109,20 +109,7 @@ class FunctionInvoker:
         """
         Method used to perform the actual invocation against the Compute Backend
         """
-        payload = {'config': self.config,
-                   'log_level': self.log_level,
-                   'func_key': job.func_key,
-                   'data_key': job.data_key,
-                   'extra_env': job.extra_env,
-                   'execution_timeout': job.execution_timeout,
-                   'data_byte_range': job.data_ranges[int(call_id)],
-                   'executor_id': job.executor_id,
-                   'job_id': job.job_id,
-                   'call_id': call_id,
-                   'host_submit_tstamp': time.time(),
-                   'cloudbutton_version': __version__,
-                   'runtime_name': job.runtime_name,
-                   'runtime_memory': job.runtime_memory}
+        payload = create_call_payload(self.storage_config, job, call_id)
 
         # do the invocation
         start = time.time()
@@ -152,6 +139,9 @@ class FunctionInvoker:
 
         self.total_calls = job.total_calls
 
+        manifest = create_job_manifest(self.config, self.log_level, job)
+        self.internal_storage.put_job_manifest(job.executor_id, job.job_id, manifest)
+
         if self.num_invokers == 0:
             # Localhost execution using processes
             for i in range(job.total_calls):
@@ -18,23 +18,21 @@
 
 import os
 import sys
-import pika
 import time
 import pickle
 import tempfile
 import logging
 import inspect
-import requests
 import traceback
-import numpy as np
-from distutils.util import strtobool
+from collections import OrderedDict
 
 from cloudbutton.engine.storage import Storage
 from cloudbutton.engine.wait import wait_storage
 from cloudbutton.engine.future import ResponseFuture
 from cloudbutton.engine.libs.tblib import pickling_support
 from cloudbutton.engine.utils import sizeof_fmt, b64str_to_bytes, is_object_processing_function
-from cloudbutton.engine.utils import WrappedStreamingBodyPartition
+from cloudbutton.engine.utils import WrappedStreamingBodyPartition, get_http_session, strtobool
+from cloudbutton.engine.storage.utils import open_object, RandomAccessObject
 from cloudbutton.config import cloud_logging_config
 
 from pydoc import locate
@@ -44,6 +42,11 @@ logger = logging.getLogger('JobRunner')
 
 TEMP = os.path.realpath(tempfile.gettempdir())
 PYTHON_MODULE_PATH = os.path.join(TEMP, "cloudbutton.modules")
+RECORD_BUFFER_SIZE = 1024*1024  # 1MB
+FUNCTION_CACHE_SIZE = 32
+
+# Deserialized functions of the jobs that already ran in this process
+_function_cache = OrderedDict()
 
 
 class stats:
@@ -62,10 +65,11 @@ class stats:
 
 class JobRunner:
 
-    def __init__(self, jr_config, jobrunner_conn, internal_storage):
+    def __init__(self, jr_config, jobrunner_conn, internal_storage, channel=None):
         self.jr_config = jr_config
         self.jobrunner_conn = jobrunner_conn
         self.internal_storage = internal_storage
+        self.channel = channel
 
         log_level = self.jr_config['log_level']
         cloud_logging_config(log_level)
@@ -77,6 +81,7 @@ class JobRunner:
         self.data_key = self.jr_config['data_key']
         self.data_byte_range = self.jr_config['data_byte_range']
         self.output_key = self.jr_config['output_key']
+        self.storage_handlers = {}
 
         self.stats = stats(self.jr_config['stats_filename'])
 
@@ -136,6 +141,27 @@ class JobRunner:
 
         return loaded_func
 
+    def _load_function(self):
+        """
+        Loads the function of the job, from the cache of this process if a
+        previous call of the same job already loaded it
+        """
+        function = _function_cache.get(self.func_key)
+        if function is not None:
+            _function_cache.move_to_end(self.func_key)
+            self.stats.write('function_download_time', 0.0)
+            return function
+
+        loaded_func_all = self._get_function_and_modules()
+        self._save_modules(loaded_func_all['module_data'])
+        function = self._unpickle_function(loaded_func_all['func'])
+
+        _function_cache[self.func_key] = function
+        if len(_function_cache) > FUNCTION_CACHE_SIZE:
+            _function_cache.popitem(last=False)
+
+        return function
+
     def _load_data(self):
         extra_get_args = {}
         if self.data_byte_range is not None:
@@ -144,10 +170,23 @@ class JobRunner:
 
         logger.debug("Getting function data")
         data_download_start_tstamp = time.time()
-        data_obj = self.internal_storage.get_data(self.data_key, extra_get_args=extra_get_args)
-        logger.debug("Finished getting Function data")
-        logger.debug("Unpickle Function data")
-        loaded_data = pickle.loads(data_obj)
+        if self.channel is not None:
+            # Unpickle directly from the shared memory segment of the job data
+            logger.debug("Unpickle Function data")
+            loaded_data = self.channel.load_data(self.data_key, self.data_byte_range)
+        elif self.internal_storage.backend == 'localhost':
+            # Unpickle directly from the memory-mapped object, without copying it
+            with self.internal_storage.get_data(self.data_key, stream=True,
+                                                extra_get_args=extra_get_args) as data_stream:
+                logger.debug("Unpickle Function data")
+                with data_stream.getbuffer() as data_buffer:
+                    loaded_data = pickle.loads(data_buffer)
+        else:
+            data_obj = self.internal_storage.get_data(self.data_key, extra_get_args=extra_get_args,
+                                                     immutable=True)
+            logger.debug("Finished getting Function data")
+            logger.debug("Unpickle Function data")
+            loaded_data = pickle.loads(data_obj)
         logger.debug("Finished unpickle Function data")
         data_download_end_tstamp = time.time()
         self.stats.write('data_download_time', round(data_download_end_tstamp-data_download_start_tstamp, 8))
@@ -176,6 +215,7 @@ class JobRunner:
         if 'rabbitmq' in func_sig.parameters:
             if 'rabbitmq' in self.cloudbutton_config:
                 rabbit_amqp_url = self.cloudbutton_config['rabbitmq'].get('amqp_url')
+                import pika
                 params = pika.URLParameters(rabbit_amqp_url)
                 connection = pika.BlockingConnection(params)
                 data['rabbitmq'] = connection
@@ -206,29 +246,51 @@ class JobRunner:
                 range_str = 'bytes={}-{}'.format(*url.data_byte_range)
                 extra_get_args['Range'] = range_str
                 logger.info('Chunk: {} - Range: {}'.format(url.part, extra_get_args['Range']))
-            resp = requests.get(url.path, headers=extra_get_args, stream=True)
+            resp = get_http_session().get(url.path, headers=extra_get_args, stream=True)
+            resp.raise_for_status()
             url.data_stream = resp.raw
 
         if 'obj' in data:
-            obj = data['obj']
-            logger.info('Getting dataset from {}://{}/{}'.format(obj.backend, obj.bucket, obj.key))
-
-            if obj.backend == self.internal_storage.backend:
-                storage_handler = self.internal_storage.storage_handler
-            else:
-                storage_handler = Storage(self.cloudbutton_config, obj.backend).get_storage_handler()
-
-            if obj.data_byte_range is not None:
-                extra_get_args['Range'] = 'bytes={}-{}'.format(*obj.data_byte_range)
-                logger.info('Chunk: {} - Range: {}'.format(obj.part, extra_get_args['Range']))
-                sb = storage_handler.get_object(obj.bucket, obj.key, stream=True,
-                                                extra_get_args=extra_get_args)
-                wsb = WrappedStreamingBodyPartition(sb, obj.chunk_size, obj.data_byte_range)
-                obj.data_stream = wsb
+            if type(data['obj']) == list:
+                # Packed partition: the objects are opened one by one as the function iterates
+                data['obj'] = (self._load_cloudobject(obj) for obj in data['obj'])
             else:
-                sb = storage_handler.get_object(obj.bucket, obj.key, stream=True,
-                                                extra_get_args=extra_get_args)
-                obj.data_stream = sb
+                self._load_cloudobject(data['obj'])
+
+    def _load_cloudobject(self, obj):
+        """
+        Opens the data stream of a CloudObject partition
+        """
+        logger.info('Getting dataset from {}://{}/{}'.format(obj.backend, obj.bucket, obj.key))
+
+        if obj.backend == self.internal_storage.backend:
+            storage_handler = self.internal_storage.storage_handler
+        else:
+            if obj.backend not in self.storage_handlers:
+                storage = Storage(self.cloudbutton_config, obj.backend)
+                self.storage_handlers[obj.backend] = storage.get_storage_handler()
+            storage_handler = self.storage_handlers[obj.backend]
+
+        if getattr(obj, 'row_groups', None) is not None:
+            # Columnar partition: only the column chunks of its row groups are fetched
+            logger.info('Chunk: {} - Row groups: {}'.format(obj.part, obj.row_groups))
+            obj.data_stream = RandomAccessObject(storage_handler, obj.bucket, obj.key, obj.size)
+            obj.table = obj.record_format.read_table(obj.data_stream, obj.row_groups)
+        elif obj.data_byte_range is not None and getattr(obj, 'record_format', None):
+            # The range starts and ends at record boundaries, so it needs no line repair
+            logger.info('Chunk: {} - Range: bytes={}-{}'.format(obj.part, *obj.data_byte_range))
+            obj.data_stream = open_object(storage_handler, obj.bucket, obj.key, obj.data_byte_range,
+                                          buffer_size=RECORD_BUFFER_SIZE)
+        elif obj.data_byte_range is not None:
+            logger.info('Chunk: {} - Range: bytes={}-{}'.format(obj.part, *obj.data_byte_range))
+            sb = open_object(storage_handler, obj.bucket, obj.key, obj.data_byte_range)
+            wsb = WrappedStreamingBodyPartition(sb, obj.chunk_size, obj.data_byte_range)
+            obj.data_stream = wsb
+        else:
+            obj.data_stream = open_object(storage_handler, obj.bucket, obj.key,
+                                          obj_size=getattr(obj, 'size', None))
+
+        return obj
 
     # Decorator to execute pre-run and post-run functions provided via environment variables
     def prepost(func):
@@ -254,9 +316,7 @@ class JobRunner:
         result = None
         exception = False
         try:
-            loaded_func_all = self._get_function_and_modules()
-            self._save_modules(loaded_func_all['module_data'])
-            function = self._unpickle_function(loaded_func_all['func'])
+            function = self._load_function()
             data = self._load_data()
 
             if strtobool(os.environ.get('__PW_REDUCE_JOB', 'False')):
@@ -325,7 +385,10 @@ class JobRunner:
             if result is not None and store_result and not exception:
                 output_upload_start_tstamp = time.time()
                 logger.info("Storing function result - Size: {}".format(sizeof_fmt(len(pickled_output))))
-                self.internal_storage.put_data(self.output_key, pickled_output)
+                if self.channel is not None:
+                    self.channel.send_output(self.output_key, pickled_output)
+                else:
+                    self.internal_storage.put_data(self.output_key, pickled_output)
                 output_upload_end_tstamp = time.time()
                 self.stats.write("output_upload_time", round(output_upload_end_tstamp - output_upload_start_tstamp, 8))
             self.jobrunner_conn.send("Finished")
@@ -0,0 +1,177 @@
+#
+# Copyright Cloudlab URV 2020
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import signal
+import logging
+import importlib
+import traceback
+from multiprocessing import Process, Pipe
+
+logger = logging.getLogger('handler')
+
+
+def _exit_code(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _set_environ(environ):
+    os.environ.clear()
+    os.environ.update(environ)
+
+
+def _run_jobrunner(jobrunner_config, jobrunner_conn, storage_config):
+    from cloudbutton.engine.agent.jobrunner import JobRunner
+    from cloudbutton.engine.agent.handler import get_internal_storage
+
+    internal_storage = get_internal_storage(storage_config)
+    jobrunner = JobRunner(jobrunner_config, jobrunner_conn, internal_storage)
+    jobrunner.run()
+
+
+def _zygote_main(conn, preload_modules, isolate):
+    """
+    Main loop of the zygote process. Runs one call at a time: in a forked
+    child that inherits all the imported modules, or in this same process
+    if the calls do not need to be isolated. Every call runs with the
+    environment the handler set for it.
+    """
+    import cloudbutton.engine.agent.jobrunner  # noqa: F401
+    for module in preload_modules:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning('Zygote: unable to preload module {}: {}'.format(module, e))
+
+    while True:
+        try:
+            jobrunner_config, jobrunner_conn, storage_config, environ = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        if not isolate:
+            conn.send(os.getpid())
+            exit_code = 0
+            zygote_environ = dict(os.environ)
+            try:
+                _set_environ(environ)
+                _run_jobrunner(jobrunner_config, jobrunner_conn, storage_config)
+            except Exception:
+                # Keep the zygote alive, the handler reports the failure
+                traceback.print_exc(file=sys.stdout)
+                exit_code = 1
+            finally:
+                _set_environ(zygote_environ)
+                jobrunner_conn.close()
+            conn.send(exit_code)
+            continue
+
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                conn.close()
+                _set_environ(environ)
+                _run_jobrunner(jobrunner_config, jobrunner_conn, storage_config)
+            except BaseException:
+                traceback.print_exc(file=sys.stdout)
+                exit_code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+
+        jobrunner_conn.close()
+        conn.send(pid)
+        _, status = os.waitpid(pid, 0)
+        conn.send(_exit_code(status))
+
+
+class Zygote:
+    """
+    Warm process of a container that pre-imports the agent and the declared
+    heavy modules once, and then runs the JobRunner of every call, forking a
+    child per call when isolate is True.
+    """
+
+    def __init__(self, preload_modules=[], isolate=True):
+        self.preload_modules = list(preload_modules)
+        self.isolate = isolate
+        self.conn, zygote_conn = Pipe()
+        self.process = Process(target=_zygote_main, args=(zygote_conn, self.preload_modules, isolate))
+        self.process.daemon = True
+        self.process.start()
+        zygote_conn.close()
+        logger.debug('Zygote process {} started'.format(self.process.pid))
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def run(self, jobrunner_config, jobrunner_conn, storage_config, environ):
+        """
+        Returns a process-like handle that runs the JobRunner in the zygote
+        with the given environment variables
+        """
+        return ZygoteCall(self, jobrunner_config, jobrunner_conn, storage_config, environ)
+
+    def stop(self):
+        self.conn.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ZygoteCall:
+    """
+    Handle of a call run by the zygote, with the subset of the Process
+    interface used by the handler: start, join, is_alive and terminate.
+    """
+
+    def __init__(self, zygote, jobrunner_config, jobrunner_conn, storage_config, environ):
+        self.zygote = zygote
+        self.jobrunner_config = jobrunner_config
+        self.jobrunner_conn = jobrunner_conn
+        self.storage_config = storage_config
+        self.environ = environ
+        self.pid = None
+        self.exitcode = None
+
+    def start(self):
+        self.zygote.conn.send((self.jobrunner_config, self.jobrunner_conn,
+                               self.storage_config, self.environ))
+        self.pid = self.zygote.conn.recv()
+
+    def join(self, timeout=None):
+        if self.exitcode is None and self.zygote.conn.poll(timeout):
+            try:
+                self.exitcode = self.zygote.conn.recv()
+            except EOFError:
+                # The zygote itself was killed
+                self.exitcode = -signal.SIGKILL
+
+    def is_alive(self):
+        return self.exitcode is None
+
+    def terminate(self):
+        if self.pid is not None and self.exitcode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.join()
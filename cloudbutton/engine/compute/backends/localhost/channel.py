@@ -0,0 +1,236 @@
+#
+# Copyright Cloudlab URV 2020
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from multiprocessing import Queue, Value
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+    # Python < 3.8
+    SharedMemory = None
+
+from cloudbutton.config import JOBS_PREFIX
+from cloudbutton.engine.utils import is_unix_system
+from cloudbutton.engine.storage.utils import create_status_key, create_output_key
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'cb'
+
+
+def is_channel_available():
+    return SharedMemory is not None
+
+
+def segment_name(key):
+    """
+    Name of the shared memory segment of a key. Short enough for all the
+    platforms, which limit the names to 31 characters.
+    """
+    return SEGMENT_PREFIX + hashlib.sha1(key.encode()).hexdigest()[:24]
+
+
+def write_segment(key, data):
+    """
+    Creates the shared memory segment of a key with the given data
+    """
+    name = segment_name(key)
+    size = max(len(data), 1)
+    try:
+        segment = SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        # Left by a previous run of the same call
+        stale_segment = SharedMemory(name=name)
+        stale_segment.close()
+        stale_segment.unlink()
+        segment = SharedMemory(name=name, create=True, size=size)
+    segment.buf[:len(data)] = data
+    return segment
+
+
+class LocalChannel:
+    """
+    Fast path between the executor and the localhost workers when storage is
+    local too. The data of a job and the outputs of its calls travel through
+    shared memory segments, and the call statuses go back to the executor
+    through a pipe, so they never touch the storage backend.
+
+    The channel is created before forking the workers, and it is only used
+    by them once the executor enables it.
+    """
+
+    def __init__(self):
+        if is_unix_system():
+            # The workers share the resource tracker of this process, so a
+            # segment created by a worker can be unlinked here
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        self.queue = Queue()
+        self._enabled = Value('b', 0)
+        self._receiver = None
+        self._lock = threading.Lock()
+        self._segments = {}
+        self._jobs = {}
+        self._statuses = {}
+        self._outputs = {}
+
+    @property
+    def enabled(self):
+        return bool(self._enabled.value)
+
+    def enable(self):
+        """
+        Starts receiving the statuses and outputs of the workers
+        """
+        if self._receiver is None:
+            self._receiver = threading.Thread(target=self._receive)
+            self._receiver.daemon = True
+            self._receiver.start()
+        self._enabled.value = 1
+
+    # Worker side
+
+    def load_data(self, data_key, byte_range=None):
+        """
+        Unpickles the data of a call directly from the segment of the job data
+        """
+        segment = SharedMemory(name=segment_name(data_key))
+        try:
+            if byte_range is None:
+                return pickle.loads(segment.buf)
+            with segment.buf[byte_range[0]:byte_range[1]+1] as data_buffer:
+                return pickle.loads(data_buffer)
+        finally:
+            segment.close()
+
+    def send_output(self, output_key, data):
+        segment = write_segment(output_key, data)
+        segment.close()
+        self.queue.put(('output', output_key, len(data)))
+
+    def send_status(self, response):
+        self.queue.put(('status', json.dumps(response), None))
+
+    # Executor side
+
+    def put_job_data(self, executor_id, job_id, data_key, data):
+        """
+        Shares the data of a job with the workers
+        """
+        with self._lock:
+            self._jobs.setdefault((executor_id, job_id), (set(), set()))
+            if data_key in self._segments:
+                self._release_segment(data_key)
+            self._segments[data_key] = write_segment(data_key, data)
+
+    def has_job(self, executor_id, job_id):
+        """
+        Returns True if the job runs through this channel
+        """
+        return (executor_id, job_id) in self._jobs
+
+    def _receive(self):
+        while True:
+            try:
+                msg_type, msg, size = self.queue.get()
+            except (EOFError, OSError):
+                break
+            if msg_type is None:
+                break
+            try:
+                if msg_type == 'output':
+                    self._receive_output(msg, size)
+                else:
+                    self._receive_status(json.loads(msg))
+            except Exception as e:
+                logger.error('Error receiving a message from the localhost workers: {}'.format(e))
+
+    def _receive_output(self, output_key, size):
+        segment = SharedMemory(name=segment_name(output_key))
+        try:
+            output = bytes(segment.buf[:size])
+        finally:
+            segment.close()
+            segment.unlink()
+        with self._lock:
+            # Outputs of the jobs already cleaned are dropped
+            if output_key.startswith(tuple(self._job_prefix(*job) for job in self._jobs)):
+                self._outputs[output_key] = output
+
+    def _receive_status(self, call_status):
+        executor_id = call_status['executor_id']
+        job_id = call_status['job_id']
+        call_id = call_status['call_id']
+        with self._lock:
+            if (executor_id, job_id) not in self._jobs:
+                # The job was already cleaned
+                return
+            running, done = self._jobs[(executor_id, job_id)]
+            if call_status['type'] == '__init__':
+                running.add(((executor_id, job_id, call_id), call_status['activation_id']))
+            elif call_status['type'] == '__end__':
+                done.add((executor_id, job_id, call_id))
+                status_key = create_status_key(JOBS_PREFIX, executor_id, job_id, call_id)
+                self._statuses[status_key] = call_status
+
+    def get_job_status(self, executor_id, job_id):
+        with self._lock:
+            running, done = self._jobs.get((executor_id, job_id), (set(), set()))
+            return set(running), set(done)
+
+    def get_call_status(self, executor_id, job_id, call_id):
+        with self._lock:
+            return self._statuses.get(create_status_key(JOBS_PREFIX, executor_id, job_id, call_id))
+
+    def get_call_output(self, executor_id, job_id, call_id):
+        with self._lock:
+            return self._outputs.get(create_output_key(JOBS_PREFIX, executor_id, job_id, call_id))
+
+    def clean_jobs(self, jobs):
+        """
+        Releases the data, the outputs and the statuses of the given (executor_id, job_id)
+        jobs, once their futures are collected. Later messages of these jobs are dropped.
+        """
+        prefixes = tuple(self._job_prefix(executor_id, job_id) for executor_id, job_id in jobs)
+        with self._lock:
+            for job in jobs:
+                self._jobs.pop(job, None)
+            for status_key in [key for key in self._statuses if key.startswith(prefixes)]:
+                del self._statuses[status_key]
+            for output_key in [key for key in self._outputs if key.startswith(prefixes)]:
+                del self._outputs[output_key]
+            for data_key in [key for key in self._segments if key.startswith(prefixes)]:
+                self._release_segment(data_key)
+
+    @staticmethod
+    def _job_prefix(executor_id, job_id):
+        return '/'.join([JOBS_PREFIX, executor_id, job_id]) + '/'
+
+    def _release_segment(self, data_key):
+        segment = self._segments.pop(data_key)
+        segment.close()
+        segment.unlink()
+
+    def close(self):
+        if self._receiver is not None:
+            self.queue.put((None, None, None))
+        with self._lock:
+            for data_key in list(self._segments):
+                self._release_segment(data_key)
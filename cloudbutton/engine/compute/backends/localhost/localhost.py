@@ -16,23 +16,40 @@
 
 import os
 import sys
+import json
+import time
 import uuid
+import pickle
 import pkgutil
 import logging
-from multiprocessing import Process, Queue
+import threading
+from multiprocessing import Process, Queue, Array
 from threading import Thread
 from cloudbutton.version import __version__
 from cloudbutton.engine.utils import version_str, is_unix_system
 from cloudbutton.engine.agent import function_handler
+from cloudbutton.engine.agent.handler import CallStatus, JOBRUNNER_THREAD_NAME, get_job_manifest
+from cloudbutton.engine.storage import InternalStorage
+from cloudbutton.engine.compute.backends.localhost.channel import LocalChannel, is_channel_available
 from cloudbutton.config import STORAGE_FOLDER, LOGS_PREFIX
 
 
 logger = logging.getLogger(__name__)
 
+WATCHDOG_INTERVAL = 1  # seconds
+WATCHDOG_GRACE_PERIOD = 10  # seconds past the call timeout before killing its worker
+CALL_SLOT_SIZE = 512
+
 
 class LocalhostBackend:
     """
     A wrap-up around Localhost multiprocessing APIs.
+
+    The workers are long-lived processes that run the calls in-process, so
+    they keep the storage clients and the deserialized functions of the
+    previous calls. Each worker publishes the call it is running in a shared
+    slot, and a watchdog thread replaces the workers that die (e.g. killed
+    by an OOM) or exceed the call timeout, reporting the failure of the call.
     """
 
     def __init__(self, local_config):
@@ -43,55 +60,144 @@ class LocalhostBackend:
         self.queue = Queue()
         self.logs_dir = os.path.join(STORAGE_FOLDER, LOGS_PREFIX)
         self.num_workers = self.config['workers']
+        # Created before the workers, so that they inherit it
+        if self.config.get('shared_memory', True) and is_channel_available():
+            self.channel = LocalChannel()
+        else:
+            self.channel = None
 
-        self.workers = []
+        self.use_processes = is_unix_system()
+        self.workers = {}
+        self.worker_calls = {}
+        self.invoke_storage_config = None
+        self.internal_storage = None
+        self.devnull = open(os.devnull, 'w')
 
-        if not is_unix_system():
-            for worker_id in range(self.num_workers):
-                p = Thread(target=self._process_runner, args=(worker_id,))
-                self.workers.append(p)
-                p.daemon = True
-                p.start()
-        else:
-            for worker_id in range(self.num_workers):
-                p = Process(target=self._process_runner, args=(worker_id,))
-                self.workers.append(p)
-                p.daemon = True
-                p.start()
+        for worker_id in range(self.num_workers):
+            self._start_worker(worker_id)
+
+        if self.use_processes:
+            self.watchdog = Thread(target=self._watchdog)
+            self.watchdog.daemon = True
+            self.watchdog.start()
 
         log_msg = 'PyWren v{} init for Localhost - Total workers: {}'.format(__version__, self.num_workers)
         logger.info(log_msg)
         if not self.log_level:
             print(log_msg)
 
-    def _local_handler(self, event):
+    def _start_worker(self, worker_id):
+        self.worker_calls[worker_id] = Array('c', CALL_SLOT_SIZE)
+        if self.use_processes:
+            p = Process(target=self._process_runner, args=(worker_id,))
+        else:
+            p = Thread(target=self._process_runner, args=(worker_id,))
+        p.daemon = True
+        p.start()
+        self.workers[worker_id] = p
+
+    def _local_handler(self, event, act_id):
         """
         Handler to run local functions.
         """
-        if not self.log_level:
+        if not self.log_level and not self.use_processes:
             old_stdout = sys.stdout
-            sys.stdout = open(os.devnull, 'w')
+            sys.stdout = self.devnull
 
-        event['extra_env']['__PW_LOCAL_EXECUTION'] = 'True'
-        act_id = str(uuid.uuid4()).replace('-', '')[:12]
+        event['extra_env'] = {'__PW_LOCAL_EXECUTION': 'True'}
         os.environ['__PW_ACTIVATION_ID'] = act_id
-        function_handler(event)
+        if self.channel is not None and self.channel.enabled:
+            function_handler(event, channel=self.channel)
+        else:
+            function_handler(event)
 
-        if not self.log_level:
+        if not self.log_level and not self.use_processes:
             sys.stdout = old_stdout
 
     def _process_runner(self, worker_id):
         logger.debug('Localhost worker process {} started'.format(worker_id))
+        call_slot = self.worker_calls[worker_id]
+
+        if not self.log_level and self.use_processes:
+            sys.stdout = self.devnull
+
         while self.alive:
             try:
-                event = self.queue.get(block=True)
-                if event is None:
+                msg = self.queue.get(block=True)
+                if msg is None:
+                    break
+                act_id, event = msg
+                call = {'executor_id': event['executor_id'],
+                        'job_id': event['job_id'],
+                        'call_id': event['call_id'],
+                        'activation_id': act_id,
+                        'start_tstamp': time.time(),
+                        'deadline': time.time() + event['execution_timeout'] + WATCHDOG_GRACE_PERIOD}
+                call_slot.value = json.dumps(call).encode()[:CALL_SLOT_SIZE]
+                self._local_handler(event, act_id)
+                call_slot.value = b''
+                if self.use_processes and any(th.name == JOBRUNNER_THREAD_NAME and th.is_alive()
+                                              for th in threading.enumerate()):
+                    # A timed out call is still running, so the watchdog replaces this worker
                     break
-                self._local_handler(event)
             except KeyboardInterrupt:
                 break
         logger.debug('Localhost worker process {} stopped'.format(worker_id))
 
+    def _get_worker_call(self, worker_id):
+        try:
+            return json.loads(self.worker_calls[worker_id].value.decode())
+        except ValueError:
+            return None
+
+    def _watchdog(self):
+        """
+        Replaces the workers that died or exceeded the timeout of their call
+        """
+        while self.alive:
+            time.sleep(WATCHDOG_INTERVAL)
+            for worker_id, worker in list(self.workers.items()):
+                if not self.alive:
+                    break
+                call = self._get_worker_call(worker_id)
+                if worker.is_alive():
+                    if call is None or time.time() < call['deadline']:
+                        continue
+                    logger.debug('Localhost worker process {} exceeded the call timeout'.format(worker_id))
+                    worker.terminate()
+                    worker.join()
+                    msg = 'Function exceeded maximum time and was killed'
+                    self._report_failure(call, TimeoutError('HANDLER', msg))
+                elif call is not None:
+                    logger.debug('Localhost worker process {} died'.format(worker_id))
+                    msg = 'Function exceeded maximum memory and was killed'
+                    self._report_failure(call, MemoryError('HANDLER', msg))
+                else:
+                    worker.join()
+                self._start_worker(worker_id)
+
+    def _report_failure(self, call, exception):
+        """
+        Sends the final status of a call whose worker was killed
+        """
+        if self.invoke_storage_config is None:
+            logger.error('Unable to report the failure of call {}'.format(call['call_id']))
+            return
+        if self.internal_storage is None:
+            self.internal_storage = InternalStorage(self.invoke_storage_config)
+        manifest = get_job_manifest(self.internal_storage, call['executor_id'], call['job_id'])
+        channel = self.channel if self.channel is not None and self.channel.enabled else None
+        call_status = CallStatus(manifest['config'], self.internal_storage, channel)
+        try:
+            raise exception
+        except Exception:
+            call_status.response['exception'] = True
+            call_status.response['exc_info'] = str(pickle.dumps(sys.exc_info()))
+        call_status.response.update(call)
+        del call_status.response['deadline']
+        call_status.response['end_tstamp'] = time.time()
+        call_status.send('__end__')
+
     def _generate_python_meta(self):
         """
         Extracts installed Python modules from the local machine
@@ -109,8 +215,9 @@ class LocalhostBackend:
         Invoke the function with the payload. runtime_name and memory
         are not used since it runs in the local machine.
         """
-        self.queue.put(payload)
+        self.invoke_storage_config = payload['storage_config']
         act_id = str(uuid.uuid4()).replace('-', '')[:12]
+        self.queue.put((act_id, payload))
         return act_id
 
     def invoke_with_result(self, runtime_name, memory, payload={}):
@@ -163,5 +270,7 @@ class LocalhostBackend:
     def __del__(self):
         if self.alive:
             self.alive = False
-            for worker in self.workers:
+            for worker in self.workers.values():
                 self.queue.put(None)
+            if self.channel is not None:
+                self.channel.close()
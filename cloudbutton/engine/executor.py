@@ -25,10 +25,12 @@ from cloudbutton.engine.invoker import FunctionInvoker
 from cloudbutton.engine.storage import InternalStorage
 from cloudbutton.engine.storage.utils import delete_cloudobject
 from cloudbutton.engine.wait import wait_storage, wait_rabbitmq, ALL_COMPLETED
-from cloudbutton.engine.job import create_map_job, create_reduce_job, clean_job
+from cloudbutton.engine.job import create_map_job, create_reduce_job, clean_job, \
+    sample_boundaries, sort_map_function, sort_reduce_function
 from cloudbutton.engine.utils import timeout_handler, is_notebook, is_unix_system, \
-    is_cloudbutton_function, create_executor_id
-from cloudbutton.config import default_config, extract_storage_config, default_logging_config
+    is_cloudbutton_function, create_executor_id, split_object_url, format_data
+from cloudbutton.config import default_config, extract_storage_config, default_logging_config, \
+    TEMP_PREFIX, SORT_PREFIX
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +39,8 @@ class FunctionExecutor:
 
     def __init__(self, config=None, runtime=None, runtime_memory=None, compute_backend=None,
                  compute_backend_region=None, storage_backend=None, storage_backend_region=None,
-                 workers=None, rabbitmq_monitor=None, remote_invoker=None, log_level=None):
+                 workers=None, rabbitmq_monitor=None, remote_invoker=None, log_level=None,
+                 storage_cache=None):
         """
         Initialize a FunctionExecutor class.
 
@@ -51,6 +54,9 @@ class FunctionExecutor:
         :param workers: Max number of concurrent workers.
         :param rabbitmq_monitor: use rabbitmq as the monitoring system. Default None.
         :param log_level: log level to use during the execution. Default None.
+        :param storage_cache: Cache of the job artefacts read from storage: True for a 64MiB memory
+                              cache, or a dict with its 'memory_size', 'disk_size' and 'disk_path'.
+                              Default None (disabled).
 
         :return `FunctionExecutor` object.
         """
@@ -86,6 +92,8 @@ class FunctionExecutor:
             pw_config_ow['rabbitmq_monitor'] = rabbitmq_monitor
         if remote_invoker is not None:
             pw_config_ow['remote_invoker'] = remote_invoker
+        if storage_cache is not None:
+            pw_config_ow['storage_cache'] = storage_cache
 
         self.config = default_config(copy.deepcopy(config), pw_config_ow)
 
@@ -158,7 +166,7 @@ class FunctionExecutor:
 
     def map(self, map_function, map_iterdata, extra_args=None, extra_env=None, runtime_memory=None,
             chunk_size=None, chunk_n=None, timeout=None, invoke_pool_threads=500,
-            include_modules=[], exclude_modules=[]):
+            include_modules=[], exclude_modules=[], record_format=None, min_partition_bytes=None):
         """
         :param map_function: the function to map over the data
         :param map_iterdata: An iterable of input data
@@ -169,6 +177,14 @@ class FunctionExecutor:
                            the whole file in one function activation.
         :param chunk_n: Number of chunks to split each object. 'None' for processing the whole
                         file in one function activation.
+        :param record_format: Delimiter (e.g. b'\\n'), record size or record format instance used to
+                              split the objects at exact record boundaries. 'parquet' or a
+                              ParquetRowGroups instance splits Parquet objects by row groups and
+                              gives the functions the projected columns in 'obj.table'. 'None' for
+                              overlapping chunks whose partial lines are discarded by the functions.
+        :param min_partition_bytes: Pack whole objects into partitions of at least this size, so
+                                    one activation processes many small objects. The function then
+                                    receives an iterator of CloudObjects in 'obj'. Default None.
         :param remote_invocation: Enable or disable remote_invocation mechanism. Default 'False'
         :param timeout: Time that the functions have to complete their execution before raising a timeout.
         :param invoke_pool_threads: Number of threads to use to invoke.
@@ -192,6 +208,8 @@ class FunctionExecutor:
                              extra_env=extra_env,
                              obj_chunk_size=chunk_size,
                              obj_chunk_number=chunk_n,
+                             obj_record_format=record_format,
+                             obj_min_partition_bytes=min_partition_bytes,
                              invoke_pool_threads=invoke_pool_threads,
                              include_modules=include_modules,
                              exclude_modules=exclude_modules,
@@ -205,7 +223,8 @@ class FunctionExecutor:
     def map_reduce(self, map_function, map_iterdata, reduce_function, extra_args=None, extra_env=None,
                    map_runtime_memory=None, reduce_runtime_memory=None, chunk_size=None, chunk_n=None,
                    timeout=None, invoke_pool_threads=500, reducer_one_per_object=False,
-                   reducer_wait_local=False, include_modules=[], exclude_modules=[]):
+                   reducer_wait_local=False, include_modules=[], exclude_modules=[], record_format=None,
+                   min_partition_bytes=None):
         """
         Map the map_function over the data and apply the reduce_function across all futures.
         This method is executed all within CF.
@@ -221,9 +240,20 @@ class FunctionExecutor:
                            the whole file in one function activation.
         :param chunk_n: Number of chunks to split each object. 'None' for processing the whole
                         file in one function activation.
+        :param record_format: Delimiter (e.g. b'\\n'), record size or record format instance used to
+                              split the objects at exact record boundaries. 'parquet' or a
+                              ParquetRowGroups instance splits Parquet objects by row groups and
+                              gives the functions the projected columns in 'obj.table'. 'None' for
+                              overlapping chunks whose partial lines are discarded by the functions.
+        :param min_partition_bytes: Pack whole objects into partitions of at least this size, so
+                                    one activation processes many small objects. The function then
+                                    receives an iterator of CloudObjects in 'obj'. Default None.
         :param remote_invocation: Enable or disable remote_invocation mechanism. Default 'False'
         :param timeout: Time that the functions have to complete their execution before raising a timeout.
-        :param reducer_one_per_object: Set one reducer per object after running the partitioner
+        :param reducer_one_per_object: Set one reducer per object after running the partitioner.
+                                       With min_partition_bytes, the reducer of an object gets the
+                                       futures of the packs that hold it, shared with the other
+                                       objects of those packs.
         :param reducer_wait_local: Wait for results locally
         :param invoke_pool_threads: Number of threads to use to invoke.
         :param include_modules: Explicitly pickle these dependencies.
@@ -246,6 +276,8 @@ class FunctionExecutor:
                                  extra_env=extra_env,
                                  obj_chunk_size=chunk_size,
                                  obj_chunk_number=chunk_n,
+                                 obj_record_format=record_format,
+                                 obj_min_partition_bytes=min_partition_bytes,
                                  invoke_pool_threads=invoke_pool_threads,
                                  include_modules=include_modules,
                                  exclude_modules=exclude_modules,
@@ -254,7 +286,10 @@ class FunctionExecutor:
         map_futures = self.invoker.run(map_job)
         self.futures.extend(map_futures)
 
-        if reducer_wait_local:
+        if self.internal_storage.channel is not None:
+            # The reducers cannot read the map outputs from the local channel
+            self.wait(fs=map_futures, download_results=True)
+        elif reducer_wait_local:
             self.wait(fs=map_futures)
 
         reduce_job_id = map_job_id.replace('M', 'R')
@@ -280,6 +315,100 @@ class FunctionExecutor:
 
         return map_futures + reduce_futures
 
+    def sort(self, obj_urls, key=None, num_partitions=None, output_path=None, extra_env=None,
+             map_runtime_memory=None, reduce_runtime_memory=None, chunk_size=None, chunk_n=None,
+             timeout=None, invoke_pool_threads=500):
+        """
+        Sort the newline-delimited records of a set of objects. The records are sampled
+        to compute range-partition boundaries, the map functions split each chunk into
+        per-range sorted runs, and one reducer per range merges its runs into a sorted
+        output object.
+
+        :param obj_urls: A bucket, a prefix or a list of object keys to sort.
+        :param key: Function applied to each decoded record to extract its sort key.
+                    'None' for sorting the raw records.
+        :param num_partitions: Number of sorted output objects. Default one per input object.
+        :param output_path: Bucket and prefix where the sorted objects are written,
+                            in the storage backend of the executor. Default None.
+        :param extra_env: Additional environment variables for action environment. Default None.
+        :param map_runtime_memory: Memory to use to run the map function. Default None (loaded from config).
+        :param reduce_runtime_memory: Memory to use to run the reduce function. Default None (loaded from config).
+        :param chunk_size: the size of the data chunks to split each object. 'None' for processing
+                           the whole file in one function activation.
+        :param chunk_n: Number of chunks to split each object. 'None' for processing the whole
+                        file in one function activation.
+        :param timeout: Time that the functions have to complete their execution before raising a timeout.
+        :param invoke_pool_threads: Number of threads to use to invoke.
+
+        :return: A list of futures whose results are the sorted CloudObjects, in key order.
+        """
+        map_job_id = self._create_job_id('M')
+        self.last_call = 'sort'
+
+        storage_config = self.internal_storage.get_storage_config()
+        if output_path is None:
+            output_bucket = self.internal_storage.bucket
+            output_prefix = '/'.join([SORT_PREFIX, self.executor_id, map_job_id])
+        else:
+            sb, output_bucket, prefix, obj_name = split_object_url(output_path)
+            if sb is not None and sb != self.internal_storage.backend:
+                raise Exception('The sorted objects must be written to the executor storage '
+                                'backend: {}'.format(self.internal_storage.backend))
+            output_prefix = '/'.join([p.strip('/') for p in (prefix, obj_name) if p])
+        runs_prefix = '/'.join([TEMP_PREFIX, self.executor_id, map_job_id, 'runs'])
+
+        boundaries, num_partitions = sample_boundaries(self.config, self.internal_storage,
+                                                       obj_urls, key, num_partitions)
+
+        runtime_meta = self.invoker.select_runtime(map_job_id, map_runtime_memory)
+
+        map_job = create_map_job(self.config, self.internal_storage,
+                                 self.executor_id, map_job_id,
+                                 map_function=sort_map_function,
+                                 iterdata=[{'obj': obj} for obj in format_data(obj_urls, None)],
+                                 runtime_meta=runtime_meta,
+                                 runtime_memory=map_runtime_memory,
+                                 extra_args={'boundaries': boundaries, 'key': key,
+                                             'storage_config': storage_config,
+                                             'runs_prefix': runs_prefix},
+                                 extra_env=extra_env,
+                                 obj_chunk_size=chunk_size,
+                                 obj_chunk_number=chunk_n,
+                                 obj_record_format=b'\n',
+                                 invoke_pool_threads=invoke_pool_threads,
+                                 execution_timeout=timeout)
+
+        map_futures = self.invoker.run(map_job)
+        self.futures.extend(map_futures)
+        # Reducers list the runs of their range, so all of them must exist
+        self.wait(fs=map_futures)
+
+        reduce_job_id = map_job_id.replace('M', 'R')
+
+        runtime_meta = self.invoker.select_runtime(reduce_job_id, reduce_runtime_memory)
+
+        reduce_job = create_map_job(self.config, self.internal_storage,
+                                    self.executor_id, reduce_job_id,
+                                    map_function=sort_reduce_function,
+                                    iterdata=[{'range_id': i} for i in range(num_partitions)],
+                                    runtime_meta=runtime_meta,
+                                    runtime_memory=reduce_runtime_memory,
+                                    extra_args={'key': key, 'storage_config': storage_config,
+                                                'runs_prefix': runs_prefix,
+                                                'output_bucket': output_bucket,
+                                                'output_prefix': output_prefix},
+                                    extra_env=extra_env,
+                                    invoke_pool_threads=invoke_pool_threads,
+                                    execution_timeout=timeout)
+
+        reduce_futures = self.invoker.run(reduce_job)
+        self.futures.extend(reduce_futures)
+
+        for f in map_futures:
+            f._produce_output = False
+
+        return map_futures + reduce_futures
+
     def wait(self, fs=None, throw_except=True, return_when=ALL_COMPLETED, download_results=False,
              timeout=None, THREADPOOL_SIZE=128, WAIT_DUR_SEC=1):
         """
@@ -423,7 +552,7 @@ class FunctionExecutor:
 
         logger.debug("ExecutorID {} Finished getting results".format(self.executor_id))
 
-        if len(result) == 1 and self.last_call != 'map':
+        if len(result) == 1 and self.last_call not in ('map', 'sort'):
             return result[0]
 
         return result
@@ -489,6 +618,8 @@ class FunctionExecutor:
             print(msg) if not self.log_level and log else logger.info(msg)
             storage_config = self.internal_storage.get_storage_config()
             clean_job(jobs_to_clean, storage_config, clean_cloudobjects=cloudobjects)
+            if self.internal_storage.channel is not None:
+                self.internal_storage.channel.clean_jobs(jobs_to_clean)
             self.cleaned_jobs.update(jobs_to_clean)
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -73,6 +73,7 @@ class ResponseFuture:
         self._traceback = None
         self._call_status = None
         self._call_output = None
+        self._prefetched_output = None
         self._status_query_count = 0
         self._output_query_count = 0
 
@@ -268,7 +269,10 @@ class ResponseFuture:
         if self._state == ResponseFuture.State.Futures:
             return self._new_futures
 
-        call_output = internal_storage.get_call_output(self.executor_id, self.job_id, self.call_id)
+        if self._prefetched_output is not None:
+            call_output, self._prefetched_output = self._prefetched_output, None
+        else:
+            call_output = internal_storage.get_call_output(self.executor_id, self.job_id, self.call_id)
         self._output_query_count += 1
 
         while call_output is None and self._output_query_count < self.GET_RESULT_MAX_RETRIES:
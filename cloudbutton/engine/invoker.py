@@ -18,7 +18,6 @@
 import os
 import sys
 import json
-import pika
 import time
 import logging
 import random
@@ -40,6 +39,36 @@ REMOTE_INVOKER_MEMORY = 2048
 INVOKER_PROCESSES = 2
 
 
+def create_job_manifest(config, log_level, job):
+    """
+    Values shared by all the calls of a job. They are uploaded once per job,
+    and the workers fetch them instead of receiving them in every payload.
+    """
+    return {'config': config,
+            'log_level': log_level,
+            'func_key': job.func_key,
+            'data_key': job.data_key,
+            'extra_env': job.extra_env,
+            'execution_timeout': job.execution_timeout,
+            'runtime_name': job.runtime_name,
+            'runtime_memory': job.runtime_memory}
+
+
+def create_call_payload(storage_config, job, call_id):
+    """
+    Payload of a call. It only carries the storage config needed to fetch
+    the job manifest, and the values of this call.
+    """
+    return {'storage_config': storage_config,
+            'executor_id': job.executor_id,
+            'job_id': job.job_id,
+            'call_id': call_id,
+            'data_byte_range': job.data_ranges[int(call_id)],
+            'execution_timeout': job.execution_timeout,
+            'host_submit_tstamp': time.time(),
+            'cloudbutton_version': __version__}
+
+
 class FunctionInvoker:
     """
     Module responsible to perform the invocations against the compute backend
@@ -73,6 +102,13 @@ class FunctionInvoker:
             compute_handler = Compute(self.compute_config)
             self.compute_handlers.append(compute_handler)
 
+        # With localhost compute and storage, the calls run through the local channel
+        local_channel = getattr(self.compute_handlers[0].compute_handler, 'channel', None)
+        if local_channel is not None and self.internal_storage.backend == 'localhost' \
+           and not self.is_cloudbutton_function and not self.config['cloudbutton'].get('rabbitmq_monitor', False):
+            local_channel.enable()
+            self.internal_storage.attach_channel(local_channel)
+
         logger.debug('ExecutorID {} - Creating function invoker'.format(self.executor_id))
 
         self.token_bucket_q = Queue()
@@ -203,20 +239,7 @@ class FunctionInvoker:
         """
         Method used to perform the actual invocation against the Compute Backend
         """
-        payload = {'config': self.config,
-                   'log_level': self.log_level,
-                   'func_key': job.func_key,
-                   'data_key': job.data_key,
-                   'extra_env': job.extra_env,
-                   'execution_timeout': job.execution_timeout,
-                   'data_byte_range': job.data_ranges[int(call_id)],
-                   'executor_id': job.executor_id,
-                   'job_id': job.job_id,
-                   'call_id': call_id,
-                   'host_submit_tstamp': time.time(),
-                   'cloudbutton_version': __version__,
-                   'runtime_name': job.runtime_name,
-                   'runtime_memory': job.runtime_memory}
+        payload = create_call_payload(self.storage_config, job, call_id)
 
         # do the invocation
         start = time.time()
@@ -296,6 +319,9 @@ class FunctionInvoker:
                     self.running_flag.value = 1
                     self._start_invoker_process()
 
+                manifest = create_job_manifest(self.config, self.log_level, job)
+                self.internal_storage.put_job_manifest(job.executor_id, job.job_id, manifest)
+
                 log_msg = ('ExecutorID {} | JobID {} - Starting function invocation: {}()  - Total: {} '
                            'activations'.format(job.executor_id, job.job_id, job.function_name, job.total_calls))
                 print(log_msg) if not self.log_level else logger.info(log_msg)
@@ -402,6 +428,7 @@ class JobMonitor:
         exchange = 'pywren-{}-{}'.format(job.executor_id, job.job_id)
         queue_1 = '{}-1'.format(exchange)
 
+        import pika
         params = pika.URLParameters(self.rabbit_amqp_url)
         connection = pika.BlockingConnection(params)
         channel = connection.channel()
@@ -1,3 +1,10 @@
 from .job import create_map_job
 from .job import create_reduce_job
 from .job import clean_job
+from .sort import sample_boundaries
+from .sort import sort_map_function
+from .sort import sort_reduce_function
+from .partitioner import DelimitedRecords
+from .partitioner import FixedWidthRecords
+from .partitioner import LengthPrefixedRecords
+from .partitioner import ParquetRowGroups
@@ -37,7 +37,7 @@ logger = logging.getLogger(__name__)
 def create_map_job(config, internal_storage, executor_id, job_id, map_function, iterdata, runtime_meta,
                    runtime_memory=None, extra_args=None, extra_env=None, obj_chunk_size=None,
                    obj_chunk_number=None, invoke_pool_threads=128, include_modules=[], exclude_modules=[],
-                   execution_timeout=None):
+                   execution_timeout=None, obj_record_format=None, obj_min_partition_bytes=None):
     """
     Wrapper to create a map job.  It integrates COS logic to process objects.
     """
@@ -59,7 +59,8 @@ def create_map_job(config, internal_storage, executor_id, job_id, map_function,
                      'from object storage flow'.format(executor_id, job_id))
         map_iterdata, parts_per_object = create_partitions(config, internal_storage,
                                                            map_iterdata, obj_chunk_size,
-                                                           obj_chunk_number)
+                                                           obj_chunk_number, obj_record_format,
+                                                           obj_min_partition_bytes)
     # ########
 
     job_description = _create_job(config, internal_storage, executor_id,
@@ -93,6 +94,10 @@ def create_reduce_job(config, internal_storage, executor_id, reduce_job_id, redu
         prev_total_partitons = 0
         iterdata = []
         for total_partitions in map_job['parts_per_object']:
+            if isinstance(total_partitions, list):
+                # Packed partitions, which can hold many objects
+                iterdata.append([[map_futures[i] for i in total_partitions]])
+                continue
             iterdata.append([map_futures[prev_total_partitons:prev_total_partitons+total_partitions]])
             prev_total_partitons = prev_total_partitons + total_partitions
 
@@ -214,7 +219,10 @@ def _create_job(config, internal_storage, executor_id, job_id, func, data, runti
     data_bytes, data_ranges = utils.agg_data(data_strs)
     job_description['data_ranges'] = data_ranges
     data_upload_start = time.time()
-    internal_storage.put_data(data_key, data_bytes)
+    if internal_storage.channel is not None:
+        internal_storage.channel.put_job_data(executor_id, job_id, data_key, data_bytes)
+    else:
+        internal_storage.put_data(data_key, data_bytes)
     data_upload_end = time.time()
 
     host_job_meta['data_upload_time'] = round(data_upload_end-data_upload_start, 6)
@@ -243,9 +251,9 @@ def clean_job(jobs_to_clean, storage_config, clean_cloudobjects):
 
     script = """
     from cloudbutton.engine.storage import InternalStorage
-    from cloudbutton.engine.storage.utils import clean_bucket
     from cloudbutton.config import JOBS_PREFIX, TEMP_PREFIX
     import pickle
+    import time
     import os
 
     storage_config = {}
@@ -257,14 +265,16 @@ def clean_job(jobs_to_clean, storage_config, clean_cloudobjects):
         jobs_to_clean = pickle.load(pk)
 
     internal_storage = InternalStorage(storage_config)
-    sh = internal_storage.storage_handler
 
+    prefixes = []
     for executor_id, job_id in jobs_to_clean:
-        prefix = '/'.join([JOBS_PREFIX, executor_id, job_id])
-        clean_bucket(sh, bucket, prefix, log=False)
+        prefixes.append('/'.join([JOBS_PREFIX, executor_id, job_id]))
         if clean_cloudobjects:
-            prefix = '/'.join([TEMP_PREFIX, executor_id, job_id])
-            clean_bucket(sh, bucket, prefix, log=False)
+            prefixes.append('/'.join([TEMP_PREFIX, executor_id, job_id]))
+
+    # Listings can be eventually consistent, so repeat until nothing is left
+    while internal_storage.delete_prefixes(prefixes, bucket):
+        time.sleep(5)
 
     if os.path.exists(jobs_path):
         os.remove(jobs_path)
@@ -15,8 +15,9 @@
 # limitations under the License.
 #
 
+import time
 import logging
-import requests
+from bisect import bisect_left
 from multiprocessing.pool import ThreadPool
 
 from cloudbutton.engine import utils
@@ -27,14 +28,22 @@ logger = logging.getLogger(__name__)
 
 CHUNK_SIZE_MIN = 0*1024  # 0MB
 CHUNK_THRESHOLD = 128*1024  # 128KB
+PROBE_SIZE = 8*1024  # 8KB
+FOOTER_PROBE_SIZE = 64*1024  # 64KB
+ROW_GROUPS_PARTITION_SIZE = 64*1024**2  # 64MB
+LISTING_MIN_PREFIXES = 64
+LISTING_MAX_DEPTH = 3
 
 
-def create_partitions(pywren_config, internal_storage, map_iterdata, chunk_size, chunk_number):
+def create_partitions(pywren_config, internal_storage, map_iterdata, chunk_size, chunk_number,
+                      record_format=None, min_partition_bytes=None):
     """
     Method that returns the function that will create the partitions of the objects in the Cloud
     """
     logger.debug('Starting partitioner')
 
+    record_format = get_record_format(record_format)
+
     parts_per_object = None
 
     sbs = set()
@@ -78,29 +87,13 @@ def create_partitions(pywren_config, internal_storage, map_iterdata, chunk_size,
             storage_handler = internal_storage.storage_handler
         else:
             storage_handler = Storage(pywren_config, sb).get_storage_handler()
-        objects = {}
         if obj_names:
-            for bucket, prefix in obj_names:
-                logger.debug("Listing objects in '{}://{}'".format(sb, '/'.join([bucket, prefix])))
-                if bucket not in objects:
-                    objects[bucket] = []
-                objects[bucket].extend(storage_handler.list_objects(bucket, prefix))
+            bucket_prefixes = obj_names
         elif prefixes:
-            for bucket, prefix in prefixes:
-                logger.debug("Listing objects in '{}://{}'".format(sb, '/'.join([bucket, prefix])))
-                if bucket not in objects:
-                    objects[bucket] = []
-                objects[bucket].extend(storage_handler.list_objects(bucket, prefix))
-        elif buckets:
-            for bucket in buckets:
-                logger.debug("Listing objects in '{}://{}'".format(sb, bucket))
-                objects[bucket] = storage_handler.list_objects(bucket)
-
-        keys_dict = {}
-        for bucket in objects:
-            keys_dict[bucket] = {}
-            for obj in objects[bucket]:
-                keys_dict[bucket][obj['Key']] = obj['Size']
+            bucket_prefixes = prefixes
+        else:
+            bucket_prefixes = {(bucket, '') for bucket in buckets}
+        keys_dict = _list_objects(sb, storage_handler, bucket_prefixes)
 
     if buckets or prefixes:
         partitions, parts_per_object = _split_objects_from_buckets(map_iterdata, keys_dict, chunk_size, chunk_number)
@@ -109,14 +102,100 @@ def create_partitions(pywren_config, internal_storage, map_iterdata, chunk_size,
         partitions, parts_per_object = _split_objects_from_keys(map_iterdata, keys_dict, chunk_size, chunk_number)
 
     elif urls:
+        if record_format is not None:
+            raise Exception('Record-aware partitioning is only supported for objects '
+                            'from a storage backend')
+        if min_partition_bytes:
+            raise Exception('Packing objects into partitions is only supported for objects '
+                            'from a storage backend')
         partitions, parts_per_object = _split_objects_from_urls(map_iterdata, chunk_size, chunk_number)
 
     else:
         raise ValueError('You did not provide any bucket or object key/url')
 
+    if hasattr(record_format, 'select_row_groups'):
+        partitions, parts_per_object = _split_row_groups(partitions, parts_per_object, keys_dict,
+                                                         storage_handler, record_format,
+                                                         chunk_size, chunk_number)
+    elif record_format is not None:
+        partitions, parts_per_object = _resolve_record_boundaries(partitions, parts_per_object, keys_dict,
+                                                                  storage_handler, record_format)
+
+    if min_partition_bytes:
+        partitions, parts_per_object = _pack_partitions(partitions, parts_per_object, keys_dict,
+                                                        min_partition_bytes)
+
     return partitions, parts_per_object
 
 
+class ObjectIndex:
+    """
+    Sorted index of the objects of a bucket, with bisect-based key and prefix lookups
+    """
+    def __init__(self, objects):
+        sizes = {obj['Key']: obj['Size'] for obj in objects}
+        self.keys = sorted(sizes)
+        self.sizes = [sizes[key] for key in self.keys]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, key):
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return self.sizes[index]
+        raise KeyError(key)
+
+    def items(self, prefix=''):
+        index = bisect_left(self.keys, prefix)
+        while index < len(self.keys) and self.keys[index].startswith(prefix):
+            yield self.keys[index], self.sizes[index]
+            index += 1
+
+
+def _list_objects(sb, storage_handler, bucket_prefixes):
+    """
+    Lists the objects under every (bucket, prefix) concurrently. If the storage backend
+    can list common prefixes, the keyspace is first split by the '/' delimiter, so the
+    objects of a single big prefix are also listed in parallel.
+    :return: dictionary with the ObjectIndex of each bucket
+    """
+    start = time.time()
+    # A prefix contained in another prefix of the same bucket is listed only once
+    to_list = []
+    for bucket, prefix in sorted(set(bucket_prefixes)):
+        if to_list and to_list[-1][0] == bucket and prefix.startswith(to_list[-1][1]):
+            continue
+        logger.debug("Listing objects in '{}://{}'".format(sb, '/'.join([bucket, prefix])))
+        to_list.append((bucket, prefix))
+
+    objects = {bucket: [] for bucket, prefix in to_list}
+    pool = ThreadPool(128)
+
+    if hasattr(storage_handler, 'list_common_prefixes'):
+        depth = 0
+        while to_list and len(to_list) < LISTING_MIN_PREFIXES and depth < LISTING_MAX_DEPTH:
+            levels = pool.map(lambda bp: storage_handler.list_common_prefixes(*bp), to_list)
+            next_to_list = []
+            for (bucket, prefix), (level_objects, common_prefixes) in zip(to_list, levels):
+                objects[bucket].extend(level_objects)
+                next_to_list.extend((bucket, common_prefix) for common_prefix in common_prefixes)
+            to_list = next_to_list
+            depth += 1
+
+    listings = pool.map(lambda bp: storage_handler.list_objects(*bp), to_list)
+    pool.close()
+    pool.join()
+
+    for (bucket, prefix), listing in zip(to_list, listings):
+        objects[bucket].extend(listing)
+
+    keys_dict = {bucket: ObjectIndex(objects[bucket]) for bucket in objects}
+    logger.debug('Listed {} objects in {} seconds'.format(sum(len(index) for index in keys_dict.values()),
+                                                         round(time.time()-start, 3)))
+    return keys_dict
+
+
 def _split_objects_from_buckets(map_func_args_list, keys_dict, chunk_size, chunk_number):
     """
     Create partitions from bucket/s
@@ -134,8 +213,8 @@ def _split_objects_from_buckets(map_func_args_list, keys_dict, chunk_size, chunk
         else:
             logger.info('Discovering objects within: {}'.format(bucket))
 
-        for key, obj_size in keys_dict[bucket].items():
-            if prefix in key and obj_size > 0:
+        for key, obj_size in keys_dict[bucket].items(prefix):
+            if obj_size > 0:
                 logger.debug('Creating partitions from object {} size {}'.format(key, obj_size))
                 total_partitions = 0
                 size = 0
@@ -149,7 +228,7 @@ def _split_objects_from_buckets(map_func_args_list, keys_dict, chunk_size, chunk
 
                 if chunk_size is not None and obj_size > chunk_size:
                     while size < obj_size:
-                        brange = (size, size+chunk_size+CHUNK_THRESHOLD)
+                        brange = (size, min(size+chunk_size+CHUNK_THRESHOLD, obj_size-1))
                         size += chunk_size
                         partition = entry.copy()
                         partition['obj'] = CloudObject(sb, bucket, key)
@@ -163,6 +242,7 @@ def _split_objects_from_buckets(map_func_args_list, keys_dict, chunk_size, chunk
                     partition['obj'] = CloudObject(sb, bucket, key)
                     partition['obj'].data_byte_range = None
                     partition['obj'].chunk_size = chunk_size
+                    partition['obj'].size = obj_size
                     partition['obj'].part = total_partitions
                     partitions.append(partition)
                     total_partitions = 1
@@ -203,7 +283,7 @@ def _split_objects_from_keys(map_func_args_list, keys_dict, chunk_size, chunk_nu
         if chunk_size is not None and obj_size > chunk_size:
             size = 0
             while size < obj_size:
-                brange = (size, size+chunk_size+CHUNK_THRESHOLD)
+                brange = (size, min(size+chunk_size+CHUNK_THRESHOLD, obj_size-1))
                 size += chunk_size
                 partition = entry.copy()
                 partition['obj'] = CloudObject(sb, bucket, key)
@@ -217,6 +297,7 @@ def _split_objects_from_keys(map_func_args_list, keys_dict, chunk_size, chunk_nu
             partition['obj'] = CloudObject(sb, bucket, key)
             partition['obj'].data_byte_range = None
             partition['obj'].chunk_size = chunk_size
+            partition['obj'].size = obj_size
             partition['obj'].part = total_partitions
             partitions.append(partition)
             total_partitions = 1
@@ -234,33 +315,45 @@ def _split_objects_from_urls(map_func_args_list, chunk_size, chunk_number):
         logger.info('Creating chunks from urls...')
     partitions = []
     parts_per_object = []
+    session = utils.get_http_session()
+
+    # Every url is inspected only once, even if it appears in several entries
+    object_urls = list({entry['url']: None for entry in map_func_args_list})
+
+    def _head(object_url):
+        logger.info(object_url)
+        return object_url, session.head(object_url, allow_redirects=True).headers
+
+    pool = ThreadPool(min(len(object_urls), utils.HTTP_POOL_MAXSIZE) or 1)
+    headers = dict(pool.map(_head, object_urls))
+    pool.close()
+    pool.join()
 
-    def _split(entry):
+    for entry in map_func_args_list:
         obj_size = None
         total_partitions = 0
         object_url = entry['url']
-        metadata = requests.head(object_url)
-
-        logger.info(object_url)
+        metadata_headers = headers[object_url]
 
-        if 'content-length' in metadata.headers:
-            obj_size = int(metadata.headers['content-length'])
+        if 'content-length' in metadata_headers:
+            obj_size = int(metadata_headers['content-length'])
 
         chunk_size_co = chunk_size
 
-        if chunk_number:
+        # Without its size, the object can only be a single partition
+        if chunk_number and obj_size is not None:
             chunk_rest = obj_size % chunk_number
-            chunk_size_co = chunk_size_co // chunk_number + chunk_rest
+            chunk_size_co = obj_size // chunk_number + chunk_rest
 
         if chunk_size_co and chunk_size_co < CHUNK_SIZE_MIN:
             chunk_size_co = None
 
-        if 'accept-ranges' in metadata.headers and chunk_size_co is not None \
+        if 'accept-ranges' in metadata_headers and chunk_size_co is not None \
            and obj_size is not None and obj_size > chunk_size_co:
             size = 0
 
             while size < obj_size:
-                brange = (size, size+chunk_size_co+CHUNK_THRESHOLD)
+                brange = (size, min(size+chunk_size_co+CHUNK_THRESHOLD, obj_size-1))
                 size += chunk_size_co
                 partition = entry.copy()
                 partition['url'] = CloudObjectUrl(object_url)
@@ -281,9 +374,400 @@ def _split_objects_from_urls(map_func_args_list, chunk_size, chunk_number):
 
         parts_per_object.append(total_partitions)
 
+    return partitions, parts_per_object
+
+
+def _resolve_record_boundaries(partitions, parts_per_object, keys_dict, storage_handler, record_format):
+    """
+    Replaces the overlapping byte ranges of the chunks by exact, non-overlapping
+    ranges that start and end at record boundaries
+    """
+    logger.info('Resolving record boundaries of the dataset chunks ...')
+    objects = []
+    first_part = 0
+    for total_partitions in parts_per_object:
+        objects.append(partitions[first_part:first_part+total_partitions])
+        first_part += total_partitions
+
+    def _resolve(obj_partitions):
+        obj = obj_partitions[0]['obj']
+        if obj.data_byte_range is None:
+            obj.record_format = record_format
+            return obj_partitions
+
+        obj_size = keys_dict[obj.bucket][obj.key]
+
+        def read_range(first_byte, last_byte):
+            extra_get_args = {'Range': 'bytes={}-{}'.format(first_byte, last_byte)}
+            return storage_handler.get_object(obj.bucket, obj.key, extra_get_args=extra_get_args)
+
+        split_points = [p['obj'].data_byte_range[0] for p in obj_partitions[1:]]
+        boundaries = [0] + record_format.resolve_boundaries(read_range, split_points, obj_size) + [obj_size]
+
+        new_partitions = []
+        for partition, first_byte, end_byte in zip(obj_partitions, boundaries[:-1], boundaries[1:]):
+            # A record longer than the chunk size spans several split points
+            if end_byte <= first_byte:
+                continue
+            partition['obj'].data_byte_range = (first_byte, end_byte-1)
+            partition['obj'].chunk_size = end_byte - first_byte
+            partition['obj'].part = len(new_partitions)
+            partition['obj'].record_format = record_format
+            new_partitions.append(partition)
+
+        return new_partitions
+
     pool = ThreadPool(128)
-    pool.map(_split, map_func_args_list)
+    resolved_objects = pool.map(_resolve, objects)
     pool.close()
     pool.join()
 
+    partitions = [partition for obj_partitions in resolved_objects for partition in obj_partitions]
+    parts_per_object = [len(obj_partitions) for obj_partitions in resolved_objects]
+
     return partitions, parts_per_object
+
+
+def _split_row_groups(partitions, parts_per_object, keys_dict, storage_handler, columnar_format,
+                      chunk_size, chunk_number):
+    """
+    Replaces the byte-range chunks of columnar objects by partitions made of whole
+    row groups. The footer of every object is read with small ranged GETs, the row
+    groups discarded by the filters are skipped, and the remaining ones are grouped
+    by the compressed size of the projected columns, into partitions of up to
+    ROW_GROUPS_PARTITION_SIZE if no chunk size or number is given.
+    """
+    logger.info('Creating dataset partitions from row groups ...')
+    objects = []
+    first_part = 0
+    for total_partitions in parts_per_object:
+        objects.append(partitions[first_part:first_part+total_partitions])
+        first_part += total_partitions
+
+    def _split(obj_partitions):
+        entry = obj_partitions[0]
+        obj = entry['obj']
+        obj_size = keys_dict[obj.bucket][obj.key]
+
+        def read_range(first_byte, last_byte):
+            extra_get_args = {'Range': 'bytes={}-{}'.format(first_byte, last_byte)}
+            return storage_handler.get_object(obj.bucket, obj.key, extra_get_args=extra_get_args)
+
+        metadata = columnar_format.read_metadata(read_range, obj_size)
+        row_groups = columnar_format.select_row_groups(metadata)
+        row_groups_size = [columnar_format.row_group_size(metadata, rg) for rg in row_groups]
+
+        target_size = chunk_size or ROW_GROUPS_PARTITION_SIZE
+        if chunk_number:
+            target_size = sum(row_groups_size) // chunk_number
+
+        groups = []
+        group_size = 0
+        for rg, rg_size in zip(row_groups, row_groups_size):
+            if not groups or group_size >= (target_size or 1):
+                groups.append([])
+                group_size = 0
+            groups[-1].append(rg)
+            group_size += rg_size
+
+        new_partitions = []
+        for group in groups:
+            partition = entry.copy()
+            partition['obj'] = CloudObject(obj.backend, obj.bucket, obj.key)
+            partition['obj'].data_byte_range = columnar_format.row_groups_range(metadata, group)
+            partition['obj'].chunk_size = sum(columnar_format.row_group_size(metadata, rg) for rg in group)
+            partition['obj'].size = obj_size
+            partition['obj'].part = len(new_partitions)
+            partition['obj'].row_groups = group
+            partition['obj'].record_format = columnar_format
+            new_partitions.append(partition)
+
+        return new_partitions
+
+    pool = ThreadPool(128)
+    split_objects = pool.map(_split, objects)
+    pool.close()
+    pool.join()
+
+    # Objects whose row groups were all discarded by the filters get no partitions
+    split_objects = [obj_partitions for obj_partitions in split_objects if obj_partitions]
+    partitions = [partition for obj_partitions in split_objects for partition in obj_partitions]
+    parts_per_object = [len(obj_partitions) for obj_partitions in split_objects]
+    logger.debug('Created {} partitions from the row groups of {} objects'.format(len(partitions), len(objects)))
+
+    return partitions, parts_per_object
+
+
+def _pack_partitions(partitions, parts_per_object, keys_dict, min_partition_bytes):
+    """
+    Packs consecutive whole objects into partitions of at least min_partition_bytes,
+    so that many small objects are processed by a single function activation.
+    The 'obj' of every partition becomes a list of CloudObjects. Chunked objects keep
+    their partitions. As the partitions of an object are no longer consecutive, the
+    returned parts_per_object holds the list of the indexes of the partitions of each object.
+    """
+    logger.info('Packing dataset objects into partitions of {} ...'.format(utils.sizeof_fmt(min_partition_bytes)))
+    packed_partitions = []
+    object_partitions = []
+    pack = None
+    pack_size = 0
+
+    def _args(partition):
+        return {k: v for k, v in partition.items() if k != 'obj'}
+
+    first_part = 0
+    for total_partitions in parts_per_object:
+        obj_partitions = partitions[first_part:first_part+total_partitions]
+        first_part += total_partitions
+        obj = obj_partitions[0]['obj']
+
+        if total_partitions > 1 or obj.data_byte_range is not None:
+            pack = None
+            object_partitions.append(list(range(len(packed_partitions),
+                                                len(packed_partitions)+total_partitions)))
+            for partition in obj_partitions:
+                partition['obj'] = [partition['obj']]
+                packed_partitions.append(partition)
+            continue
+
+        if pack is None or pack_size >= min_partition_bytes or _args(pack) != _args(obj_partitions[0]):
+            pack = obj_partitions[0]
+            pack['obj'] = []
+            pack_size = 0
+            packed_partitions.append(pack)
+        object_partitions.append([len(packed_partitions)-1])
+        pack['obj'].append(obj)
+        pack_size += keys_dict[obj.bucket][obj.key]
+
+    logger.debug('Packed {} objects into {} partitions'.format(len(parts_per_object), len(packed_partitions)))
+
+    return packed_partitions, object_partitions
+
+
+def get_record_format(record_format):
+    """
+    Returns the record format instance of a delimiter, a record size, 'parquet' or a record format
+    """
+    if record_format is None or hasattr(record_format, 'resolve_boundaries') \
+       or hasattr(record_format, 'select_row_groups'):
+        return record_format
+    if record_format == 'parquet':
+        return ParquetRowGroups()
+    if type(record_format) == str:
+        return DelimitedRecords(record_format.encode())
+    if type(record_format) == bytes:
+        return DelimitedRecords(record_format)
+    if type(record_format) == int:
+        return FixedWidthRecords(record_format)
+    raise ValueError('Invalid record format: {}'.format(record_format))
+
+
+class DelimitedRecords:
+    """
+    Records separated by a delimiter. Boundaries are found by reading
+    small byte ranges after each split point until the delimiter shows up.
+    """
+    def __init__(self, delimiter=b'\n', probe_size=PROBE_SIZE):
+        self.delimiter = delimiter
+        self.probe_size = max(probe_size, len(delimiter) + 1)
+
+    def _resolve_boundary(self, read_range, offset, obj_size):
+        # Start before the split point, so a delimiter ending right before it is found
+        pos = max(offset - len(self.delimiter), 0)
+        while pos < obj_size:
+            last_byte = min(pos + self.probe_size, obj_size) - 1
+            data = read_range(pos, last_byte)
+            index = data.find(self.delimiter)
+            if index != -1:
+                return pos + index + len(self.delimiter)
+            pos = last_byte + 1 - (len(self.delimiter) - 1)
+        return obj_size
+
+    def resolve_boundaries(self, read_range, offsets, obj_size):
+        if len(offsets) < 2:
+            return [self._resolve_boundary(read_range, offset, obj_size) for offset in offsets]
+        pool = ThreadPool(min(len(offsets), 32))
+        boundaries = pool.map(lambda offset: self._resolve_boundary(read_range, offset, obj_size), offsets)
+        pool.close()
+        pool.join()
+        return boundaries
+
+    def iter_records(self, stream, buffer_size=PROBE_SIZE):
+        pending = b''
+        while True:
+            data = stream.read(buffer_size)
+            if not data:
+                break
+            records = (pending + data).split(self.delimiter)
+            pending = records.pop()
+            yield from records
+        if pending:
+            yield pending
+
+
+class FixedWidthRecords:
+    """
+    Records of a fixed size. Boundaries are computed without reading the object.
+    """
+    def __init__(self, record_size):
+        self.record_size = record_size
+
+    def resolve_boundaries(self, read_range, offsets, obj_size):
+        return [min(-(-offset // self.record_size) * self.record_size, obj_size) for offset in offsets]
+
+    def iter_records(self, stream):
+        while True:
+            record = stream.read(self.record_size)
+            if not record:
+                break
+            yield record
+
+
+class LengthPrefixedRecords:
+    """
+    Records preceded by a header with their length. The headers must be walked
+    from the beginning of the object, so the boundaries of one object are resolved
+    sequentially, reading as many headers as possible with each ranged read.
+    """
+    def __init__(self, header_size=4, byteorder='big', probe_size=PROBE_SIZE):
+        self.header_size = header_size
+        self.byteorder = byteorder
+        self.probe_size = max(probe_size, header_size)
+
+    def resolve_boundaries(self, read_range, offsets, obj_size):
+        boundaries = []
+        pos = 0
+        buf_start, buf = 0, b''
+        for offset in offsets:
+            while pos < min(offset, obj_size):
+                if pos < buf_start or pos + self.header_size > buf_start + len(buf):
+                    buf_start = pos
+                    buf = read_range(pos, min(pos + self.probe_size, obj_size) - 1)
+                header = buf[pos-buf_start:pos-buf_start+self.header_size]
+                pos += self.header_size + int.from_bytes(header, self.byteorder)
+            boundaries.append(min(pos, obj_size))
+        return boundaries
+
+    def iter_records(self, stream):
+        while True:
+            header = stream.read(self.header_size)
+            if not header:
+                break
+            yield stream.read(int.from_bytes(header, self.byteorder))
+
+
+class ParquetRowGroups:
+    """
+    Parquet objects, split at row-group granularity. Only the footer is read to
+    create the partitions, and the functions only fetch the column chunks of the
+    projected columns of their row groups.
+    :param columns: names of the columns to read. Default None (all columns)
+    :param filters: list of (column, op, value) tuples, all of which the rows must
+                    satisfy. op is one of '==', '!=', '<', '<=', '>', '>=' or 'in'.
+                    Row groups whose statistics rule them out are never read.
+    """
+    FILTER_OPS = ('==', '!=', '<', '<=', '>', '>=', 'in')
+
+    def __init__(self, columns=None, filters=None, footer_probe_size=FOOTER_PROBE_SIZE):
+        self.columns = columns
+        self.filters = filters or []
+        self.footer_probe_size = footer_probe_size
+        for column, op, value in self.filters:
+            if op not in self.FILTER_OPS:
+                raise ValueError('Invalid filter operator: {}'.format(op))
+
+    def read_metadata(self, read_range, obj_size):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tail = read_range(max(obj_size - self.footer_probe_size, 0), obj_size-1)
+        if tail[-4:] != b'PAR1':
+            raise Exception('Invalid Parquet object: missing footer magic number')
+        footer_size = int.from_bytes(tail[-8:-4], 'little') + 8
+        if footer_size > len(tail):
+            tail = read_range(obj_size - footer_size, obj_size - len(tail) - 1) + tail
+        return pq.read_metadata(pa.BufferReader(tail[-footer_size:]))
+
+    def _column_chunks(self, metadata, row_group):
+        rg = metadata.row_group(row_group)
+        for i in range(rg.num_columns):
+            column = rg.column(i)
+            if self.columns is None or column.path_in_schema.split('.')[0] in self.columns:
+                yield column
+
+    @staticmethod
+    def _may_match(statistics, op, value):
+        if statistics is None or not statistics.has_min_max:
+            return True
+        min_value, max_value = statistics.min, statistics.max
+        if op == '==':
+            return min_value <= value <= max_value
+        if op == '!=':
+            return not (min_value == max_value == value)
+        if op == '<':
+            return min_value < value
+        if op == '<=':
+            return min_value <= value
+        if op == '>':
+            return max_value > value
+        if op == '>=':
+            return max_value >= value
+        return any(min_value <= v <= max_value for v in value)
+
+    def select_row_groups(self, metadata):
+        selected = []
+        for row_group in range(metadata.num_row_groups):
+            rg = metadata.row_group(row_group)
+            if rg.num_rows == 0:
+                continue
+            columns = {rg.column(i).path_in_schema: rg.column(i) for i in range(rg.num_columns)}
+            if all(column not in columns or self._may_match(columns[column].statistics, op, value)
+                   for column, op, value in self.filters):
+                selected.append(row_group)
+        return selected
+
+    def row_group_size(self, metadata, row_group):
+        return sum(column.total_compressed_size for column in self._column_chunks(metadata, row_group))
+
+    def row_groups_range(self, metadata, row_groups):
+        first_byte, end_byte = None, None
+        for row_group in row_groups:
+            rg = metadata.row_group(row_group)
+            for i in range(rg.num_columns):
+                column = rg.column(i)
+                start = column.data_page_offset
+                if column.has_dictionary_page and column.dictionary_page_offset:
+                    start = min(start, column.dictionary_page_offset)
+                first_byte = start if first_byte is None else min(first_byte, start)
+                end = start + column.total_compressed_size
+                end_byte = end if end_byte is None else max(end_byte, end)
+        return (first_byte, end_byte-1)
+
+    def read_table(self, stream, row_groups):
+        """
+        Reads the projected columns of the given row groups, and drops the rows
+        that do not satisfy the filters
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        columns = self.columns
+        if columns is not None and self.filters:
+            columns = list(columns) + [c for c, op, v in self.filters if c not in columns]
+        table = pq.ParquetFile(stream).read_row_groups(row_groups, columns=columns)
+        if self.filters:
+            # pq.filters_to_expression needs pyarrow 10
+            compare = {'==': pc.equal, '!=': pc.not_equal, '<': pc.less,
+                       '<=': pc.less_equal, '>': pc.greater, '>=': pc.greater_equal}
+            mask = None
+            for column, op, value in self.filters:
+                if op == 'in':
+                    column_mask = pc.is_in(table[column], value_set=pa.array(value))
+                else:
+                    column_mask = compare[op](table[column], value)
+                mask = column_mask if mask is None else pc.and_(mask, column_mask)
+            table = table.filter(mask)
+        if self.columns is not None:
+            table = table.select(self.columns)
+        return table
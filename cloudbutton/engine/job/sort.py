@@ -0,0 +1,144 @@
+#
+# Copyright Cloudlab URV 2020
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import heapq
+import logging
+from bisect import bisect_right
+from multiprocessing.pool import ThreadPool
+
+from cloudbutton.engine import utils
+from cloudbutton.engine.storage import Storage, InternalStorage
+from cloudbutton.engine.storage.utils import CloudObject
+from cloudbutton.engine.job.partitioner import create_partitions
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_READ_SIZE = 64*1024  # 64KB
+SAMPLES_PER_OBJECT = 16
+
+
+def _record_key(record, key):
+    return record if key is None else key(record.decode('utf-8'))
+
+
+def _split_records(data):
+    return [record for record in data.split(b'\n') if record]
+
+
+def sample_boundaries(pywren_config, internal_storage, obj_urls, key=None, num_partitions=None,
+                      samples_per_object=SAMPLES_PER_OBJECT, sample_size=SAMPLE_READ_SIZE):
+    """
+    Reads a few small byte ranges of every object and computes the
+    range-partition boundaries used to route the records to the reducers
+    :return: list of boundaries, number of partitions
+    """
+    logger.debug('Sampling records to compute range-partition boundaries')
+    iterdata = [{'obj': obj} for obj in utils.format_data(obj_urls, None)]
+    partitions, parts_per_object = create_partitions(pywren_config, internal_storage,
+                                                     iterdata, None, samples_per_object)
+    if not partitions:
+        raise ValueError('There are no objects to sort in {}'.format(obj_urls))
+    if num_partitions is None:
+        num_partitions = len(parts_per_object)
+
+    sb = partitions[0]['obj'].backend
+    if sb == internal_storage.backend:
+        storage_handler = internal_storage.storage_handler
+    else:
+        storage_handler = Storage(pywren_config, sb).get_storage_handler()
+
+    def _sample(partition):
+        obj = partition['obj']
+        first_byte = obj.data_byte_range[0] if obj.data_byte_range else 0
+        extra_get_args = {'Range': 'bytes={}-{}'.format(first_byte, first_byte+sample_size-1)}
+        data = storage_handler.get_object(obj.bucket, obj.key, extra_get_args=extra_get_args)
+        records = data.split(b'\n')
+        # The first record is cut unless the sample starts the object,
+        # and the last one is cut unless the sample reached the end
+        if first_byte > 0:
+            records = records[1:]
+        if len(data) == sample_size:
+            records = records[:-1]
+        return [_record_key(record, key) for record in records if record]
+
+    pool = ThreadPool(128)
+    samples = pool.map(_sample, partitions)
+    pool.close()
+    pool.join()
+
+    sample_keys = sorted(k for sample in samples for k in sample)
+    logger.debug('Sampled {} records from {} objects'.format(len(sample_keys), len(parts_per_object)))
+
+    boundaries = []
+    if sample_keys:
+        for i in range(1, num_partitions):
+            boundaries.append(sample_keys[i*len(sample_keys)//num_partitions])
+
+    return boundaries, num_partitions
+
+
+def create_run_key(runs_prefix, range_id, call_id):
+    return '/'.join([runs_prefix, str(range_id).zfill(5), str(call_id).zfill(5)])
+
+
+def create_sorted_key(output_prefix, range_id):
+    return '/'.join([output_prefix, 'part-{}'.format(str(range_id).zfill(5))])
+
+
+def sort_map_function(obj, id, boundaries, key, storage_config, runs_prefix):
+    """
+    Splits a chunk into per-range sorted runs and stores them
+    """
+    internal_storage = InternalStorage(storage_config)
+    runs = [[] for _ in range(len(boundaries)+1)]
+
+    for record in _split_records(obj.data_stream.read()):
+        record_key = _record_key(record, key)
+        runs[bisect_right(boundaries, record_key)].append((record_key, record))
+
+    total_records = 0
+    for range_id, run in enumerate(runs):
+        if run:
+            run.sort(key=lambda kr: kr[0])
+            run_key = create_run_key(runs_prefix, range_id, id)
+            internal_storage.put_data(run_key, b'\n'.join(r for _, r in run) + b'\n')
+            total_records += len(run)
+
+    return total_records
+
+
+def sort_reduce_function(range_id, key, storage_config, runs_prefix, output_bucket, output_prefix):
+    """
+    Merges the sorted runs of one range and writes the sorted output object
+    """
+    internal_storage = InternalStorage(storage_config)
+    range_prefix = '/'.join([runs_prefix, str(range_id).zfill(5)]) + '/'
+    run_keys = sorted(internal_storage.storage_handler.list_keys(internal_storage.bucket, range_prefix))
+
+    pool = ThreadPool(min(len(run_keys), 64) or 1)
+    runs = pool.map(lambda run_key: _split_records(internal_storage.get_data(run_key)), run_keys)
+    pool.close()
+    pool.join()
+
+    merged = heapq.merge(*runs, key=lambda record: _record_key(record, key))
+    body = b''.join(record + b'\n' for record in merged)
+
+    output_key = create_sorted_key(output_prefix, range_id)
+    internal_storage.storage_handler.put_object(output_bucket, output_key, body)
+    if run_keys:
+        internal_storage.storage_handler.delete_objects(internal_storage.bucket, run_keys)
+
+    return CloudObject(internal_storage.backend, output_bucket, output_key)
@@ -0,0 +1,106 @@
+#
+# Copyright Cloudlab URV 2020
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+ASYNC_MAX_WORKERS = 64
+ASYNC_MAX_CONCURRENCY = 512
+
+
+class AsyncStorageAdapter:
+    """
+    Asyncio interface of a storage backend without native async support.
+    The blocking calls run in a bounded thread pool, so any number of
+    concurrent requests share at most max_workers OS threads.
+    """
+    def __init__(self, storage_handler, max_workers=ASYNC_MAX_WORKERS):
+        self.storage_handler = storage_handler
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def put_object(self, bucket_name, key, data):
+        return await self._run(self.storage_handler.put_object, bucket_name, key, data)
+
+    async def get_object(self, bucket_name, key, extra_get_args={}):
+        return await self._run(self.storage_handler.get_object, bucket_name, key,
+                               extra_get_args=dict(extra_get_args))
+
+    async def head_object(self, bucket_name, key):
+        return await self._run(self.storage_handler.head_object, bucket_name, key)
+
+    async def list_keys(self, bucket_name, prefix=None):
+        return await self._run(self.storage_handler.list_keys, bucket_name, prefix)
+
+    async def delete_objects(self, bucket_name, key_list):
+        return await self._run(self.storage_handler.delete_objects, bucket_name, key_list)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def get_async_handler(storage_handler):
+    """
+    Returns the native async handler of a storage backend, if it has one,
+    or an AsyncStorageAdapter around it
+    """
+    if hasattr(storage_handler, 'get_async_handler'):
+        return storage_handler.get_async_handler()
+    return AsyncStorageAdapter(storage_handler)
+
+
+async def gather_bounded(coros, max_concurrency=ASYNC_MAX_CONCURRENCY):
+    """
+    Like asyncio.gather, but with at most max_concurrency coroutines running at once
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _bounded(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*[_bounded(coro) for coro in coros])
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except (AttributeError, RuntimeError):
+        return None
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine to completion from synchronous code. If the calling
+    thread already runs an event loop (e.g. a notebook), the coroutine runs
+    in a new loop of a helper thread.
+    """
+    if _running_loop() is not None:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(run_sync, coro).result()
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
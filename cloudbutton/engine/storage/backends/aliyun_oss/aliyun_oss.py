@@ -15,7 +15,8 @@
 #
 
 import logging
-from cloudbutton.engine.storage.utils import StorageNoSuchKeyError
+from cloudbutton.engine.storage.utils import StorageNoSuchKeyError, get_transfer_config, \
+    data_size, multipart_upload, parallel_download
 from cloudbutton.engine.utils import is_cloudbutton_function
 import oss2
 
@@ -35,6 +36,7 @@ class AliyunObjectStorageServiceBackend:
             self.endpoint = self.config['public_endpoint']
 
         self.bucket = oss2.Bucket(self.auth, self.endpoint, self.bucket)
+        self.multipart_threshold, self.part_size, self.max_concurrency = get_transfer_config(self.config)
 
     def get_client(self):
         return self
@@ -46,7 +48,7 @@ class AliyunObjectStorageServiceBackend:
         :param bucket_name: bucket name
         :param key: key of the object.
         :param data: data of the object
-        :type data: str/bytes
+        :type data: str/bytes/file-like
         :return: None
         """
         if isinstance(data, str):
@@ -54,7 +56,12 @@ class AliyunObjectStorageServiceBackend:
 
         try: 
             bucket = self._connect_bucket(bucket_name)
-            bucket.put_object(key, data)
+            # The size of streams is unknown, so they are uploaded in parts
+            size = data_size(data)
+            if size is None or size > self.multipart_threshold:
+                self._multipart_upload(bucket, key, data)
+            else:
+                bucket.put_object(key, data)
         except oss2.exceptions.NoSuchBucket:
             StorageNoSuchKeyError(bucket_name, '')
 
@@ -74,6 +81,8 @@ class AliyunObjectStorageServiceBackend:
 
         try:
             bucket = self._connect_bucket(bucket_name)
+            if not stream and not extra_get_args:
+                return self._parallel_get(bucket, key)
             data = bucket.get_object(key=key, **extra_get_args)
             if stream:
                 return data
@@ -189,6 +198,41 @@ class AliyunObjectStorageServiceBackend:
         except (oss2.exceptions.NoSuchKey, oss2.exceptions.NoSuchBucket):
             StorageNoSuchKeyError(bucket_name, prefix)
 
+    def _multipart_upload(self, bucket, key, data):
+        upload_id = bucket.init_multipart_upload(key).upload_id
+
+        def _upload_part(part_number, part):
+            return oss2.models.PartInfo(part_number, bucket.upload_part(key, upload_id, part_number, part).etag)
+
+        try:
+            parts = multipart_upload(data, _upload_part, self.part_size, self.max_concurrency)
+            bucket.complete_multipart_upload(key, upload_id, parts)
+        except Exception:
+            bucket.abort_multipart_upload(key, upload_id)
+            raise
+
+    def _parallel_get(self, bucket, key):
+        # The first GET asks for the first multipart_threshold bytes, and its
+        # Content-Range tells if the rest must be downloaded in parallel,
+        # pinned to its ETag so that all the ranges read the same version
+        result = bucket.get_object(key=key, byte_range=(0, self.multipart_threshold-1))
+        data = result.read()
+        content_range = result.headers.get('Content-Range')
+        obj_size = int(content_range.rsplit('/', 1)[1]) if content_range else len(data)
+        if obj_size <= len(data):
+            return data
+
+        headers = {'If-Match': result.etag} if result.etag else None
+
+        def _get_range(first_byte, last_byte):
+            return bucket.get_object(key=key, byte_range=(first_byte, last_byte), headers=headers).read()
+
+        try:
+            return data + parallel_download(_get_range, len(data), obj_size, self.part_size, self.max_concurrency)
+        except oss2.exceptions.PreconditionFailed:
+            # The object was overwritten during the download, start again with the new version
+            return self._parallel_get(bucket, key)
+
     def _connect_bucket(self, bucket_name):
         if self.bucket and self.bucket.bucket_name == bucket_name:
             bucket = self.bucket
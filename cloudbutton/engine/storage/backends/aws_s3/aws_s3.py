@@ -18,7 +18,8 @@ import logging
 import boto3
 import botocore
 from datetime import datetime
-from ...utils import StorageNoSuchKeyError
+from ...utils import StorageNoSuchKeyError, get_transfer_config, s3_put_object, s3_get_object, \
+    s3_list_common_prefixes
 
 logging.getLogger('boto3').setLevel(logging.CRITICAL)
 logging.getLogger('botocore').setLevel(logging.CRITICAL)
@@ -43,6 +44,7 @@ class S3Backend:
                                       aws_secret_access_key=s3_config['secret_access_key'],
                                       config=client_config,
                                       endpoint_url=service_endpoint)
+        self.multipart_threshold, self.part_size, self.max_concurrency = get_transfer_config(s3_config)
 
     def get_client(self):
         """
@@ -60,8 +62,8 @@ class S3Backend:
         :return: None
         """
         try:
-            res = self.s3_client.put_object(
-                Bucket=bucket_name, Key=key, Body=data)
+            res = s3_put_object(self.s3_client, bucket_name, key, data, self.multipart_threshold,
+                                self.part_size, self.max_concurrency)
             status = 'OK' if res['ResponseMetadata']['HTTPStatusCode'] == 200 else 'Error'
             try:
                 logger.debug(
@@ -82,6 +84,9 @@ class S3Backend:
         :rtype: str/bytes
         """
         try:
+            if not stream and not extra_get_args:
+                return s3_get_object(self.s3_client, bucket_name, key, self.multipart_threshold,
+                                     self.part_size, self.max_concurrency)
             r = self.s3_client.get_object(
                 Bucket=bucket_name, Key=key, **extra_get_args)
             if stream:
@@ -190,6 +195,17 @@ class S3Backend:
             else:
                 raise e
 
+    def list_common_prefixes(self, bucket_name, prefix=None, delimiter='/'):
+        """
+        Return the objects and the common prefixes found right under the given prefix.
+        :param bucket_name: Name of the bucket.
+        :param prefix: Prefix to filter object names.
+        :param delimiter: Character that separates the levels of the keyspace.
+        :return: List of objects and list of common prefixes under the given prefix.
+        :rtype: tuple of lists
+        """
+        return s3_list_common_prefixes(self.s3_client, bucket_name, prefix, delimiter)
+
     def list_keys(self, bucket_name, prefix=None):
         """
         Return a list of keys for the given prefix.
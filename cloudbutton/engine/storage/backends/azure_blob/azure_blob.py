@@ -15,7 +15,7 @@
 #
 
 import logging
-from cloudbutton.engine.storage.utils import StorageNoSuchKeyError
+from cloudbutton.engine.storage.utils import StorageNoSuchKeyError, get_transfer_config
 from azure.storage.blob import BlockBlobService
 from azure.common import AzureMissingResourceHttpError
 from io import BytesIO
@@ -28,6 +28,12 @@ class AzureBlobStorageBackend:
     def __init__(self, azure_blob_config, bucket=None, executor_id=None):
         self.blob_client = BlockBlobService(account_name=azure_blob_config['account_name'],
                                             account_key=azure_blob_config['account_key'])
+        # Larger blobs are uploaded in blocks and downloaded in chunks, max_concurrency at a time
+        self.multipart_threshold, self.part_size, self.max_concurrency = get_transfer_config(azure_blob_config)
+        self.blob_client.MAX_SINGLE_PUT_SIZE = self.multipart_threshold
+        self.blob_client.MAX_BLOCK_SIZE = self.part_size
+        self.blob_client.MAX_SINGLE_GET_SIZE = self.multipart_threshold
+        self.blob_client.MAX_CHUNK_GET_SIZE = self.part_size
 
     def get_client(self):
         """
@@ -48,7 +54,7 @@ class AzureBlobStorageBackend:
         if isinstance(data, str):
             data = data.encode()
 
-        self.blob_client.create_blob_from_bytes(bucket_name, key, data)
+        self.blob_client.create_blob_from_bytes(bucket_name, key, data, max_connections=self.max_concurrency)
 
     def get_object(self, bucket_name, key, stream=False, extra_get_args={}):
         """
@@ -69,7 +75,8 @@ class AzureBlobStorageBackend:
                 stream_out.seek(0)
                 return stream_out
             else:
-                data = self.blob_client.get_blob_to_bytes(bucket_name, key, **extra_get_args)
+                data = self.blob_client.get_blob_to_bytes(bucket_name, key, max_connections=self.max_concurrency,
+                                                         **extra_get_args)
                 return data.content
 
         except AzureMissingResourceHttpError:
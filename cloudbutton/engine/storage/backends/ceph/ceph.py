@@ -17,7 +17,8 @@
 import logging
 import ibm_boto3
 import ibm_botocore
-from cloudbutton.engine.storage.utils import StorageNoSuchKeyError
+from cloudbutton.engine.storage.utils import StorageNoSuchKeyError, get_transfer_config, \
+    s3_put_object, s3_get_object, s3_list_common_prefixes
 from cloudbutton.engine.utils import sizeof_fmt, is_cloudbutton_function
 
 logging.getLogger('ibm_boto3').setLevel(logging.CRITICAL)
@@ -59,6 +60,7 @@ class CephStorageBackend:
                                            config=client_config,
                                            endpoint_url=service_endpoint)
 
+        self.multipart_threshold, self.part_size, self.max_concurrency = get_transfer_config(ceph_config)
         logger.debug("Ceph client created successfully")
 
     def get_client(self):
@@ -80,7 +82,8 @@ class CephStorageBackend:
         status = None
         while status is None:
             try:
-                res = self.cos_client.put_object(Bucket=bucket_name, Key=key, Body=data)
+                res = s3_put_object(self.cos_client, bucket_name, key, data, self.multipart_threshold,
+                                    self.part_size, self.max_concurrency)
                 status = 'OK' if res['ResponseMetadata']['HTTPStatusCode'] == 200 else 'Error'
                 try:
                     logger.debug('PUT Object {} - Size: {} - {}'.format(key, sizeof_fmt(len(data)), status))
@@ -109,11 +112,12 @@ class CephStorageBackend:
         retries = 0
         while data is None:
             try:
-                r = self.cos_client.get_object(Bucket=bucket_name, Key=key, **extra_get_args)
-                if stream:
-                    data = r['Body']
+                if not stream and not extra_get_args:
+                    data = s3_get_object(self.cos_client, bucket_name, key, self.multipart_threshold,
+                                         self.part_size, self.max_concurrency)
                 else:
-                    data = r['Body'].read()
+                    r = self.cos_client.get_object(Bucket=bucket_name, Key=key, **extra_get_args)
+                    data = r['Body'] if stream else r['Body'].read()
             except ibm_botocore.exceptions.ClientError as e:
                 if e.response['Error']['Code'] == "NoSuchKey":
                     raise StorageNoSuchKeyError(bucket_name, key)
@@ -225,6 +229,17 @@ class CephStorageBackend:
             else:
                 raise e
 
+    def list_common_prefixes(self, bucket_name, prefix=None, delimiter='/'):
+        """
+        Return the objects and the common prefixes found right under the given prefix.
+        :param bucket_name: Name of the bucket.
+        :param prefix: Prefix to filter object names.
+        :param delimiter: Character that separates the levels of the keyspace.
+        :return: List of objects and list of common prefixes under the given prefix.
+        :rtype: tuple of lists
+        """
+        return s3_list_common_prefixes(self.cos_client, bucket_name, prefix, delimiter)
+
     def list_keys(self, bucket_name, prefix=None):
         """
         Return a list of keys for the given prefix.
@@ -24,7 +24,7 @@ from google.api_core import exceptions as google_exceptions
 from google.cloud import storage
 from google.cloud.exceptions import NotFound
 from google.api_core.exceptions import GoogleAPICallError, AlreadyExists, RetryError
-from ...utils import StorageNoSuchKeyError
+from ...utils import StorageNoSuchKeyError, get_transfer_config, parallel_download
 
 class GCPStorageBackend():
     def __init__(self, gcp_storage_config, bucket=None, executor_id=None):
@@ -33,6 +33,7 @@ class GCPStorageBackend():
             self.client = storage.Client.from_service_account_json(self.credentials_path)
         except Exception: # Get credentials from gcp function environment
             self.client = storage.Client()
+        self.multipart_threshold, self.part_size, self.max_concurrency = get_transfer_config(gcp_storage_config)
 
     def get_client(self):
         """
@@ -70,12 +71,25 @@ class GCPStorageBackend():
         """
         try:
             bucket = self.client.get_bucket(bucket_name)
-            blob = bucket.blob(blob_name=key)
+            blob = bucket.get_blob(blob_name=key)
         except google_exceptions.NotFound:
             raise StorageNoSuchKeyError(bucket_name, key)
-        
-        if not blob.exists():
+
+        if blob is None:
             raise StorageNoSuchKeyError(bucket_name, key)
+
+        if not stream and not extra_get_args and blob.size is not None and blob.size > self.multipart_threshold:
+            # All the ranges read the generation of the blob, which
+            # is no longer found if the object is overwritten
+            generation_blob = bucket.blob(blob_name=key, generation=blob.generation)
+
+            def _get_range(first_byte, last_byte):
+                return generation_blob.download_as_string(start=first_byte, end=last_byte)
+            try:
+                return parallel_download(_get_range, 0, blob.size, self.part_size, self.max_concurrency)
+            except google_exceptions.NotFound:
+                # The object was overwritten during the download, start again with the new version
+                return self.get_object(bucket_name, key)
         
         if extra_get_args and 'Range' in extra_get_args:
             start, end = re.findall(r'\d+', extra_get_args['Range'])
@@ -17,14 +17,92 @@
 
 import os
 import io
+import mmap
 import shutil
 import logging
+import tempfile
 from cloudbutton.engine.storage.utils import StorageNoSuchKeyError
 from cloudbutton.config import STORAGE_FOLDER
 
 
 logger = logging.getLogger(__name__)
 
+TEMP_FILE_SUFFIX = '.cloudbutton-tmp'
+
+
+class MemoryMappedObject(io.RawIOBase):
+    """
+    Read-only stream of a (range of a) file backed by a memory map, so reads
+    are served from the page cache. getbuffer() exposes the mapped range as a
+    memoryview without copying it.
+    """
+    def __init__(self, file_path, first_byte=0, last_byte=None):
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        last_byte = size - 1 if last_byte is None else min(last_byte, size - 1)
+        self._start = min(first_byte, size)
+        self._end = max(last_byte + 1, self._start)
+        self._pos = self._start
+
+    def __len__(self):
+        return self._end - self._start
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos - self._start
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = self._start + offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._end + offset
+        else:
+            raise ValueError('Invalid whence: {}'.format(whence))
+        self._pos = min(max(pos, self._start), self._end)
+        return self.tell()
+
+    def read(self, size=-1):
+        end = self._end if size is None or size < 0 else min(self._pos + size, self._end)
+        data = self._mmap[self._pos:end] if self._mmap is not None else b''
+        self._pos = max(end, self._pos)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, b):
+        with self.getbuffer() as buffer:
+            n = min(len(b), self._end - self._pos)
+            offset = self._pos - self._start
+            b[:n] = buffer[offset:offset + n]
+        self._pos += n
+        return n
+
+    def getbuffer(self):
+        """
+        Returns a memoryview of the mapped range, without copying it
+        """
+        if self._mmap is None:
+            return memoryview(b'')
+        return memoryview(self._mmap)[self._start:self._end]
+
+    def close(self):
+        if self._mmap is not None and not self.closed:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A memoryview of the map is still alive, it is unmapped once collected
+                pass
+        super().close()
+
 
 class LocalhostStorageBackend:
     """
@@ -66,18 +144,20 @@ class LocalhostStorageBackend:
         :type data: str/bytes
         :return: None
         """
+        file_path = os.path.join(STORAGE_FOLDER, bucket_name, key)
+        file_dir = os.path.dirname(file_path)
+        os.makedirs(file_dir, exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode()
+        # Write a temporary file and rename it, so readers never see partial objects
+        fd, tmp_path = tempfile.mkstemp(dir=file_dir, prefix='.', suffix=TEMP_FILE_SUFFIX)
         try:
-            data_type = type(data)
-            file_path = os.path.join(STORAGE_FOLDER, bucket_name, key)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            if data_type == bytes:
-                with open(file_path, "wb") as f:
-                    f.write(data)
-            else:
-                with open(file_path, "w") as f:
-                    f.write(data)
-        except Exception as e:
-            raise(e)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
 
     def get_object(self, bucket_name, key, stream=False, extra_get_args={}):
         """
@@ -87,22 +167,23 @@ class LocalhostStorageBackend:
         :return: Data of the object
         :rtype: str/bytes
         """
-        buffer = None
+        file_path = os.path.join(STORAGE_FOLDER, bucket_name, key)
+        first_byte, last_byte = 0, None
+        if 'Range' in extra_get_args:
+            byte_range = extra_get_args['Range'].replace('bytes=', '')
+            first_byte, last_byte = byte_range.split('-')
+            first_byte = int(first_byte)
+            last_byte = int(last_byte) if last_byte else None
+
         try:
-            file_path = os.path.join(STORAGE_FOLDER, bucket_name, key)
-            with open(file_path, "rb") as f:
-                if 'Range' in extra_get_args:
-                    byte_range = extra_get_args['Range'].replace('bytes=', '')
-                    first_byte, last_byte = map(int, byte_range.split('-'))
-                    f.seek(first_byte)
-                    buffer = io.BytesIO(f.read(last_byte-first_byte+1))
-                else:
-                    buffer = io.BytesIO(f.read())
             if stream:
-                return buffer
-            else:
-                return buffer.read()
-        except Exception:
+                return MemoryMappedObject(file_path, first_byte, last_byte)
+            with open(file_path, 'rb') as f:
+                f.seek(first_byte)
+                if last_byte is None:
+                    return f.read()
+                return f.read(max(last_byte - first_byte + 1, 0))
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
             raise StorageNoSuchKeyError(os.path.join(STORAGE_FOLDER, bucket_name), key)
 
     def head_object(self, bucket_name, key):
@@ -113,7 +194,12 @@ class LocalhostStorageBackend:
         :return: Data of the object
         :rtype: str/bytes
         """
-        pass
+        file_path = os.path.join(STORAGE_FOLDER, bucket_name, key)
+        try:
+            stat = os.stat(file_path)
+            return {'content-length': str(stat.st_size), 'last-modified': str(stat.st_mtime_ns)}
+        except FileNotFoundError:
+            raise StorageNoSuchKeyError(os.path.join(STORAGE_FOLDER, bucket_name), key)
 
     def delete_object(self, bucket_name, key):
         """
@@ -162,6 +248,30 @@ class LocalhostStorageBackend:
         """
         raise NotImplementedError
 
+    def _scan_files(self, bucket_name, prefix=None):
+        """
+        Yields the (key, DirEntry) of the files whose key starts with prefix,
+        descending only into the directories that may contain such keys.
+        """
+        bucket_root = os.path.join(STORAGE_FOLDER, bucket_name)
+        prefix = prefix or ''
+        pending_dirs = [prefix.rpartition('/')[0]]
+
+        while pending_dirs:
+            dir_key = pending_dirs.pop()
+            try:
+                entries = os.scandir(os.path.join(bucket_root, dir_key))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with entries:
+                for entry in entries:
+                    key = '/'.join([dir_key, entry.name]) if dir_key else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if key.startswith(prefix) or prefix.startswith(key + '/'):
+                            pending_dirs.append(key)
+                    elif key.startswith(prefix) and not entry.name.endswith(TEMP_FILE_SUFFIX):
+                        yield key, entry
+
     def list_objects(self, bucket_name, prefix=None):
         """
         Return a list of objects for the prefix.
@@ -170,22 +280,9 @@ class LocalhostStorageBackend:
         :return: List of objects in bucket that match the given prefix.
         :rtype: list of str
         """
-        key_list = []
-
-        if prefix:
-            root = os.path.join(STORAGE_FOLDER, bucket_name, prefix)
-        else:
-            root = os.path.join(STORAGE_FOLDER, bucket_name)
-
-        for path, subdirs, files in os.walk(root):
-            for name in files:
-                size = os.stat(os.path.join(path, name)).st_size
-                if prefix:
-                    key_list.append({'Key': os.path.join(prefix, path.replace(root+'/', ''), name), 'Size': size})
-                else:
-                    key_list.append({'Key': os.path.join(path.replace(root+'/', ''), name), 'Size': size})
-
-        return key_list
+        key_list = [{'Key': key, 'Size': entry.stat().st_size}
+                    for key, entry in self._scan_files(bucket_name, prefix)]
+        return sorted(key_list, key=lambda obj: obj['Key'])
 
     def list_keys(self, bucket_name, prefix=None):
         """
@@ -195,18 +292,4 @@ class LocalhostStorageBackend:
         :return: List of keys in bucket that match the given prefix.
         :rtype: list of str
         """
-        key_list = []
-
-        if prefix:
-            root = os.path.join(STORAGE_FOLDER, bucket_name, prefix)
-        else:
-            root = os.path.join(STORAGE_FOLDER, bucket_name)
-
-        for path, subdirs, files in os.walk(root):
-            for name in files:
-                if prefix:
-                    key_list.append(os.path.join(prefix, path.replace(root+'/', ''), name))
-                else:
-                    key_list.append(os.path.join(path.replace(root+'/', ''), name))
-
-        return key_list
+        return sorted(key for key, _ in self._scan_files(bucket_name, prefix))
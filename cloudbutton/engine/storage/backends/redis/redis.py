@@ -5,12 +5,30 @@ from cloudbutton.engine.storage.utils import StorageNoSuchKeyError
 
 logger = logging.getLogger(__name__)
 
+LIST_PAGE_SIZE = 10000
+INDEX_BATCH_SIZE = 1000
+
+# Sets the value of an object and adds its key to the index of the bucket
+PUT_OBJECT_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[2], 0, ARGV[2])
+"""
+
+
 class RedisBackend:
+    """
+    Stores every object in a string key 'bucket/key'. The keys of each bucket are
+    kept in a sorted set with equal scores, so prefix listings are ZRANGEBYLEX
+    queries and puts and deletes maintain the index with O(log N) operations.
+    The index of a bucket written before it existed is built on its first listing.
+    """
 
     def __init__(self, config, bucket=None, executor_id=None):
         config.pop('user_agent', None)
         self._client = redis.StrictRedis(**config)
+        self._put_object_script = self._client.register_script(PUT_OBJECT_SCRIPT)
         self.bucket = bucket or ''
+        self._indexed_buckets = set()
 
     def get_client(self):
         return self._client
@@ -28,26 +46,7 @@ class RedisBackend:
             raise TypeError(type(data), 'valid types: {}'.format((str, bytes, bytearray)))
 
         redis_key = self._format_key(bucket_name, key)
-        components = redis_key.split('/')
-
-        # NOTE: could use a lua script and add from the lowest
-        # to the highest dir and stop when SADD returns 0 since
-        # then we can assume higher dirs already exist
-        pipeline = self._client.pipeline(False)
-
-        # create parent dirs
-        for i in range(1, len(components)-1):
-            dir = '/'.join(components[:i]) + '/' 
-            pipeline.sadd(dir, components[i] + '/')
-
-        # add file to lowest dir
-        dir = '/'.join(components[:-1]) + '/'
-        pipeline.sadd(dir, components[-1])
-
-        # set actual key
-        pipeline.set(redis_key, data)
-        pipeline.execute()
-
+        self._put_object_script(keys=[redis_key, self._index_key(bucket_name)], args=[data, key])
 
     def get_object(self, bucket_name, key, stream=False, extra_get_args={}):
         """
@@ -62,9 +61,13 @@ class RedisBackend:
         redis_key = self._format_key(bucket_name, key)
         try:
             if 'Range' in extra_get_args:   # expected format: Range='bytes=L-H'
-                bytes_range = extra_get_args.pop('Range')[6:]
+                bytes_range = extra_get_args['Range'][6:]
                 start, end = self._parse_range(bytes_range)
-                data = self._client.getrange(redis_key, start, end)
+                pipeline = self._client.pipeline(False)
+                pipeline.exists(redis_key)
+                pipeline.getrange(redis_key, start, end)
+                exists, data = pipeline.execute()
+                data = data if exists else None
             else:
                 data = self._client.get(redis_key)
 
@@ -89,13 +92,14 @@ class RedisBackend:
         :rtype: dict
         """
         redis_key = self._format_key(bucket_name, key)
-        try:
-            meta = self._client.debug_object(redis_key)
-        except redis.exceptions.ResponseError:
+        pipeline = self._client.pipeline(False)
+        pipeline.exists(redis_key)
+        pipeline.strlen(redis_key)
+        exists, size = pipeline.execute()
+        if not exists:
             raise StorageNoSuchKeyError(bucket_name, key)
 
-        meta['content-length'] = meta['serializedlength'] - 1
-        return meta
+        return {'content-length': str(size)}
 
     def delete_object(self, bucket_name, key):
         """
@@ -111,16 +115,12 @@ class RedisBackend:
         :param bucket_name: bucket name
         :param key_list: list of keys
         """
-        redis_key_list = [self._format_key(bucket_name, k) for k in key_list]
+        if not key_list:
+            return
 
         pipeline = self._client.pipeline(False)
-        pipeline.delete(*redis_key_list)
-
-        for full_path in redis_key_list:
-            components = full_path.split('/')
-            pdir = '/'.join(components[:-1]) + '/'
-            pipeline.srem(pdir, components[-1])
-
+        pipeline.delete(*[self._format_key(bucket_name, k) for k in key_list])
+        pipeline.zrem(self._index_key(bucket_name), *key_list)
         pipeline.execute()
 
     def head_bucket(self, bucket_name):
@@ -139,7 +139,8 @@ class RedisBackend:
         Throws StorageNoSuchKeyError if the given bucket does not exist.
         :param bucket_name: name of the bucket
         """
-        return bool(self._client.exists(self._format_key(bucket_name, '')))
+        self._ensure_index(bucket_name)
+        return bool(self._client.exists(self._index_key(bucket_name)))
 
     def list_objects(self, bucket_name, prefix=None):
         """
@@ -149,10 +150,12 @@ class RedisBackend:
         :return: List of objects in bucket that match the given prefix.
         :rtype: list of dict
         """
+        keys = self.list_keys(bucket_name, prefix)
         pipeline = self._client.pipeline(False)
-        for key in self.list_keys(bucket_name, prefix):
-            pipeline.get(self._format_key(bucket_name, key))
-        return pipeline.execute()
+        for key in keys:
+            pipeline.strlen(self._format_key(bucket_name, key))
+        sizes = pipeline.execute() if keys else []
+        return [{'Key': key, 'Size': size} for key, size in zip(keys, sizes)]
 
     def list_keys(self, bucket_name, prefix=None):
         """
@@ -162,38 +165,63 @@ class RedisBackend:
         :return: List of keys in bucket that match the given prefix.
         :rtype: list of str
         """
-        prefix = prefix or ''
-        redis_prefix = self._format_key(bucket_name, prefix)
-
-        pdir = '/'.join(redis_prefix.split('/')[:-1]) + '/'
-        dir_keys = [key.decode() for key in self._client.smembers(pdir)]
-        key_list = []
-
-        for key in dir_keys:
-            full_key = pdir + key
-            if full_key.startswith(redis_prefix):
-                if full_key.endswith('/'):
-                    key_list.extend(self._walk(bucket_name, full_key))
-                else:
-                    key_list.append(full_key)
-
-        offset = len(bucket_name) + 1
-        return [key[offset:] for key in key_list]
+        if prefix:
+            min_key, max_key = b'[' + prefix.encode(), b'[' + prefix.encode() + b'\xff'
+        else:
+            min_key, max_key = '-', '+'
 
-        
-    def _walk(self, bucket_name, dir_key):
-        dir_keys = [key.decode() for key in self._client.smembers(dir_key)]
+        self._ensure_index(bucket_name)
+        index_key = self._index_key(bucket_name)
         key_list = []
-
-        for key in dir_keys:
-            full_key = dir_key + key
-            if full_key.endswith('/'):
-                key_list.extend(self._walk(bucket_name, full_key))
-            else:
-                key_list.append(full_key)
+        while True:
+            page = self._client.zrangebylex(index_key, min_key, max_key, start=0, num=LIST_PAGE_SIZE)
+            key_list.extend(key.decode() for key in page)
+            if len(page) < LIST_PAGE_SIZE:
+                break
+            min_key = b'(' + page[-1]
 
         return key_list
 
+    def _ensure_index(self, bucket_name):
+        if bucket_name in self._indexed_buckets:
+            return
+        if not self._client.exists(self._indexed_key(bucket_name)):
+            self.rebuild_index(bucket_name)
+        self._indexed_buckets.add(bucket_name)
+
+    def rebuild_index(self, bucket_name):
+        """
+        Adds every object of a bucket to its key index by SCANning them, e.g.
+        for buckets written with the former directory-set layout.
+        :param bucket_name: name of the bucket.
+        :return: number of indexed objects
+        """
+        logger.debug('Building the key index of bucket {}'.format(bucket_name))
+        index_key = self._index_key(bucket_name)
+        offset = len(bucket_name) + 1
+        total = 0
+        batch = {}
+        for redis_key in self._client.scan_iter(match=self._format_key(bucket_name, '*'), count=INDEX_BATCH_SIZE):
+            redis_key = redis_key.decode()
+            # Skip the sets of the former directory layout
+            if redis_key.endswith('/'):
+                continue
+            batch[redis_key[offset:]] = 0
+            total += 1
+            if len(batch) == INDEX_BATCH_SIZE:
+                self._client.zadd(index_key, batch)
+                batch = {}
+        if batch:
+            self._client.zadd(index_key, batch)
+        self._client.set(self._indexed_key(bucket_name), 1)
+        return total
+
+    def _index_key(self, bucket):
+        return '{}:index'.format(bucket)
+
+    def _indexed_key(self, bucket):
+        # Set once the index holds the objects written before it existed
+        return '{}:indexed'.format(bucket)
 
     def _format_key(self, bucket, key):
         return '/'.join([bucket, key])
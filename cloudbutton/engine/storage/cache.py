@@ -0,0 +1,236 @@
+#
+# Copyright Cloudlab URV 2020
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+
+from cloudbutton.config import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+CACHE_MEMORY_SIZE = 64*1024**2  # 64MiB
+CACHE_DISK_SIZE = 0  # Disabled
+CACHE_DISK_PATH = os.path.join(CACHE_DIR, 'storage')
+
+_storage_caches = {}
+_storage_caches_lock = threading.Lock()
+
+
+class LRUMemoryCache:
+    """
+    Size-bounded in-memory LRU cache of (version, data) entries
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, data, version=None):
+        if len(data) > self.max_size:
+            return
+        self.invalidate(key)
+        self._entries[key] = (version, data)
+        self.size += len(data)
+        while self.size > self.max_size:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def invalidate(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class LRUDiskCache:
+    """
+    Size-bounded LRU cache of (version, data) entries stored as files in a
+    local directory, so they survive the process. Each file starts with
+    a line holding the version of the entry.
+    """
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self.size = 0
+        self._entries = OrderedDict()
+
+        os.makedirs(self.path, exist_ok=True)
+        files = [entry for entry in os.scandir(self.path) if entry.is_file()]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_atime):
+            self._entries[entry.name] = entry.stat().st_size
+            self.size += entry.stat().st_size
+
+    def _file_name(self, key):
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, key):
+        name = self._file_name(key)
+        if name not in self._entries:
+            return None
+        try:
+            with open(os.path.join(self.path, name), 'rb') as f:
+                version, data = f.read().split(b'\n', 1)
+        except (OSError, ValueError):
+            self.invalidate(key)
+            return None
+        self._entries.move_to_end(name)
+        return version.decode() or None, data
+
+    def put(self, key, data, version=None):
+        body = (version or '').encode() + b'\n' + data
+        if len(body) > self.max_size:
+            return
+        self.invalidate(key)
+        name = self._file_name(key)
+        tmp_path = os.path.join(self.path, '.{}.tmp'.format(name))
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, os.path.join(self.path, name))
+        self._entries[name] = len(body)
+        self.size += len(body)
+        while self.size > self.max_size:
+            evicted, evicted_size = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            try:
+                os.remove(os.path.join(self.path, evicted))
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, key):
+        name = self._file_name(key)
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self.size -= size
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+
+class StorageCache:
+    """
+    Read-through cache of storage objects with a memory tier and an optional
+    disk tier. Entries of mutable objects carry their version (ETag or last
+    modification), and are only served if the requested version matches.
+    """
+    def __init__(self, memory_size=CACHE_MEMORY_SIZE, disk_size=CACHE_DISK_SIZE, disk_path=CACHE_DISK_PATH):
+        self.memory = LRUMemoryCache(memory_size) if memory_size else None
+        self.disk = LRUDiskCache(disk_path, disk_size) if disk_size else None
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version=None):
+        """
+        Returns the cached data of a key, or None if it is not cached or its version differs
+        """
+        with self._lock:
+            entry = self.memory.get(key) if self.memory else None
+            tier = 'memory'
+            if entry is None and self.disk:
+                entry = self.disk.get(key)
+                tier = 'disk'
+            if entry is not None and entry[0] != version:
+                self.invalidate(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if tier == 'memory':
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+                if self.memory:
+                    self.memory.put(key, entry[1], version)
+            return entry[1]
+
+    def put(self, key, data, version=None):
+        with self._lock:
+            if self.memory:
+                self.memory.put(key, data, version)
+            if self.disk:
+                self.disk.put(key, data, version)
+
+    def invalidate(self, key):
+        if self.memory:
+            self.memory.invalidate(key)
+        if self.disk:
+            self.disk.invalidate(key)
+
+    @property
+    def hit_rate(self):
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def stats(self):
+        return {'hits': self.hits, 'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'hit_rate': round(self.hit_rate, 4)}
+
+
+def create_storage_cache(cache_config):
+    """
+    Creates the storage cache from its configuration: None or False to disable
+    it, True for the default cache, or a dictionary with the memory_size,
+    disk_size and disk_path of the cache
+    """
+    if cache_config is None or cache_config is False:
+        return None
+    if cache_config is True:
+        cache_config = {}
+    return StorageCache(memory_size=cache_config.get('memory_size', CACHE_MEMORY_SIZE),
+                        disk_size=cache_config.get('disk_size', CACHE_DISK_SIZE),
+                        disk_path=cache_config.get('disk_path', CACHE_DISK_PATH))
+
+
+def get_storage_cache(storage_config):
+    """
+    Returns the storage cache of a storage configuration, shared by all the
+    InternalStorage instances of the process, or None if it is disabled
+    """
+    cache_config = storage_config.get('cache')
+    if cache_config is None or cache_config is False:
+        return None
+    storage_key = json.dumps(storage_config, sort_keys=True)
+    with _storage_caches_lock:
+        if storage_key not in _storage_caches:
+            _storage_caches[storage_key] = create_storage_cache(cache_config)
+        return _storage_caches[storage_key]
+
+
+def get_object_version(metadata):
+    """
+    Returns the version (ETag or last modification) in the metadata of an object, if any
+    """
+    if not isinstance(metadata, dict):
+        return None
+    for name in ('etag', 'ETag', 'x-object-meta-etag', 'last-modified', 'Last-Modified', 'LastModified'):
+        if metadata.get(name):
+            return str(metadata[name])
+    return None
@@ -23,11 +23,15 @@ import importlib
 from cloudbutton.version import __version__
 from cloudbutton.config import CACHE_DIR, RUNTIMES_PREFIX, JOBS_PREFIX, TEMP_PREFIX
 from cloudbutton.engine.utils import is_cloudbutton_function, uuid_str
-from cloudbutton.engine.storage.utils import create_status_key, create_output_key, \
-    status_key_suffix, init_key_suffix, CloudObject, StorageNoSuchKeyError
+from cloudbutton.engine.storage.utils import create_status_key, create_output_key, create_job_manifest_key, \
+    status_key_suffix, init_key_suffix, CloudObject, StorageNoSuchKeyError, open_object, \
+    READER_PART_SIZE, READER_MAX_CONCURRENCY
+from cloudbutton.engine.storage.cache import get_storage_cache, get_object_version
 
 logger = logging.getLogger(__name__)
 
+DELETE_BATCH_SIZE = 1000
+
 
 class Storage:
     """
@@ -58,6 +62,7 @@ class Storage:
         client.get_cobject = self.get_cobject
         client.delete_cobject = self.delete_cobject
         client.delete_cobjects = self.delete_cobjects
+        client.open_object = self.open_object
 
         return client
 
@@ -99,6 +104,21 @@ class Storage:
         else:
             return None
 
+    def open_object(self, bucket, key, byte_range=None, part_size=READER_PART_SIZE,
+                    max_concurrency=READER_MAX_CONCURRENCY):
+        """
+        Open an object, or a byte range of it, as a file-like object.
+        Large ranges are fetched in parallel parts with a bounded prefetch window.
+        :param bucket: bucket name
+        :param key: object key
+        :param byte_range: (first_byte, last_byte) tuple. Default None (whole object)
+        :param part_size: size of the parts fetched concurrently
+        :param max_concurrency: maximum number of parts fetched ahead of the reader
+        :return: file-like object
+        """
+        return open_object(self.storage_handler, bucket, key, byte_range=byte_range,
+                           part_size=part_size, max_concurrency=max_concurrency)
+
     def delete_cobject(self, cloudobject=None, bucket=None, key=None):
         """
         Get CloudObject from storage.
@@ -167,6 +187,33 @@ class InternalStorage:
             raise NotImplementedError("An exception was produced trying to create the "
                                       "'{}' storage backend: {}".format(self.backend, e))
 
+        self._async_handler = None
+        self.cache = get_storage_cache(self.config)
+        self.channel = None
+
+    def attach_channel(self, channel):
+        """
+        Attaches the channel of the localhost compute backend. The statuses and
+        outputs of the jobs that run through it are read from the channel.
+        :param channel: LocalChannel of the localhost compute backend
+        """
+        self.channel = channel
+
+    def _in_channel(self, executor_id, job_id):
+        return self.channel is not None and self.channel.has_job(executor_id, job_id)
+
+    def _split_channel_calls(self, calls):
+        """
+        Splits the indexes of the calls between those that run through the channel and the rest
+        """
+        channel_calls, storage_calls = [], []
+        for i, (executor_id, job_id, _) in enumerate(calls):
+            if self._in_channel(executor_id, job_id):
+                channel_calls.append(i)
+            else:
+                storage_calls.append(i)
+        return channel_calls, storage_calls
+
     def get_storage_config(self):
         """
         Retrieves the configuration of this storage handler.
@@ -180,6 +227,7 @@ class InternalStorage:
         client.get_cobject = self.get_cobject
         client.delete_cobject = self.delete_cobject
         client.delete_cobjects = self.delete_cobjects
+        client.open_object = self.open_object
 
         return client
 
@@ -221,6 +269,21 @@ class InternalStorage:
         else:
             return None
 
+    def open_object(self, bucket, key, byte_range=None, part_size=READER_PART_SIZE,
+                    max_concurrency=READER_MAX_CONCURRENCY):
+        """
+        Open an object, or a byte range of it, as a file-like object.
+        Large ranges are fetched in parallel parts with a bounded prefetch window.
+        :param bucket: bucket name
+        :param key: object key
+        :param byte_range: (first_byte, last_byte) tuple. Default None (whole object)
+        :param part_size: size of the parts fetched concurrently
+        :param max_concurrency: maximum number of parts fetched ahead of the reader
+        :return: file-like object
+        """
+        return open_object(self.storage_handler, bucket, key, byte_range=byte_range,
+                           part_size=part_size, max_concurrency=max_concurrency)
+
     def delete_cobject(self, cloudobject=None, bucket=None, key=None):
         """
         Get CloudObject from storage.
@@ -283,21 +346,178 @@ class InternalStorage:
         """
         return self.storage_handler.put_object(self.bucket, key, func)
 
-    def get_data(self, key, stream=False, extra_get_args={}):
+    def put_job_manifest(self, executor_id, job_id, manifest):
+        """
+        Put the manifest of a job, with the values shared by all its calls, into storage.
+        :param executor_id: executor ID of the job
+        :param job_id: job ID
+        :param manifest: dictionary of the job constants
+        :return: None
+        """
+        manifest_key = create_job_manifest_key(JOBS_PREFIX, executor_id, job_id)
+        return self.storage_handler.put_object(self.bucket, manifest_key, json.dumps(manifest))
+
+    def _cache_key(self, bucket, key, extra_get_args={}):
+        cache_key = '{}://{}/{}'.format(self.backend, bucket, key)
+        if 'Range' in extra_get_args:
+            cache_key = '{}#{}'.format(cache_key, extra_get_args['Range'])
+        return cache_key
+
+    def _get_immutable(self, key, extra_get_args={}):
+        """
+        Get an object that never changes once written, through the cache.
+        """
+        if self.cache is None:
+            return self.storage_handler.get_object(self.bucket, key, extra_get_args=extra_get_args)
+
+        cache_key = self._cache_key(self.bucket, key, extra_get_args)
+        data = self.cache.get(cache_key)
+        if data is None:
+            data = self.storage_handler.get_object(self.bucket, key, extra_get_args=dict(extra_get_args))
+            self.cache.put(cache_key, data)
+        return data
+
+    def get_data(self, key, stream=False, extra_get_args={}, immutable=False):
         """
         Get data object from storage.
         :param key: data key
+        :param immutable: the object never changes once written, so it can be served from the cache
         :return: data content
         """
+        if immutable and not stream:
+            return self._get_immutable(key, extra_get_args)
         return self.storage_handler.get_object(self.bucket, key, stream, extra_get_args)
 
+    def get_cached_data(self, key, bucket=None):
+        """
+        Get data object from storage, served from the cache if its version
+        (ETag or last modification) did not change since it was cached.
+        :param key: data key
+        :param bucket: bucket name. Default the internal bucket
+        :return: data content
+        """
+        bucket = bucket or self.bucket
+        if self.cache is None:
+            return self.storage_handler.get_object(bucket, key)
+
+        version = get_object_version(self.storage_handler.head_object(bucket, key))
+        if version is None:
+            return self.storage_handler.get_object(bucket, key)
+
+        cache_key = self._cache_key(bucket, key)
+        data = self.cache.get(cache_key, version)
+        if data is None:
+            data = self.storage_handler.get_object(bucket, key)
+            self.cache.put(cache_key, data, version)
+        return data
+
+    def get_cache_stats(self):
+        """
+        Get the hit-rate counters of the storage cache.
+        :return: dictionary with the counters, or None if the cache is disabled
+        """
+        return self.cache.stats() if self.cache is not None else None
+
     def get_func(self, key):
         """
         Get serialized function from storage.
         :param key: function key
         :return: serialized function
         """
-        return self.storage_handler.get_object(self.bucket, key)
+        return self._get_immutable(key)
+
+    def get_job_manifest(self, executor_id, job_id):
+        """
+        Get the manifest of a job from storage.
+        :param executor_id: executor ID of the job
+        :param job_id: job ID
+        :return: dictionary of the job constants
+        """
+        manifest_key = create_job_manifest_key(JOBS_PREFIX, executor_id, job_id)
+        return json.loads(self._get_immutable(manifest_key).decode())
+
+    def get_async_handler(self):
+        """
+        Retrieves the asyncio interface of the storage backend.
+        :return: async storage handler
+        """
+        if self._async_handler is None:
+            # asyncio is only imported when the async interface is used
+            from cloudbutton.engine.storage.aio import get_async_handler
+            self._async_handler = get_async_handler(self.storage_handler)
+        return self._async_handler
+
+    def get_objects(self, keys, bucket=None, extra_get_args={}):
+        """
+        Get many objects concurrently.
+        :param keys: list of keys
+        :param bucket: bucket name. Default the internal bucket
+        :return: list with the data of each key, None for the keys that do not exist
+        """
+        bucket = bucket or self.bucket
+        from cloudbutton.engine.storage.aio import gather_bounded, run_sync
+        aio = self.get_async_handler()
+
+        async def _get(key):
+            try:
+                return await aio.get_object(bucket, key, extra_get_args=extra_get_args)
+            except StorageNoSuchKeyError:
+                return None
+
+        return run_sync(gather_bounded([_get(key) for key in keys]))
+
+    def put_objects(self, items, bucket=None):
+        """
+        Put many objects concurrently.
+        :param items: dictionary or list of (key, data) tuples
+        :param bucket: bucket name. Default the internal bucket
+        :return: None
+        """
+        bucket = bucket or self.bucket
+        from cloudbutton.engine.storage.aio import gather_bounded, run_sync
+        aio = self.get_async_handler()
+        items = items.items() if isinstance(items, dict) else items
+        run_sync(gather_bounded([aio.put_object(bucket, key, data) for key, data in items]))
+
+    def head_objects(self, keys, bucket=None):
+        """
+        Head many objects concurrently.
+        :param keys: list of keys
+        :param bucket: bucket name. Default the internal bucket
+        :return: list with the metadata of each key, None for the keys that do not exist
+        """
+        bucket = bucket or self.bucket
+        from cloudbutton.engine.storage.aio import gather_bounded, run_sync
+        aio = self.get_async_handler()
+
+        async def _head(key):
+            try:
+                return await aio.head_object(bucket, key)
+            except StorageNoSuchKeyError:
+                return None
+
+        return run_sync(gather_bounded([_head(key) for key in keys]))
+
+    def delete_prefixes(self, prefixes, bucket=None, batch_size=DELETE_BATCH_SIZE):
+        """
+        Delete all the objects under the given prefixes. The prefixes are listed
+        concurrently and the keys are deleted in concurrent batches.
+        :param prefixes: list of prefixes
+        :param bucket: bucket name. Default the internal bucket
+        :return: number of deleted objects
+        """
+        bucket = bucket or self.bucket
+        from cloudbutton.engine.storage.aio import gather_bounded, run_sync
+        aio = self.get_async_handler()
+
+        async def _delete():
+            listings = await gather_bounded([aio.list_keys(bucket, prefix) for prefix in prefixes])
+            keys = sorted({key for listing in listings for key in listing})
+            batches = [keys[i:i+batch_size] for i in range(0, len(keys), batch_size)]
+            await gather_bounded([aio.delete_objects(bucket, batch) for batch in batches])
+            return len(keys)
+
+        return run_sync(_delete())
 
     def get_job_status(self, executor_id, job_id):
         """
@@ -305,6 +525,9 @@ class InternalStorage:
         :param executor_id: executor's ID
         :return: A list of call IDs that have updated status.
         """
+        if self._in_channel(executor_id, job_id):
+            return self.channel.get_job_status(executor_id, job_id)
+
         callset_prefix = '/'.join([JOBS_PREFIX, executor_id, job_id])
         keys = self.storage_handler.list_keys(self.bucket, callset_prefix)
 
@@ -324,6 +547,9 @@ class InternalStorage:
         :param call_id: call ID of the call
         :return: A dictionary containing call's status, or None if no updated status
         """
+        if self._in_channel(executor_id, job_id):
+            return self.channel.get_call_status(executor_id, job_id, call_id)
+
         status_key = create_status_key(JOBS_PREFIX, executor_id, job_id, call_id)
         try:
             data = self.storage_handler.get_object(self.bucket, status_key)
@@ -338,12 +564,60 @@ class InternalStorage:
         :param call_id: call ID of the call
         :return: Output of the call.
         """
+        if self._in_channel(executor_id, job_id):
+            return self.channel.get_call_output(executor_id, job_id, call_id)
+
         output_key = create_output_key(JOBS_PREFIX, executor_id, job_id, call_id)
         try:
-            return self.storage_handler.get_object(self.bucket, output_key)
+            return self._get_immutable(output_key)
         except StorageNoSuchKeyError:
             return None
 
+    def get_calls_status(self, calls):
+        """
+        Get the status of many calls concurrently.
+        :param calls: list of (executor_id, job_id, call_id) tuples
+        :return: list with the status dictionary of each call, or None if it has no status yet
+        """
+        channel_calls, storage_calls = self._split_channel_calls(calls)
+        statuses = [None] * len(calls)
+        for i in channel_calls:
+            statuses[i] = self.channel.get_call_status(*calls[i])
+
+        if storage_calls:
+            status_keys = [create_status_key(JOBS_PREFIX, *calls[i]) for i in storage_calls]
+            for i, data in zip(storage_calls, self.get_objects(status_keys)):
+                statuses[i] = json.loads(data.decode('ascii')) if data is not None else None
+
+        return statuses
+
+    def get_calls_output(self, calls):
+        """
+        Get the output of many calls concurrently.
+        :param calls: list of (executor_id, job_id, call_id) tuples
+        :return: list with the output of each call, or None if it has no output yet
+        """
+        channel_calls, storage_calls = self._split_channel_calls(calls)
+        outputs = [None] * len(calls)
+        for i in channel_calls:
+            outputs[i] = self.channel.get_call_output(*calls[i])
+
+        output_keys = {i: create_output_key(JOBS_PREFIX, *calls[i]) for i in storage_calls}
+        missing = storage_calls
+        if self.cache is not None:
+            cache_keys = {i: self._cache_key(self.bucket, output_keys[i]) for i in storage_calls}
+            for i in storage_calls:
+                outputs[i] = self.cache.get(cache_keys[i])
+            missing = [i for i in storage_calls if outputs[i] is None]
+
+        if missing:
+            for i, output in zip(missing, self.get_objects([output_keys[i] for i in missing])):
+                if output is not None and self.cache is not None:
+                    self.cache.put(cache_keys[i], output)
+                outputs[i] = output
+
+        return outputs
+
     def get_runtime_meta(self, key):
         """
         Get the metadata given a runtime name.
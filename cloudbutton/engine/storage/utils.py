@@ -16,6 +16,7 @@
 # limitations under the License.
 #
 
+import io
 import os
 import sys
 import time
@@ -23,6 +24,9 @@ import tempfile
 import pickle
 import logging
 import textwrap
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 
 logger = logging.getLogger(__name__)
@@ -34,6 +38,13 @@ data_key_suffix = "data.pickle"
 output_key_suffix = "output.pickle"
 status_key_suffix = "status.json"
 init_key_suffix = ".init"
+manifest_key_suffix = "manifest.json"
+
+READER_PART_SIZE = 8*1024**2  # 8MiB
+READER_MAX_CONCURRENCY = 8
+MULTIPART_THRESHOLD = 64*1024**2  # 64MiB
+MULTIPART_PART_SIZE = 16*1024**2  # 16MiB
+MULTIPART_MAX_CONCURRENCY = 8
 
 
 class StorageNoSuchKeyError(Exception):
@@ -61,6 +72,312 @@ class CloudObjectUrl:
         self.path = url_path
 
 
+class ParallelRangeReader(io.RawIOBase):
+    """
+    Raw reader of an object byte range. The range is split into parts that are
+    fetched concurrently with ranged GETs, keeping at most max_concurrency parts
+    in flight (and in memory) ahead of the current read position.
+    Wrap it in an io.BufferedReader to get read(), readline() and readinto().
+    """
+    def __init__(self, storage_handler, bucket, key, byte_range,
+                 part_size=READER_PART_SIZE, max_concurrency=READER_MAX_CONCURRENCY):
+        self.storage_handler = storage_handler
+        self.bucket = bucket
+        self.key = key
+        self.max_concurrency = max_concurrency
+
+        first_byte, last_byte = byte_range
+        self._parts = [(start, min(start+part_size, last_byte+1)-1)
+                       for start in range(first_byte, last_byte+1, part_size)]
+        self._next_part = 0
+        self._pending = deque()
+        self._buffer = b''
+        self._offset = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._prefetch()
+
+    def _get_part(self, first_byte, last_byte):
+        extra_get_args = {'Range': 'bytes={}-{}'.format(first_byte, last_byte)}
+        return self.storage_handler.get_object(self.bucket, self.key, extra_get_args=extra_get_args)
+
+    def _prefetch(self):
+        while self._next_part < len(self._parts) and len(self._pending) < self.max_concurrency:
+            part = self._parts[self._next_part]
+            self._pending.append(self._executor.submit(self._get_part, *part))
+            self._next_part += 1
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._offset >= len(self._buffer):
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+            self._offset = 0
+            self._prefetch()
+        n = min(len(b), len(self._buffer) - self._offset)
+        b[:n] = self._buffer[self._offset:self._offset+n]
+        self._offset += n
+        return n
+
+    def close(self):
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False)
+        super().close()
+
+
+class StreamingBodyRawIO(io.RawIOBase):
+    """
+    Expose a streaming body as a raw stream, so it can be wrapped in an io.BufferedReader
+    that provides fast read(), readline(), readinto() and line iteration.
+    """
+    def __init__(self, sb):
+        self.sb = sb
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.sb.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class RandomAccessObject(io.RawIOBase):
+    """
+    Seekable raw reader of an object. Every read is served with a ranged GET
+    at the current position, so columnar readers only fetch the bytes they need.
+    """
+    def __init__(self, storage_handler, bucket, key, obj_size=None):
+        self.storage_handler = storage_handler
+        self.bucket = bucket
+        self.key = key
+        self.size = obj_size if obj_size is not None else get_object_size(storage_handler, bucket, key)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self.size + offset
+        else:
+            raise ValueError('Invalid whence: {}'.format(whence))
+        return self._pos
+
+    def readinto(self, b):
+        last_byte = min(self._pos + len(b), self.size) - 1
+        if last_byte < self._pos:
+            return 0
+        extra_get_args = {'Range': 'bytes={}-{}'.format(self._pos, last_byte)}
+        data = self.storage_handler.get_object(self.bucket, self.key, extra_get_args=extra_get_args)
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def get_object_size(storage_handler, bucket, key):
+    """
+    Returns the size of an object, or None if the storage backend does not report it
+    """
+    metadata = storage_handler.head_object(bucket, key)
+    if isinstance(metadata, dict) and 'content-length' in metadata:
+        return int(metadata['content-length'])
+    return None
+
+
+def open_object(storage_handler, bucket, key, byte_range=None, obj_size=None,
+                part_size=READER_PART_SIZE, max_concurrency=READER_MAX_CONCURRENCY,
+                buffer_size=io.DEFAULT_BUFFER_SIZE):
+    """
+    Opens an object, or a byte range of it, as a buffered file-like object.
+    Ranges larger than one part are fetched with a ParallelRangeReader.
+    :param byte_range: (first_byte, last_byte) tuple. Default None (whole object)
+    :param obj_size: size of the object, if known, to avoid a HEAD request
+    """
+    if byte_range is None:
+        if obj_size is None:
+            obj_size = get_object_size(storage_handler, bucket, key)
+        if obj_size is not None:
+            byte_range = (0, obj_size-1)
+
+    if byte_range is not None and byte_range[1] - byte_range[0] + 1 > part_size:
+        raw = ParallelRangeReader(storage_handler, bucket, key, byte_range, part_size, max_concurrency)
+    else:
+        extra_get_args = {}
+        if byte_range is not None:
+            extra_get_args['Range'] = 'bytes={}-{}'.format(*byte_range)
+        sb = storage_handler.get_object(bucket, key, stream=True, extra_get_args=extra_get_args)
+        raw = StreamingBodyRawIO(sb)
+
+    return io.BufferedReader(raw, buffer_size=buffer_size)
+
+
+def get_transfer_config(backend_config):
+    """
+    Returns the multipart threshold, part size and concurrency of the
+    transfers of a storage backend, tunable in its configuration
+    """
+    return (int(backend_config.get('multipart_threshold', MULTIPART_THRESHOLD)),
+            int(backend_config.get('multipart_chunksize', MULTIPART_PART_SIZE)),
+            int(backend_config.get('max_concurrency', MULTIPART_MAX_CONCURRENCY)))
+
+
+def data_size(data):
+    """
+    Returns the size of in-memory data, or None for streams
+    """
+    if isinstance(data, str):
+        return len(data.encode())
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return len(data)
+    return None
+
+
+def multipart_upload(data, upload_part, part_size=MULTIPART_PART_SIZE,
+                     max_concurrency=MULTIPART_MAX_CONCURRENCY):
+    """
+    Uploads the parts of in-memory data or of a stream concurrently. Streams are read
+    part by part, and always give at least one part, even if they are empty.
+    :param upload_part: function(part_number, part_data) that uploads a part. Parts are numbered from 1
+    :return: list with the results of upload_part, in part order
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    if hasattr(data, 'read'):
+        first_part = data.read(part_size)
+        parts = itertools.chain([first_part], iter(lambda: data.read(part_size), b''))
+    else:
+        view = memoryview(data)
+        parts = (view[offset:offset+part_size].tobytes() for offset in range(0, len(view), part_size))
+    results = []
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for part_number, part in enumerate(parts, start=1):
+            if len(pending) >= max_concurrency:
+                results.append(pending.popleft().result())
+            pending.append(executor.submit(upload_part, part_number, part))
+        results.extend(future.result() for future in pending)
+    return results
+
+
+def parallel_download(get_range, first_byte, obj_size, part_size=MULTIPART_PART_SIZE,
+                      max_concurrency=MULTIPART_MAX_CONCURRENCY):
+    """
+    Downloads the bytes from first_byte to the end of the object with concurrent ranged GETs.
+    :param get_range: function(first_byte, last_byte) that returns the data of a range
+    :return: data of the range
+    """
+    starts = range(first_byte, obj_size, part_size)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        parts = executor.map(lambda start: get_range(start, min(start+part_size, obj_size)-1), starts)
+        return b''.join(parts)
+
+
+def s3_put_object(client, bucket_name, key, data, multipart_threshold=MULTIPART_THRESHOLD,
+                  part_size=MULTIPART_PART_SIZE, max_concurrency=MULTIPART_MAX_CONCURRENCY):
+    """
+    Puts an object with an S3-compatible client. In-memory data larger than
+    multipart_threshold is sent with a multipart upload of concurrent parts.
+    :return: response of the PUT, or of the completion of the multipart upload
+    """
+    size = data_size(data)
+    if size is None or size <= multipart_threshold:
+        return client.put_object(Bucket=bucket_name, Key=key, Body=data)
+
+    upload_id = client.create_multipart_upload(Bucket=bucket_name, Key=key)['UploadId']
+
+    def _upload_part(part_number, part):
+        res = client.upload_part(Bucket=bucket_name, Key=key, UploadId=upload_id,
+                                 PartNumber=part_number, Body=part)
+        return {'ETag': res['ETag'], 'PartNumber': part_number}
+
+    try:
+        parts = multipart_upload(data, _upload_part, part_size, max_concurrency)
+        return client.complete_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id,
+                                                MultipartUpload={'Parts': parts})
+    except Exception:
+        client.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+        raise
+
+
+def s3_get_object(client, bucket_name, key, multipart_threshold=MULTIPART_THRESHOLD,
+                  part_size=MULTIPART_PART_SIZE, max_concurrency=MULTIPART_MAX_CONCURRENCY):
+    """
+    Gets a whole object with an S3-compatible client. The first GET asks for
+    the first multipart_threshold bytes, and its Content-Range tells the size of
+    the object. Larger objects get the rest downloaded with concurrent ranged GETs,
+    pinned to the ETag of the first response so that they all read the same version.
+    :return: data of the object
+    """
+    try:
+        r = client.get_object(Bucket=bucket_name, Key=key, Range='bytes=0-{}'.format(multipart_threshold-1))
+    except Exception as e:
+        # Empty objects can not satisfy any range
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'InvalidRange':
+            return client.get_object(Bucket=bucket_name, Key=key)['Body'].read()
+        raise
+    data = r['Body'].read()
+    obj_size = int(r['ContentRange'].rsplit('/', 1)[1]) if r.get('ContentRange') else len(data)
+    if obj_size <= len(data):
+        return data
+
+    extra_get_args = {'IfMatch': r['ETag']} if r.get('ETag') else {}
+
+    def _get_range(first_byte, last_byte):
+        r = client.get_object(Bucket=bucket_name, Key=key, Range='bytes={}-{}'.format(first_byte, last_byte),
+                              **extra_get_args)
+        return r['Body'].read()
+
+    try:
+        return data + parallel_download(_get_range, len(data), obj_size, part_size, max_concurrency)
+    except Exception as e:
+        # The object was overwritten during the download, start again with the new version
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'PreconditionFailed':
+            return s3_get_object(client, bucket_name, key, multipart_threshold, part_size, max_concurrency)
+        raise
+
+
+def s3_list_common_prefixes(client, bucket_name, prefix=None, delimiter='/'):
+    """
+    Lists the objects and the common prefixes found right under the given prefix
+    with an S3-compatible client.
+    :return: List of objects and list of common prefixes under the given prefix.
+    """
+    prefix = '' if prefix is None else prefix
+    try:
+        paginator = client.get_paginator('list_objects_v2')
+        page_iterator = paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter=delimiter)
+
+        object_list = []
+        prefix_list = []
+        for page in page_iterator:
+            if 'Contents' in page:
+                for item in page['Contents']:
+                    object_list.append(item)
+            if 'CommonPrefixes' in page:
+                for item in page['CommonPrefixes']:
+                    prefix_list.append(item['Prefix'])
+        return object_list, prefix_list
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == '404':
+            raise StorageNoSuchKeyError(bucket_name, prefix)
+        raise
+
+
 def clean_bucket(sh, bucket, prefix, sleep=5, log=True):
     """
     Deletes all the files from COS. These files include the function,
@@ -130,6 +447,16 @@ def create_func_key(prefix, executor_id, job_id):
     return func_key
 
 
+def create_job_manifest_key(prefix, executor_id, job_id):
+    """
+    Create job manifest key
+    :param prefix: prefix
+    :param executor_id: callset's ID
+    :return: a key for the manifest of the job
+    """
+    return '/'.join([prefix, executor_id, job_id, manifest_key_suffix])
+
+
 def create_agg_data_key(prefix, executor_id, job_id):
     """
     Create aggregate data key
@@ -18,7 +18,6 @@
 
 import base64
 import os
-import pika
 import uuid
 import inspect
 import struct
@@ -30,6 +29,14 @@ import io
 
 logger = logging.getLogger(__name__)
 
+HTTP_POOL_CONNECTIONS = 32
+HTTP_POOL_MAXSIZE = 64
+HTTP_MAX_RETRIES = 5
+HTTP_BACKOFF_FACTOR = 0.2
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
 
 def uuid_str():
     return str(uuid.uuid4())
@@ -64,6 +71,7 @@ def create_rabbitmq_resources(rabbit_amqp_url, executor_id, job_id):
         queue_0 = '{}-0'.format(exchange)  # For waiting
         queue_1 = '{}-1'.format(exchange)  # For invoker
 
+        import pika
         params = pika.URLParameters(rabbit_amqp_url)
         connection = pika.BlockingConnection(params)
         channel = connection.channel()
@@ -89,6 +97,7 @@ def delete_rabbitmq_resources(rabbit_amqp_url, executor_id, job_id):
     queue_0 = '{}-0'.format(exchange)  # For waiting
     queue_1 = '{}-1'.format(exchange)  # For invoker
 
+    import pika
     params = pika.URLParameters(rabbit_amqp_url)
     connection = pika.BlockingConnection(params)
     channel = connection.channel()
@@ -124,6 +133,19 @@ def is_unix_system():
     return curret_system != 'Windows'
 
 
+def strtobool(val):
+    """
+    Converts a string representation of truth to 1 or 0, like
+    distutils.util.strtobool, without importing distutils.
+    """
+    val = val.lower()
+    if val in ('y', 'yes', 't', 'true', 'on', '1'):
+        return 1
+    if val in ('n', 'no', 'f', 'false', 'off', '0'):
+        return 0
+    raise ValueError('invalid truth value {}'.format(val))
+
+
 def is_cloudbutton_function():
     """
     Checks if the current execution is within a pywren fn
@@ -187,6 +209,33 @@ def b64str_to_bytes(str_data):
     return byte_data
 
 
+def get_http_session():
+    """
+    Returns the HTTP session shared by the whole process. It keeps alive up to
+    HTTP_POOL_MAXSIZE connections per host, blocks instead of opening more, and
+    retries idempotent requests with exponential backoff on connection errors
+    and 5xx/429 responses.
+    """
+    global _http_session
+
+    import requests
+    from urllib3.util.retry import Retry
+
+    with _http_session_lock:
+        if _http_session is None:
+            retries = Retry(total=HTTP_MAX_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR,
+                            status_forcelist=(429, 500, 502, 503, 504))
+            adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS,
+                                                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                                                    pool_block=True, max_retries=retries)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_session = session
+
+    return _http_session
+
+
 def split_object_url(obj_url):
     if '://' in obj_url:
         sb, path = obj_url.split('://')
@@ -382,6 +431,8 @@ class WrappedStreamingBodyPartition(WrappedStreamingBody):
         self.first_byte = None
         # Flag that indicates the end of the file
         self.eof = False
+        # botocore's StreamingBody only provides readline() through its raw stream
+        self._raw_stream = getattr(self.sb, '_raw_stream', self.sb)
 
     def read(self, n=None):
         if self.eof:
@@ -421,9 +472,9 @@ class WrappedStreamingBodyPartition(WrappedStreamingBody):
             self.first_byte = self.sb.read(self.plusbytes)
             if self.first_byte != b'\n':
                 logger.debug('Discarding first partial row')
-                self.sb._raw_stream.readline()
+                self._raw_stream.readline()
         try:
-            retval = self.sb._raw_stream.readline()
+            retval = self._raw_stream.readline()
         except struct.error:
             raise EOFError()
         self.pos += len(retval)
@@ -17,7 +17,6 @@
 import sys
 import json
 import time
-import pika
 import queue
 import pickle
 import logging
@@ -172,6 +171,7 @@ def _job_monitor_thread(job_key, total_calls, rabbit_amqp_url, job_monitor_q):
 
     logger.debug('ExecutorID {} | JobID {} - Consuming from RabbitMQ '
                  'queue'.format(executor_id, job_id))
+    import pika
     params = pika.URLParameters(rabbit_amqp_url)
     connection = pika.BlockingConnection(params)
     channel = connection.channel()
@@ -23,7 +23,6 @@ import pickle
 import random
 import logging
 from threading import Thread
-from multiprocessing.pool import ThreadPool
 
 from cloudbutton.engine.storage.utils import create_status_key
 from cloudbutton.config import JOBS_PREFIX
@@ -51,7 +50,7 @@ def wait_storage(fs, internal_storage, download_results=False,
     :param download_results: Download the results: Ture, False.
     :param pbar: Progress bar.
     :param return_when: One of `ALL_COMPLETED`, `ANY_COMPLETED`, `ALWAYS`
-    :param THREADPOOL_SIZE: Number of threads to use. Default 128
+    :param THREADPOOL_SIZE: Number of status queries issued at once. Default 128
     :param WAIT_DUR_SEC: Time interval between each check.
 
     :return: `(fs_dones, fs_notdones)`
@@ -188,11 +187,6 @@ def _wait_storage(fs, running_futures, internal_storage, download_results, throw
         not_done_call_ids = not_done_call_ids - done_call_ids
         still_not_done_futures += [f for f in not_done_futures if ((f.executor_id, f.job_id, f.call_id) in not_done_call_ids)]
 
-    def fetch_future_status(f):
-        return internal_storage.get_call_status(f.executor_id, f.job_id, f.call_id)
-
-    pool = ThreadPool(THREADPOOL_SIZE)
-
     # now try up to max_direct_query_n direct status queries, quitting once
     # we have return_n done.
     query_count = 0
@@ -207,7 +201,8 @@ def _wait_storage(fs, running_futures, internal_storage, download_results, throw
         num_to_query_at_once = THREADPOOL_SIZE
         fs_to_query = still_not_done_futures[query_count:query_count + num_to_query_at_once]
 
-        fs_statuses = pool.map(fetch_future_status, fs_to_query)
+        fs_statuses = internal_storage.get_calls_status([(f.executor_id, f.job_id, f.call_id)
+                                                         for f in fs_to_query])
 
         callids_found = [(fs_to_query[i].executor_id, fs_to_query[i].job_id, fs_to_query[i].call_id)
                          for i in range(len(fs_to_query)) if fs_statuses[i] is not None]
@@ -233,34 +228,35 @@ def _wait_storage(fs, running_futures, internal_storage, download_results, throw
             else:
                 fs_notdones.append(f)
 
-    def get_result(f):
-        if f.running:
-            f._call_status = None
-        f.result(throw_except=throw_except, internal_storage=internal_storage)
-
-    def get_status(f):
-        if f.running:
+    # Download the statuses, and the outputs if requested, of the finished calls
+    # in bulk, so the futures are updated without any further request
+    status_fs = [f for f in f_to_wait_on if not (f.ready or f.done)]
+    fs_statuses = internal_storage.get_calls_status([(f.executor_id, f.job_id, f.call_id) for f in status_fs])
+    for f, call_status in zip(status_fs, fs_statuses):
+        if call_status is not None:
+            f._call_status = call_status
+            f._status_query_count += 1
+        elif f.running:
             f._call_status = None
-        f.status(throw_except=throw_except, internal_storage=internal_storage)
-
-#     with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as executor:
-#         if download_results:
-#             executor.map(get_result, f_to_wait_on)
-#         else:
-#             executor.map(get_status, f_to_wait_on)
 
     if download_results:
-        pool.map(get_result, f_to_wait_on)
-    else:
-        pool.map(get_status, f_to_wait_on)
+        output_fs = [f for f in f_to_wait_on if not f.done and f._call_status
+                     and f._call_status.get('result') and not f._call_status.get('exception')]
+        fs_outputs = internal_storage.get_calls_output([(f.executor_id, f.job_id, f.call_id) for f in output_fs])
+        for f, call_output in zip(output_fs, fs_outputs):
+            f._prefetched_output = call_output
+
+    for f in f_to_wait_on:
+        if download_results:
+            f.result(throw_except=throw_except, internal_storage=internal_storage)
+        else:
+            f.status(throw_except=throw_except, internal_storage=internal_storage)
 
     if pbar:
         for f in f_to_wait_on:
             if (download_results and f.done) or (not download_results and (f.ready or f.done)):
                 pbar.update(1)
         pbar.refresh()
-    pool.close()
-    pool.join()
 
     # Check for new futures
     new_futures = [f.result() for f in f_to_wait_on if f.futures]
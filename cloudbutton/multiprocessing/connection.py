@@ -17,6 +17,8 @@ import struct
 import time
 import tempfile
 import itertools
+import collections
+import redis
 from random import randint
 
 import _multiprocessing
@@ -25,6 +27,7 @@ from . import util
 from . import get_context
 from . import AuthenticationError, BufferTooShort
 from .context import reduction
+from cloudbutton.config import TEMP_PREFIX
 _ForkingPickler = reduction.ForkingPickler
 
 try:
@@ -48,6 +51,25 @@ REDIS_LIST_CONN_B = REDIS_LIST_CONN + '-b-'
 REDIS_PUBSUB_CONN = 'pubsubconn'    # uses channels (pub/sub)
 REDIS_PUBSUB_CONN_A = REDIS_PUBSUB_CONN + '-a-'
 REDIS_PUBSUB_CONN_B = REDIS_PUBSUB_CONN + '-b-'
+REDIS_STREAM_CONN = 'streamconn'    # uses streams (consumer groups)
+REDIS_STREAM_CONN_A = REDIS_STREAM_CONN + '-a-'
+REDIS_STREAM_CONN_B = REDIS_STREAM_CONN + '-b-'
+
+#           Streams
+# All the readers of a stream connection share a consumer
+# group, so each message is delivered to one of them
+STREAM_GROUP = 'readers'
+STREAM_FIELD = b'msg'
+# Messages received by a reader and not acknowledged after
+# this many seconds are delivered to another reader
+STREAM_CLAIM_IDLE = 60.
+
+#           Spill
+# Messages larger than this are uploaded to the object storage,
+# only a reference to them goes through redis
+SPILL_THRESHOLD = 1024 * 1024
+SPILL_PREFIX = '/'.join([TEMP_PREFIX, 'multiprocessing'])
+SPILL_MARKER = b'\x00cloudbutton.spill\x00'
 
 
 BUFSIZE = 8192
@@ -90,6 +112,9 @@ def get_handle_pair(conn_type=REDIS_LIST_CONN, from_id=None):
     elif conn_type == REDIS_PUBSUB_CONN:
         return (REDIS_PUBSUB_CONN_A + id,
                 REDIS_PUBSUB_CONN_B + id)
+    elif conn_type == REDIS_STREAM_CONN:
+        return (REDIS_STREAM_CONN_A + id,
+                REDIS_STREAM_CONN_B + id)
 
 def get_subhandle(handle):
     if handle.startswith(REDIS_LIST_CONN_A):
@@ -104,6 +129,12 @@ def get_subhandle(handle):
     elif handle.startswith(REDIS_PUBSUB_CONN_B):
         return REDIS_PUBSUB_CONN_A + handle[len(REDIS_PUBSUB_CONN_B):]
 
+    elif handle.startswith(REDIS_STREAM_CONN_A):
+        return REDIS_STREAM_CONN_B + handle[len(REDIS_STREAM_CONN_A):]
+
+    elif handle.startswith(REDIS_STREAM_CONN_B):
+        return REDIS_STREAM_CONN_A + handle[len(REDIS_STREAM_CONN_B):]
+
     raise ValueError("bad handle prefix '{}' - see "
         "cloudbutton.multiprocessing.connection handle prefixes".format(handle))
 
@@ -111,9 +142,9 @@ def _validate_address(address):
     if not isinstance(address, str):
         raise ValueError("address must be a str, got {}"\
             .format(type(address)))
-    if not address.startswith((REDIS_LIST_CONN, REDIS_PUBSUB_CONN)):
-        raise ValueError("address '{}' is not of any known type ({}, {})"\
-            .format(address, REDIS_LIST_CONN, REDIS_PUBSUB_CONN))
+    if not address.startswith((REDIS_LIST_CONN, REDIS_PUBSUB_CONN, REDIS_STREAM_CONN)):
+        raise ValueError("address '{}' is not of any known type ({}, {}, {})"\
+            .format(address, REDIS_LIST_CONN, REDIS_PUBSUB_CONN, REDIS_STREAM_CONN))
 
 def arbitrary_address(family):
     '''
@@ -324,7 +355,18 @@ class Connection(_ConnectionBase):
         self._subhandle = get_subhandle(handle)
         self._connect()
 
+        if self._handle.startswith(REDIS_STREAM_CONN) and self._readable:
+            # Messages sent before the group exists are also delivered
+            try:
+                self._client.xgroup_create(self._subhandle, STREAM_GROUP, id='0', mkstream=True)
+            except redis.exceptions.ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
     def _connect(self):
+        # messages received by poll() and not read yet
+        self._pending = collections.deque()
+
         if self._handle.startswith(REDIS_LIST_CONN):
             self._read = self._listread
             self._write = self._listwrite
@@ -338,6 +380,14 @@ class Connection(_ConnectionBase):
             # ignore first message (subscribe message)
             next(self._gen)
 
+        elif self._handle.startswith(REDIS_STREAM_CONN):
+            self._read = self._streamread
+            self._write = self._streamwrite
+            # Every process reads as a different consumer of the group
+            self._consumer = util.get_uuid()
+            self._unacked = collections.deque()
+            self._last_claim = None
+
     def __getstate__(self):
         return (self._client, self._handle, self._subhandle,
             self._readable, self._writable)    
@@ -348,7 +398,11 @@ class Connection(_ConnectionBase):
         self._connect()
 
     def __len__(self):
-        return self._client.llen(self._handle)
+        # messages available to read
+        if self._handle.startswith(REDIS_STREAM_CONN):
+            # acknowledged messages are deleted from the stream
+            return self._client.xlen(self._subhandle) - self._received()
+        return self._client.llen(self._subhandle) + len(self._pending)
 
     def _close(self, _close=None):
         # older versions of StrictRedis can't be closed
@@ -358,16 +412,132 @@ class Connection(_ConnectionBase):
     def _listwrite(self, handle, buf):
         return self._client.rpush(handle, buf)
 
-    def _listread(self, handle):
-        _, v = self._client.blpop([handle])
-        return v
+    def _listread(self, handle, timeout=None):
+        res = self._client.blpop([handle], util.blocking_timeout(timeout, self._client))
+        if res is None:
+            return None
+        _, v = res
+        return self._load(v)
+
+    def _listread_many(self, handle, maxitems):
+        # LPOP with a count needs redis 6.2
+        pipeline = self._client.pipeline()
+        pipeline.lrange(handle, 0, maxitems - 1)
+        pipeline.ltrim(handle, maxitems, -1)
+        values, _ = pipeline.execute()
+        return [self._load(v) for v in values]
+
+    def _streamwrite(self, handle, buf):
+        return self._client.xadd(handle, {STREAM_FIELD: buf})
+
+    def _streamread(self, handle, timeout=None):
+        bufs = self._streamread_many(handle, 1, timeout)
+        return bufs[0] if bufs else None
+
+    def _streamread_many(self, handle, maxitems, timeout=None):
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while True:
+            entries = self._claim_stream(handle, maxitems)
+            if not entries:
+                # Wake up from time to time to claim the
+                # messages of the readers that died
+                wait = STREAM_CLAIM_IDLE
+                if timeout is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                block = max(int(wait * 1000), 1) if wait > 0 else None
+                res = self._client.xreadgroup(STREAM_GROUP, self._consumer, {handle: '>'},
+                                              count=maxitems, block=block)
+                entries = res[0][1] if res else []
+            if entries or (timeout is not None and time.monotonic() >= deadline):
+                break
+
+        bufs = []
+        for message_id, fields in entries:
+            # A spilled payload is deleted once acknowledged, in
+            # case the message has to be delivered again
+            key = None
+            if fields:
+                key = self._spilled_key(fields[STREAM_FIELD])
+                bufs.append(self._load(fields[STREAM_FIELD], delete=False))
+            self._unacked.append((message_id, key))
+        return bufs
+
+    def _spill(self, buf):
+        # Uploads a large message and returns the reference to send instead
+        if buf.nbytes <= SPILL_THRESHOLD:
+            return buf
+        key = '/'.join([SPILL_PREFIX, self._handle, util.get_uuid()])
+        util.get_storage().put_data(key, buf.tobytes())
+        return SPILL_MARKER + key.encode()
+
+    def _spilled_key(self, buf):
+        if buf is None or not buf.startswith(SPILL_MARKER):
+            return None
+        return buf[len(SPILL_MARKER):].decode()
+
+    def _load(self, buf, delete=True):
+        # Fetches the payload of a spilled message
+        key = self._spilled_key(buf)
+        if key is None:
+            return buf
+        storage = util.get_storage()
+        buf = storage.get_data(key)
+        if delete:
+            storage.delete_cobject(key=key)
+        return buf
+
+    def _claim_stream(self, handle, maxitems):
+        now = time.monotonic()
+        if self._last_claim is not None and now - self._last_claim < STREAM_CLAIM_IDLE:
+            return []
+        self._last_claim = now
+
+        # XAUTOCLAIM needs redis 6.2. Skip past the messages this
+        # reader did not acknowledge yet, they are pending too
+        min_idle_time = int(STREAM_CLAIM_IDLE * 1000)
+        pending = self._client.xpending_range(handle, STREAM_GROUP, '-', '+',
+                                              maxitems + len(self._unacked))
+        message_ids = [message['message_id'] for message in pending
+                       if message['consumer'].decode() != self._consumer
+                       and message['time_since_delivered'] >= min_idle_time][:maxitems]
+        if len(message_ids) == 0:
+            return []
+        return self._client.xclaim(handle, STREAM_GROUP, self._consumer,
+                                   min_idle_time, message_ids)
+
+    def _received(self):
+        # Unacknowledged messages already returned to the caller, the
+        # ones kept by poll() are the newest and are still to be read
+        return len(self._unacked) - len(self._pending)
+
+    def ack(self, n=None):
+        """
+        Acknowledge the n oldest messages received through a stream
+        connection, or all of them. Messages not acknowledged are
+        delivered to another reader if this one dies.
+        """
+        if not self._handle.startswith(REDIS_STREAM_CONN):
+            return
+        received = self._received()
+        n = received if n is None else min(n, received)
+        acked = [self._unacked.popleft() for _ in range(n)]
+        if len(acked) > 0:
+            message_ids = [message_id for message_id, _ in acked]
+            pipeline = self._client.pipeline()
+            pipeline.xack(self._subhandle, STREAM_GROUP, *message_ids)
+            pipeline.xdel(self._subhandle, *message_ids)
+            pipeline.execute()
+        for _, key in acked:
+            if key is not None:
+                util.get_storage().delete_cobject(key=key)
 
     def _channelwrite(self, handle, buf):
         return self._client.publish(handle, buf)
 
     def _channelread(self, handle):
         msg = next(self._gen)
-        return msg['data']
+        return self._load(msg['data'])
 
     def _send(self, buf, write=None):
         raise NotImplementedError('Connection._send() on Redis')
@@ -376,21 +546,80 @@ class Connection(_ConnectionBase):
         raise NotImplementedError('Connection._recv() on Redis')
 
     def _send_bytes(self, buf):
-        self._write(self._handle, buf.tobytes())
+        # redis takes the memoryview as it is
+        self._write(self._handle, self._spill(buf))
 
     def _recv_bytes(self, maxsize=None):
         buf = io.BytesIO()
-        chunk = self._read(self._subhandle)
+        if self._pending:
+            chunk = self._pending.popleft()
+        else:
+            chunk = self._read(self._subhandle)
         buf.write(chunk)
         return buf
 
     def _poll(self, timeout):
+        if self._pending:
+            return True
         if hasattr(self, '_pubsub'):
             r = wait([(self._pubsub, self._subhandle)], timeout)
+        elif timeout is not None and timeout <= 0 and self._handle.startswith(REDIS_LIST_CONN):
+            r = self._client.llen(self._subhandle) > 0
         else:
-            r = wait([(self._client, self._subhandle)], timeout)
+            # Block on the server instead of polling, the
+            # message is kept until it is read
+            chunk = self._read(self._subhandle, timeout)
+            if chunk is not None:
+                self._pending.append(chunk)
+            r = chunk is not None
         return bool(r)
 
+    def send_bytes_many(self, bufs):
+        """Send several bytes-like objects in a single request"""
+        self._check_closed()
+        self._check_writable()
+        bufs = [self._spill(memoryview(buf)) for buf in bufs]
+        if len(bufs) == 0:
+            return
+        if self._handle.startswith(REDIS_LIST_CONN):
+            self._client.rpush(self._handle, *bufs)
+        else:
+            pipeline = self._client.pipeline(transaction=False)
+            for buf in bufs:
+                if self._handle.startswith(REDIS_STREAM_CONN):
+                    pipeline.xadd(self._handle, {STREAM_FIELD: buf})
+                else:
+                    pipeline.publish(self._handle, buf)
+            pipeline.execute()
+
+    def recv_bytes_many(self, maxitems, block=True, timeout=None):
+        """
+        Receive up to maxitems messages as bytes objects. If block is True,
+        wait up to timeout seconds for the first one. Returns an empty
+        list if no message is available.
+        """
+        self._check_closed()
+        self._check_readable()
+        if maxitems < 1:
+            raise ValueError("maxitems must be positive")
+
+        if block and (timeout is None or timeout > 0) and not self._pending:
+            if not self._poll(timeout):
+                return []
+
+        bufs = []
+        while self._pending and len(bufs) < maxitems:
+            bufs.append(self._pending.popleft())
+        if len(bufs) < maxitems:
+            if self._handle.startswith(REDIS_LIST_CONN):
+                bufs.extend(self._listread_many(self._subhandle, maxitems - len(bufs)))
+            elif self._handle.startswith(REDIS_STREAM_CONN):
+                bufs.extend(self._streamread_many(self._subhandle, maxitems - len(bufs), 0))
+            else:
+                while len(bufs) < maxitems and self._poll(0):
+                    bufs.append(self._read(self._subhandle))
+        return bufs
+
 
 PipeConnection = Connection
 
@@ -465,11 +694,12 @@ def Client(address, family=None, authkey=None):
     return c
 
 
-def Pipe(duplex=True):
+def Pipe(duplex=True, conn_type=REDIS_LIST_CONN):
     '''
-    Returns pair of connection objects at either end of a pipe
+    Returns pair of connection objects at either end of a pipe. With
+    REDIS_STREAM_CONN, the messages are kept until acknowledged.
     '''
-    h1, h2 = get_handle_pair(conn_type=REDIS_LIST_CONN)     
+    h1, h2 = get_handle_pair(conn_type=conn_type)     
 
     if duplex:
         c1 = Connection(h1)
@@ -660,6 +890,10 @@ def wait(object_list, timeout=None):
                 l = client.llen(handle)
                 if l > 0:
                     ready.append((client, handle))
+            elif handle.startswith(REDIS_STREAM_CONN):
+                # also counts the messages other readers did not acknowledge
+                if client.xlen(handle) > 0:
+                    ready.append((client, handle))
             elif handle.startswith(REDIS_PUBSUB_CONN)\
                  and client.connection.can_read():
                 ready.append((client, handle))
@@ -58,10 +58,10 @@ class BaseContext(object):
         from .managers import SyncManager
         return SyncManager()
 
-    def Pipe(self, duplex=True):
+    def Pipe(self, duplex=True, reliable=False):
         '''Returns two connection object connected by a pipe'''
-        from .connection import Pipe
-        return Pipe(duplex)
+        from .connection import Pipe, REDIS_LIST_CONN, REDIS_STREAM_CONN
+        return Pipe(duplex, REDIS_STREAM_CONN if reliable else REDIS_LIST_CONN)
 
     def Lock(self):
         '''Returns a non-recursive lock object'''
@@ -98,20 +98,20 @@ class BaseContext(object):
         from .synchronize import Barrier
         return Barrier(parties, action, timeout)
 
-    def Queue(self, maxsize=0):
+    def Queue(self, maxsize=0, reliable=False):
         '''Returns a queue object'''
         from .queues import Queue
-        return Queue()
+        return Queue(maxsize, reliable)
 
-    def JoinableQueue(self, maxsize=0):
+    def JoinableQueue(self, maxsize=0, reliable=False):
         '''Returns a queue object'''
         from .queues import JoinableQueue
-        return JoinableQueue()
+        return JoinableQueue(maxsize, reliable)
 
-    def SimpleQueue(self):
+    def SimpleQueue(self, reliable=False):
         '''Returns a queue object'''
         from .queues import SimpleQueue
-        return SimpleQueue()
+        return SimpleQueue(reliable)
 
     def Pool(self, processes=None, initializer=None, initargs={},
              maxtasksperchild=None):
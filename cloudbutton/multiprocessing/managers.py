@@ -19,7 +19,11 @@ from . import synchronize
 from . import queues
 from . import util
 from .reduction import DefaultPickler
-import redis
+import os
+import time
+import threading
+import weakref
+import collections
 from copy import deepcopy
 
 
@@ -27,21 +31,11 @@ from copy import deepcopy
 # Helper functions
 #
 
-def deslice(slic: slice):
-    start = slic.start
-    end = slic.stop
-    step = slic.step
-
-    if start is None:
-        start = 0
-    if end is None:
-        end = -1
-    elif start == end or end == 0:
-        return None, None, None
-    else:
-        end -= 1
-
-    return start, end, step
+def slice_args(slic: slice):
+    # start, stop and step of a slice as script arguments,
+    # None is sent as an empty string
+    return ['' if arg is None else arg.__index__()
+            for arg in (slic.start, slic.stop, slic.step)]
 
 
 #
@@ -113,6 +107,13 @@ class BaseManager:
     def join(self, timeout=None):
         pass
 
+    def batch(self, *proxies):
+        '''
+        Return a context manager that sends all the operations made
+        on the given proxies in a single request when it exits
+        '''
+        return Batch(*proxies)
+
     def _number_of_objects(self):
         '''
         Return the number of shared objects
@@ -150,6 +151,279 @@ class BaseManager:
         setattr(cls, typeid, temp)
 
 
+#
+# Local copy of the referent of cached proxies
+#
+
+class ProxyCacheListener:
+    '''
+    Pub/sub connection shared by the cached proxies of a process,
+    which delivers the change notifications to the caches of
+    each channel from a single thread. The pub/sub connection is
+    only used by that thread, which also handles the subscriptions
+    and reconnects if the connection fails.
+    '''
+
+    # seconds the thread waits for messages before handling the
+    # subscriptions, and to wait for a subscription to be confirmed
+    LISTEN_INTERVAL = 0.1
+    SUBSCRIBE_TIMEOUT = 10
+    RECONNECT_DELAY = 1
+
+    def __init__(self, client):
+        self._client = client
+        self._pubsub = client.pubsub()
+        self._lock = threading.Lock()
+        self._caches = {}
+        self._subscribed = {}
+        self._requests = collections.deque()
+        self._thread = None
+
+    def register(self, cache):
+        channel = cache._oid
+        with self._lock:
+            if channel not in self._caches:
+                self._caches[channel] = weakref.WeakSet()
+                self._subscribed[channel] = threading.Event()
+                self._requests.append(('subscribe', channel))
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._listen)
+                    self._thread.daemon = True
+                    self._thread.start()
+            self._caches[channel].add(cache)
+            subscribed = self._subscribed[channel]
+        # Caches are not used until they can receive the changes
+        subscribed.wait(self.SUBSCRIBE_TIMEOUT)
+
+    def unregister(self, cache):
+        channel = cache._oid
+        with self._lock:
+            caches = self._caches.get(channel)
+            if caches is None:
+                return
+            caches.discard(cache)
+            if len(caches) == 0:
+                del self._caches[channel]
+                del self._subscribed[channel]
+                self._requests.append(('unsubscribe', channel))
+
+    def is_subscribed(self, channel):
+        subscribed = self._subscribed.get(channel)
+        return subscribed is not None and subscribed.is_set()
+
+    def _listen(self):
+        while True:
+            try:
+                self._handle_requests()
+                message = self._pubsub.get_message(timeout=self.LISTEN_INTERVAL)
+            except Exception as e:
+                util.info('proxy cache listener failed, reconnecting: %r', e)
+                self._reconnect()
+                continue
+            if message is not None:
+                self._dispatch(message)
+
+    def _handle_requests(self):
+        while True:
+            with self._lock:
+                if not self._requests:
+                    return
+                action, channel = self._requests[0]
+            getattr(self._pubsub, action)(channel)
+            with self._lock:
+                self._requests.popleft()
+
+    def _dispatch(self, message):
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        with self._lock:
+            if channel not in self._subscribed:
+                return
+            if message['type'] == 'subscribe':
+                self._subscribed[channel].set()
+            elif message['type'] == 'unsubscribe':
+                # Subscribed again while unsubscribing
+                self._subscribed[channel].clear()
+            elif message['type'] == 'message':
+                for cache in list(self._caches[channel]):
+                    cache.invalidate()
+
+    def _reconnect(self):
+        # Changes may have been missed, the caches are
+        # not used again until subscribed to them anew
+        with self._lock:
+            for subscribed in self._subscribed.values():
+                subscribed.clear()
+            caches = [cache for caches in self._caches.values() for cache in caches]
+        for cache in caches:
+            cache.invalidate()
+        try:
+            self._pubsub.close()
+        except Exception:
+            pass
+
+        while True:
+            time.sleep(self.RECONNECT_DELAY)
+            with self._lock:
+                # All the current channels are subscribed at once
+                self._requests.clear()
+                channels = list(self._caches)
+            pubsub = self._client.pubsub()
+            try:
+                if channels:
+                    pubsub.subscribe(*channels)
+            except Exception as e:
+                util.info('proxy cache listener failed to reconnect: %r', e)
+                pubsub.close()
+                continue
+            self._pubsub = pubsub
+            return
+
+
+_cache_listeners = {}
+_cache_listeners_lock = threading.Lock()
+
+
+def get_cache_listener(client):
+    '''
+    Return the listener of this process for the pool
+    of the client, which takes a single connection of it
+    '''
+    # A forked process can not use the connection of its parent
+    key = (os.getpid(), id(client.connection_pool))
+    with _cache_listeners_lock:
+        if key not in _cache_listeners:
+            _cache_listeners[key] = ProxyCacheListener(client)
+        return _cache_listeners[key]
+
+
+class ProxyCache:
+    '''
+    Serialized copy of the referent of a proxy. Proxies notify their
+    changes on a channel named after the referent, and the copy is
+    fetched again in bulk on the first read after a change.
+    '''
+
+    def __init__(self, client, oid, fetch):
+        self._client = client
+        self._oid = oid
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._version = 0
+        self._fetched_version = None
+        self._value = None
+
+        self._listener = get_cache_listener(client)
+        self._listener.register(self)
+
+    def invalidate(self):
+        self._version += 1
+
+    def get(self):
+        if not self._listener.is_subscribed(self._oid):
+            # The changes would be missed
+            return self._fetch(self._client, self._oid)
+        with self._lock:
+            # A change notified while fetching bumps the
+            # version again, so it is never missed
+            version = self._version
+            if version != self._fetched_version:
+                self._value = self._fetch(self._client, self._oid)
+                self._fetched_version = version
+            return self._value
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.unregister(self)
+            self._listener = None
+
+
+#
+# Batches of proxy operations
+#
+
+class BatchFuture:
+    '''
+    Result of an operation made inside a batch,
+    available once the batch has been sent
+    '''
+
+    def __init__(self, then=None):
+        self._then = then
+        self._done = False
+        self._response = None
+
+    def _set_response(self, response):
+        self._response = response
+        self._done = True
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        if not self._done:
+            raise RuntimeError('the batch of this operation has not been sent')
+        if isinstance(self._response, Exception):
+            raise self._response
+        if self._then is None:
+            return self._response
+        return self._then(self._response)
+
+    def __repr__(self):
+        return '<%s object, done=%r>' % (type(self).__name__, self._done)
+
+
+class Batch:
+    '''
+    Context manager that buffers the operations made on some proxies in a
+    single redis pipeline, sent when the context exits. Inside the context
+    the operations return a BatchFuture, and the operations that can not be
+    deferred, like len() or iterating, raise a RuntimeError.
+    '''
+
+    def __init__(self, *proxies):
+        if len(proxies) == 0:
+            raise ValueError('a batch needs at least one proxy')
+        self._proxies = proxies
+        self._pipeline = None
+        self._futures = []
+        self._changed = []
+
+    def __enter__(self):
+        for proxy in self._proxies:
+            if proxy._batch is not None:
+                raise RuntimeError('{!r} is already in a batch'.format(proxy))
+        self._pipeline = self._proxies[0]._client.pipeline(transaction=False)
+        for proxy in self._proxies:
+            proxy._batch = self
+        return self
+
+    def _add(self, queue, then=None, changed=None):
+        future = BatchFuture(then)
+        self._futures.append((len(self._pipeline), future))
+        queue(self._pipeline)
+        if changed is not None and changed not in self._changed:
+            self._changed.append(changed)
+        return future
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for proxy in self._proxies:
+            proxy._batch = None
+        if exc_type is not None:
+            # The operations are discarded
+            self._pipeline.reset()
+            return
+
+        try:
+            responses = self._pipeline.execute(raise_on_error=False)
+        finally:
+            for proxy in self._changed:
+                proxy._changed()
+        for index, future in self._futures:
+            future._set_response(responses[index])
+
+
 #
 # Definition of BaseProxy
 #
@@ -167,6 +441,122 @@ class BaseProxy(object):
         self._pickler = DefaultPickler() if serializer is None else serializer
         self._client = util.get_redis_client()
         self._ref = util.RemoteReference(self._oid, client=self._client)
+        self._cache_enabled = False
+        self._cache = None
+        self._batch = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = None
+        state['_batch'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def _register_script(self, script):
+        return util.make_stateless_script(self._client.register_script(script))
+
+    # Fetches the serialized referent for the cache
+    _fetch_referent = None
+
+    def enable_cache(self):
+        '''
+        Serve the reads from a local copy of the referent, fetched again
+        after any change. Meant for objects that are rarely modified, the
+        setting is kept when the proxy is sent to other processes.
+        '''
+        if self._fetch_referent is None:
+            raise TypeError('{} objects can not be cached'.format(type(self).__name__))
+        self._cache_enabled = True
+        return self
+
+    def disable_cache(self):
+        self._cache_enabled = False
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        return self
+
+    def _cached(self):
+        '''
+        Return the local copy of the referent, None if the cache is disabled
+        '''
+        if not self._cache_enabled or self._batch is not None:
+            return None
+        if self._cache is None:
+            self._cache = ProxyCache(self._client, self._oid, type(self)._fetch_referent)
+            weakref.finalize(self, self._cache.close)
+        return self._cache.get()
+
+    def _changed(self):
+        if self._cache is not None:
+            self._cache.invalidate()
+
+    def batch(self):
+        '''
+        Return a context manager that sends all the operations made
+        on this proxy in a single request when it exits
+        '''
+        return Batch(self)
+
+    def _check_not_batching(self, operation):
+        if self._batch is not None:
+            raise RuntimeError('{} can not be used inside a batch'.format(operation))
+
+    def _read(self, command, *args, then=None):
+        '''
+        Run a command that reads the referent, then is applied to its result
+        '''
+        if self._batch is not None:
+            return self._batch._add(lambda pipeline: getattr(pipeline, command)(*args), then)
+        result = getattr(self._client, command)(*args)
+        return result if then is None else then(result)
+
+    def _read_script(self, script, keys, args=[], then=None):
+        if self._batch is not None:
+            return self._batch._add(lambda pipeline: script(keys=keys, args=args, client=pipeline), then)
+        result = script(keys=keys, args=args, client=self._client)
+        return result if then is None else then(result)
+
+    def _mutate(self, command, *args, then=None):
+        '''
+        Run a command that modifies the referent, and notify the
+        change to the proxies that cache it, if it can be cached
+        '''
+        cacheable = self._fetch_referent is not None
+
+        def queue(pipeline):
+            getattr(pipeline, command)(*args)
+            if cacheable:
+                pipeline.publish(self._oid, '')
+
+        if self._batch is not None:
+            return self._batch._add(queue, then, changed=self)
+        if not cacheable:
+            result = getattr(self._client, command)(*args)
+            return result if then is None else then(result)
+        pipeline = self._client.pipeline()
+        queue(pipeline)
+        try:
+            result, _ = pipeline.execute()
+        finally:
+            self._changed()
+        return result if then is None else then(result)
+
+    def _mutate_script(self, script, keys, args=[], then=None):
+        '''
+        Run a script that modifies the referent, the
+        script notifies the change by itself
+        '''
+        if self._batch is not None:
+            return self._batch._add(lambda pipeline: script(keys=keys, args=args, client=pipeline),
+                                    then, changed=self)
+        try:
+            result = script(keys=keys, args=args, client=self._client)
+        finally:
+            self._changed()
+        return result if then is None else then(result)
 
     def _getvalue(self):
         '''
@@ -211,83 +601,325 @@ class BaseProxy(object):
 
 class ListProxy(BaseProxy):
 
+    # Functions shared by the list scripts
+    LUA_LIST_FUNCTIONS = """
+        -- python's slice.indices(), empty arguments are None
+        local function slice_indices(length, start, stop, step)
+            step = tonumber(step) or 1
+            local lower, upper = 0, length
+            if step < 0 then
+                lower, upper = -1, length - 1
+            end
+            local function clamp(index, default)
+                index = tonumber(index)
+                if index == nil then
+                    return default
+                elseif index < 0 then
+                    return math.max(index + length, lower)
+                end
+                return math.min(index, upper)
+            end
+            if step < 0 then
+                return clamp(start, upper), clamp(stop, lower), step
+            end
+            return clamp(start, lower), clamp(stop, upper), step
+        end
+
+        -- indexes selected by an extended slice
+        local function slice_positions(start, stop, step)
+            local positions = {}
+            local i = start
+            while (step > 0 and i < stop) or (step < 0 and i > stop) do
+                positions[#positions + 1] = i
+                i = i + step
+            end
+            return positions
+        end
+
+        -- unpack() is limited by the size of the lua stack
+        local function push_all(key, values, first, last)
+            for i = first, last, 1000 do
+                redis.call('RPUSH', key, unpack(values, i, math.min(i + 999, last)))
+            end
+        end
+
+        -- replaces the elements [start, stop) of
+        -- the list with values[first], ..., values[last]
+        local function splice(key, length, start, stop, values, first, last)
+            stop = math.max(start, stop)
+            if start == 0 and first > last then
+                redis.call('LTRIM', key, stop, -1)
+                return
+            end
+            local tail = {}
+            if stop < length then
+                tail = redis.call('LRANGE', key, stop, -1)
+            end
+            if start == 0 then
+                redis.call('DEL', key)
+            elseif start < length then
+                redis.call('LTRIM', key, 0, start - 1)
+            end
+            push_all(key, values, first, last)
+            push_all(key, tail, 1, #tail)
+        end
+    """
+
     # KEYS[1] - key to extend
     # KEYS[2] - key to extend with
     # ARGV[1] - number of repetitions
     # A = A + B * C
-    LUA_EXTEND_LIST_SCRIPT = """
+    LUA_EXTEND_LIST_SCRIPT = LUA_LIST_FUNCTIONS + """
         local values = redis.call('LRANGE', KEYS[2], 0, -1)
         if #values == 0 then
             return
         else
             for i=1,tonumber(ARGV[1]) do
-                redis.call('RPUSH', KEYS[1], unpack(values))
+                push_all(KEYS[1], values, 1, #values)
+            end
+            redis.call('PUBLISH', KEYS[1], '')
+        end
+    """
+
+    # KEYS[1] - list key
+    # ARGV[1], ARGV[2], ARGV[3] - slice start, stop and step
+    # return the elements of the slice
+    LUA_GET_SLICE_SCRIPT = LUA_LIST_FUNCTIONS + """
+        local length = redis.call('LLEN', KEYS[1])
+        local start, stop, step = slice_indices(length, ARGV[1], ARGV[2], ARGV[3])
+        if step == 1 then
+            if start >= stop then
+                return {}
+            end
+            return redis.call('LRANGE', KEYS[1], start, stop - 1)
+        end
+        local values = redis.call('LRANGE', KEYS[1], 0, -1)
+        local result = {}
+        for _, i in ipairs(slice_positions(start, stop, step)) do
+            result[#result + 1] = values[i + 1]
+        end
+        return result
+    """
+
+    # KEYS[1] - list key
+    # ARGV[1] - index
+    # ARGV[2] - value to assign
+    # return 0 if the index is out of range
+    LUA_SET_ITEM_SCRIPT = """
+        local length = redis.call('LLEN', KEYS[1])
+        local index = tonumber(ARGV[1])
+        if index < -length or index >= length then
+            return 0
+        end
+        redis.call('LSET', KEYS[1], index, ARGV[2])
+        redis.call('PUBLISH', KEYS[1], '')
+        return 1
+    """
+
+    # KEYS[1] - list key
+    # ARGV[1], ARGV[2], ARGV[3] - slice start, stop and step
+    # ARGV[4], ... - values to assign
+    # return the number of elements of an extended slice, the list
+    # is only modified if it matches the number of values
+    LUA_SET_SLICE_SCRIPT = LUA_LIST_FUNCTIONS + """
+        local length = redis.call('LLEN', KEYS[1])
+        local start, stop, step = slice_indices(length, ARGV[1], ARGV[2], ARGV[3])
+        if step == 1 then
+            splice(KEYS[1], length, start, stop, ARGV, 4, #ARGV)
+            redis.call('PUBLISH', KEYS[1], '')
+            return #ARGV - 3
+        end
+        local positions = slice_positions(start, stop, step)
+        if #positions == #ARGV - 3 then
+            for j, i in ipairs(positions) do
+                redis.call('LSET', KEYS[1], i, ARGV[j + 3])
+            end
+            redis.call('PUBLISH', KEYS[1], '')
+        end
+        return #positions
+    """
+
+    # KEYS[1] - list key
+    # ARGV[1], ARGV[2], ARGV[3] - slice start, stop and step
+    LUA_DEL_SLICE_SCRIPT = LUA_LIST_FUNCTIONS + """
+        local length = redis.call('LLEN', KEYS[1])
+        local start, stop, step = slice_indices(length, ARGV[1], ARGV[2], ARGV[3])
+        if step == 1 then
+            splice(KEYS[1], length, start, stop, {}, 1, 0)
+            redis.call('PUBLISH', KEYS[1], '')
+            return
+        end
+        local deleted = {}
+        for _, i in ipairs(slice_positions(start, stop, step)) do
+            deleted[i + 1] = true
+        end
+        local values = redis.call('LRANGE', KEYS[1], 0, -1)
+        local kept = {}
+        for i, value in ipairs(values) do
+            if not deleted[i] then
+                kept[#kept + 1] = value
             end
         end
+        redis.call('DEL', KEYS[1])
+        push_all(KEYS[1], kept, 1, #kept)
+        redis.call('PUBLISH', KEYS[1], '')
+    """
+
+    # KEYS[1] - list key
+    # ARGV[1] - index
+    # return the removed element, nil if
+    # the index is out of range
+    LUA_POP_SCRIPT = LUA_LIST_FUNCTIONS + """
+        local length = redis.call('LLEN', KEYS[1])
+        local index = tonumber(ARGV[1])
+        if index < 0 then
+            index = index + length
+        end
+        if index < 0 or index >= length then
+            return false
+        end
+        local value = redis.call('LINDEX', KEYS[1], index)
+        splice(KEYS[1], length, index, index + 1, {}, 1, 0)
+        redis.call('PUBLISH', KEYS[1], '')
+        return value
+    """
+
+    # KEYS[1] - list key
+    # ARGV[1] - index
+    # ARGV[2] - value to insert
+    LUA_INSERT_SCRIPT = LUA_LIST_FUNCTIONS + """
+        local length = redis.call('LLEN', KEYS[1])
+        local index = tonumber(ARGV[1])
+        if index < 0 then
+            index = math.max(index + length, 0)
+        else
+            index = math.min(index, length)
+        end
+        if index == 0 then
+            redis.call('LPUSH', KEYS[1], ARGV[2])
+        else
+            splice(KEYS[1], length, index, index, ARGV, 2, 2)
+        end
+        redis.call('PUBLISH', KEYS[1], '')
+    """
+
+    # KEYS[1] - list key
+    LUA_REVERSE_SCRIPT = LUA_LIST_FUNCTIONS + """
+        local values = redis.call('LRANGE', KEYS[1], 0, -1)
+        local reversed = {}
+        for i = #values, 1, -1 do
+            reversed[#reversed + 1] = values[i]
+        end
+        redis.call('DEL', KEYS[1])
+        push_all(KEYS[1], reversed, 1, #reversed)
+        redis.call('PUBLISH', KEYS[1], '')
+    """
+
+    # KEYS[1] - list key
+    # ARGV[1] - value to look for
+    # ARGV[2], ARGV[3] - start and stop of the search
+    # return the index of the first occurrence, -1 if none
+    LUA_INDEX_SCRIPT = LUA_LIST_FUNCTIONS + """
+        local length = redis.call('LLEN', KEYS[1])
+        local start, stop = slice_indices(length, ARGV[2], ARGV[3], '')
+        if start >= stop then
+            return -1
+        end
+        local values = redis.call('LRANGE', KEYS[1], start, stop - 1)
+        for i, value in ipairs(values) do
+            if value == ARGV[1] then
+                return start + i - 1
+            end
+        end
+        return -1
+    """
+
+    # KEYS[1] - list key
+    # ARGV[1] - value to count
+    LUA_COUNT_SCRIPT = """
+        local count = 0
+        for _, value in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+            if value == ARGV[1] then
+                count = count + 1
+            end
+        end
+        return count
     """
 
     def __init__(self, iterable=None):
         super().__init__('list')
-        self._lua_extend_list = self._client.register_script(ListProxy.LUA_EXTEND_LIST_SCRIPT)
-        util.make_stateless_script(self._lua_extend_list)
+        self._lua_extend_list = self._register_script(ListProxy.LUA_EXTEND_LIST_SCRIPT)
+        self._lua_set_item = self._register_script(ListProxy.LUA_SET_ITEM_SCRIPT)
+        self._lua_get_slice = self._register_script(ListProxy.LUA_GET_SLICE_SCRIPT)
+        self._lua_set_slice = self._register_script(ListProxy.LUA_SET_SLICE_SCRIPT)
+        self._lua_del_slice = self._register_script(ListProxy.LUA_DEL_SLICE_SCRIPT)
+        self._lua_pop = self._register_script(ListProxy.LUA_POP_SCRIPT)
+        self._lua_insert = self._register_script(ListProxy.LUA_INSERT_SCRIPT)
+        self._lua_reverse = self._register_script(ListProxy.LUA_REVERSE_SCRIPT)
+        self._lua_index = self._register_script(ListProxy.LUA_INDEX_SCRIPT)
+        self._lua_count = self._register_script(ListProxy.LUA_COUNT_SCRIPT)
 
         if iterable is not None:
             self.extend(iterable)
 
     def __setitem__(self, i, obj):
         if isinstance(i, int) or hasattr(i, '__index__'):
-            idx = i.__index__()
-            serialized = self._pickler.dumps(obj)
-            try:
-                self._client.lset(self._oid, idx, serialized)
-            except redis.exceptions.ResponseError:
-                # raised when index >= len(self)
-                raise IndexError('list assignment index out of range')
-
-        elif isinstance(i, slice):    # TODO: step
-            start, end, step = deslice(i)
-            if start is None:
-                return
-                
-            if end < 0:
-                end = len(self) + end
+            def check_index(done):
+                if not done:
+                    raise IndexError('list assignment index out of range')
 
-            pipeline = self._client.pipeline(transaction=False)
+            serialized = self._pickler.dumps(obj)
+            return self._mutate_script(self._lua_set_item,
+                                       keys=[self._oid],
+                                       args=[i.__index__(), serialized],
+                                       then=check_index)
+
+        elif isinstance(i, slice):
+            if i.step == 0:
+                raise ValueError('slice step cannot be zero')
             try:
-                iterable = iter(obj)
-                for j in range(start, end):
-                    obj = next(iterable)
-                    serialized = self._pickler.dumps(obj)
-                    pipeline.lset(self._oid, j, serialized)
-            except StopIteration:
-                pass
-            except redis.exceptions.ResponseError:
-                # raised when index >= len(self)
-                pipeline.execute()
-                self.extend(iterable)
-                return
+                values = [self._pickler.dumps(v) for v in obj]
             except TypeError:
                 raise TypeError('can only assign an iterable')
-            pipeline.execute()
+
+            def check_size(size):
+                if i.step not in (None, 1) and size != len(values):
+                    raise ValueError('attempt to assign sequence of size {} '
+                        'to extended slice of size {}'.format(len(values), size))
+
+            return self._mutate_script(self._lua_set_slice,
+                                       keys=[self._oid],
+                                       args=slice_args(i) + values,
+                                       then=check_size)
         else:    
             raise TypeError('list indices must be integers '
                 'or slices, not {}'.format(type(i)))
 
+    def _loads_all(self, serialized):
+        return [self._pickler.loads(obj) for obj in serialized]
+
     def __getitem__(self, i):
+        cached = self._cached()
         if isinstance(i, int) or hasattr(i, '__index__'):
+            def loads_item(serialized):
+                if serialized is not None:
+                    return self._pickler.loads(serialized)
+                raise IndexError('list index out of range')
+
             idx = i.__index__()
-            serialized = self._client.lindex(self._oid, idx)
-            if serialized is not None:
-                return self._pickler.loads(serialized)
-            raise IndexError('list index out of range')
-
-        elif isinstance(i, slice):    # TODO: step
-            start, end, step = deslice(i)
-            if start is None:
-                return []
-            serialized = self._client.lrange(self._oid, start, end)
-            unserialized = [self._pickler.loads(obj) for obj in serialized]
-            return unserialized
+            if cached is not None:
+                return loads_item(cached[idx] if -len(cached) <= idx < len(cached) else None)
+            return self._read('lindex', self._oid, idx, then=loads_item)
+
+        elif isinstance(i, slice):
+            if i.step == 0:
+                raise ValueError('slice step cannot be zero')
+            if cached is not None:
+                return self._loads_all(cached[i])
+            return self._read_script(self._lua_get_slice,
+                                     keys=[self._oid],
+                                     args=slice_args(i),
+                                     then=self._loads_all)
             #return type(self)(unserialized)
         else:
             raise TypeError('list indices must be integers '
@@ -299,28 +931,34 @@ class ListProxy(BaseProxy):
         else:
             if iterable != []:
                 values = map(self._pickler.dumps, iterable)
-                self._client.rpush(self._oid, *values)
+                self._mutate('rpush', self._oid, *values)
 
     def _extend_same_type(self, listproxy, repeat=1):
-        self._lua_extend_list(keys=[self._oid, listproxy._oid],
-                              args=[repeat],
-                              client=self._client)
+        self._mutate_script(self._lua_extend_list,
+                            keys=[self._oid, listproxy._oid],
+                            args=[repeat])
 
     def append(self, obj):
         serialized = self._pickler.dumps(obj)
-        self._client.rpush(self._oid, serialized)
+        self._mutate('rpush', self._oid, serialized)
 
     def pop(self, index=None):
         if index is None:
-            serialized = self._client.rpop(self._oid)
-            if serialized is not None:
-                return self._pickler.loads(serialized)
+            def loads_item(serialized):
+                if serialized is not None:
+                    return self._pickler.loads(serialized)
+
+            return self._mutate('rpop', self._oid, then=loads_item)
         else:
-            item = self[index]
-            sentinel = util.get_uuid()
-            self[index] = sentinel
-            self.remove(sentinel)
-            return item
+            def loads_item(serialized):
+                if serialized is None:
+                    raise IndexError('pop index out of range')
+                return self._pickler.loads(serialized)
+
+            return self._mutate_script(self._lua_pop,
+                                       keys=[self._oid],
+                                       args=[index.__index__()],
+                                       then=loads_item)
 
     def __deepcopy__(self, memo):
         selfcopy = type(self)()
@@ -337,6 +975,7 @@ class ListProxy(BaseProxy):
         #        (altough it can now be extended by iterables)
         # newlist = deepcopy(self)
         # return newlist.__iadd__(x)
+        self._check_not_batching('concatenation')
         return self[:] + x
 
     def __iadd__(self, x):
@@ -356,6 +995,7 @@ class ListProxy(BaseProxy):
             # newlist = type(self)()
             # newlist._extend_same_type(self, repeat=n)
             # return newlist
+            self._check_not_batching('repetition')
             return self[:] * n
 
     def __rmul__(self, n):
@@ -370,117 +1010,269 @@ class ListProxy(BaseProxy):
         return self
 
     def __len__(self):
+        self._check_not_batching('len()')
+        cached = self._cached()
+        if cached is not None:
+            return len(cached)
         return self._client.llen(self._oid)
 
+    def __iter__(self):
+        self._check_not_batching('iteration')
+        return iter(self.tolist())
+
+    def __contains__(self, obj):
+        self._check_not_batching('in')
+        return self._index(obj) != -1
+
     def remove(self, obj):
         serialized = self._pickler.dumps(obj)
-        self._client.lrem(self._oid, 1, serialized)
+        self._mutate('lrem', self._oid, 1, serialized)
         return self
 
     def __delitem__(self, i):
-        sentinel = util.get_uuid()
-        self[i] = sentinel
-        self.remove(sentinel)
+        if isinstance(i, int) or hasattr(i, '__index__'):
+            def check_index(serialized):
+                if serialized is None:
+                    raise IndexError('list assignment index out of range')
+
+            self._mutate_script(self._lua_pop,
+                                keys=[self._oid],
+                                args=[i.__index__()],
+                                then=check_index)
+
+        elif isinstance(i, slice):
+            if i.step == 0:
+                raise ValueError('slice step cannot be zero')
+            self._mutate_script(self._lua_del_slice,
+                                keys=[self._oid],
+                                args=slice_args(i))
+        else:
+            raise TypeError('list indices must be integers '
+                'or slices, not {}'.format(type(i)))
+
+    @staticmethod
+    def _fetch_referent(client, oid):
+        return client.lrange(oid, 0, -1)
 
     def tolist(self):
-        serialized = self._client.lrange(self._oid, 0, -1)
-        unserialized = [self._pickler.loads(obj) for obj in serialized]
-        return unserialized
+        cached = self._cached()
+        if cached is not None:
+            return self._loads_all(cached)
+        return self._read('lrange', self._oid, 0, -1, then=self._loads_all)
 
-    # The following methods can't be (properly) implemented on Redis
-    # To still provide the functionality, the list is fetched
-    # entirely, operated in-memory and then put back to Redis
+    # Elements are compared by their serialized value, like remove()
 
     def reverse(self):
-        rev = reversed(self[:])
-        self._client.delete(self._oid)
-        self.extend(rev)
+        self._mutate_script(self._lua_reverse, keys=[self._oid])
         return self
 
-    def sort(self, key=None, reverse=False):
-        sortd = sorted(self[:], key=key, reverse=reverse)
-        self._client.delete(self._oid)
-        self.extend(sortd)
-        return self
-
-    def index(self, obj, start=0, end=-1):
-        return self[:].index(obj, start, end)
+    def _index(self, obj, start=0, end=None, then=None):
+        serialized = self._pickler.dumps(obj)
+        cached = self._cached()
+        if cached is not None:
+            start, end, _ = slice(start, end).indices(len(cached))
+            try:
+                idx = cached.index(serialized, start, end)
+            except ValueError:
+                idx = -1
+            return idx if then is None else then(idx)
+        return self._read_script(self._lua_index,
+                                 keys=[self._oid],
+                                 args=[serialized] + slice_args(slice(start, end)),
+                                 then=then)
+
+    def index(self, obj, start=0, end=None):
+        def check_index(idx):
+            if idx == -1:
+                raise ValueError('{!r} is not in list'.format(obj))
+            return idx
+
+        return self._index(obj, start, end, then=check_index)
 
     def count(self, obj):
-        return self[:].count(obj)
+        serialized = self._pickler.dumps(obj)
+        cached = self._cached()
+        if cached is not None:
+            return cached.count(serialized)
+        return self._read_script(self._lua_count,
+                                 keys=[self._oid],
+                                 args=[serialized])
 
     def insert(self, index, obj):
-        new_list = self[:]
-        new_list.insert(index, obj)
-        self._client.delete(self._oid)
-        self.extend(new_list)
+        serialized = self._pickler.dumps(obj)
+        self._mutate_script(self._lua_insert,
+                            keys=[self._oid],
+                            args=[index.__index__(), serialized])
+
+    # Sorting needs the python comparisons, so the list is sorted
+    # in-memory and put back only if no one modified it meanwhile
+
+    def sort(self, key=None, reverse=False):
+        self._check_not_batching('sort()')
+
+        def sort_list(pipeline):
+            serialized = pipeline.lrange(self._oid, 0, -1)
+            values = [self._pickler.loads(obj) for obj in serialized]
+            if key is None:
+                order = sorted(range(len(values)), key=values.__getitem__, reverse=reverse)
+            else:
+                order = sorted(range(len(values)), key=lambda j: key(values[j]), reverse=reverse)
+            pipeline.multi()
+            pipeline.delete(self._oid)
+            if len(order) > 0:
+                pipeline.rpush(self._oid, *[serialized[j] for j in order])
+            pipeline.publish(self._oid, '')
+
+        try:
+            self._client.transaction(sort_list, self._oid)
+        finally:
+            self._changed()
+        return self
 
 
 class DictProxy(BaseProxy):
 
+    # KEYS[1] - dict key
+    # ARGV[1] - field
+    # return the value of the removed field
+    LUA_POP_SCRIPT = """
+        local value = redis.call('HGET', KEYS[1], ARGV[1])
+        if value then
+            redis.call('HDEL', KEYS[1], ARGV[1])
+            redis.call('PUBLISH', KEYS[1], '')
+        end
+        return value
+    """
+
+    # KEYS[1] - dict key
+    # return {field, value} of the removed
+    # field, nil if the dict is empty
+    LUA_POPITEM_SCRIPT = """
+        local cursor = '0'
+        repeat
+            local page = redis.call('HSCAN', KEYS[1], cursor, 'COUNT', 100)
+            cursor = page[1]
+            if #page[2] > 0 then
+                redis.call('HDEL', KEYS[1], page[2][1])
+                redis.call('PUBLISH', KEYS[1], '')
+                return {page[2][1], page[2][2]}
+            end
+        until cursor == '0'
+        return false
+    """
+
+    # KEYS[1] - dict key
+    # ARGV[1] - field
+    # ARGV[2] - default value
+    # return the current value of the field,
+    # nil if it has been set to the default
+    LUA_SETDEFAULT_SCRIPT = """
+        if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 1 then
+            redis.call('PUBLISH', KEYS[1], '')
+            return false
+        end
+        return redis.call('HGET', KEYS[1], ARGV[1])
+    """
+
+    # KEYS[1] - dict key to copy
+    # KEYS[2] - dict key to copy to
+    LUA_COPY_SCRIPT = """
+        local items = redis.call('HGETALL', KEYS[1])
+        -- unpack() is limited by the size of the lua stack
+        for i = 1, #items, 1000 do
+            redis.call('HMSET', KEYS[2], unpack(items, i, math.min(i + 999, #items)))
+        end
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__('dict')
+        self._lua_pop = self._register_script(DictProxy.LUA_POP_SCRIPT)
+        self._lua_popitem = self._register_script(DictProxy.LUA_POPITEM_SCRIPT)
+        self._lua_setdefault = self._register_script(DictProxy.LUA_SETDEFAULT_SCRIPT)
+        self._lua_copy = self._register_script(DictProxy.LUA_COPY_SCRIPT)
         self.update(*args, **kwargs)
 
     def __setitem__(self, k, v):
         serialized = self._pickler.dumps(v)
-        self._client.hset(self._oid, k, serialized)
+        self._mutate('hset', self._oid, k, serialized)
 
     def __getitem__(self, k):
-        serialized = self._client.hget(self._oid, k)
-        if serialized is None:
-            raise KeyError(k)
-
-        unserialized = self._pickler.loads(serialized)
-        return unserialized
+        def loads_value(serialized):
+            if serialized is None:
+                raise KeyError(k)
+            return self._pickler.loads(serialized)
+
+        cached = self._cached()
+        if cached is not None:
+            return loads_value(cached.get(self._encode_key(k)))
+        return self._read('hget', self._oid, k, then=loads_value)
         
     def __delitem__(self, k):
-        res = self._client.hdel(self._oid, k)   
-        if res == 0:
-            raise KeyError(k)
+        def check_key(res):
+            if res == 0:
+                raise KeyError(k)
+
+        self._mutate('hdel', self._oid, k, then=check_key)
 
     def __contains__(self, k):
+        self._check_not_batching('in')
+        cached = self._cached()
+        if cached is not None:
+            return self._encode_key(k) in cached
         return self._client.hexists(self._oid, k)
 
     def __len__(self):
+        self._check_not_batching('len()')
+        cached = self._cached()
+        if cached is not None:
+            return len(cached)
         return self._client.hlen(self._oid)
 
     def __iter__(self):
+        self._check_not_batching('iteration')
         return iter(self.keys())
 
     def get(self, k, default=None):
-        try:
-            v = self.__getitem__(k)
-        except KeyError:
-            return default
-        else:
-            return v
+        def loads_value(serialized):
+            if serialized is None:
+                return default
+            return self._pickler.loads(serialized)
+
+        cached = self._cached()
+        if cached is not None:
+            return loads_value(cached.get(self._encode_key(k)))
+        return self._read('hget', self._oid, k, then=loads_value)
 
     def pop(self, k, default=None):
-        try:
-            v = self.__getitem__(k)
-        except KeyError:
-            return default
-        else:
-            self.__delitem__(k)
-            return v
+        def loads_value(serialized):
+            if serialized is None:
+                return default
+            return self._pickler.loads(serialized)
+
+        return self._mutate_script(self._lua_pop,
+                                   keys=[self._oid],
+                                   args=[k],
+                                   then=loads_value)
 
     def popitem(self):
-        try:
-            key = self.keys()[0]
-            item = (key, self.__getitem__(key))
-            self.__delitem__(key)
-            return item
-        except IndexError:
-            raise KeyError('popitem(): dictionary is empty')
+        def loads_item(item):
+            if item is None:
+                raise KeyError('popitem(): dictionary is empty')
+            key, serialized = item
+            return key.decode(), self._pickler.loads(serialized)
+
+        return self._mutate_script(self._lua_popitem, keys=[self._oid], then=loads_item)
 
     def setdefault(self, k, default=None):
-        serialized = self._pickler.dumps(default)
-        res = self._client.hsetnx(self._oid, k, serialized)
-        if res == 1:
-            return default
-        else:
-            return self.__getitem__(k)
+        def loads_value(serialized):
+            if serialized is None:
+                return default
+            return self._pickler.loads(serialized)
+
+        return self._mutate_script(self._lua_setdefault,
+                                   keys=[self._oid],
+                                   args=[k, self._pickler.dumps(default)],
+                                   then=loads_value)
 
     def update(self, *args, **kwargs):
         items = []
@@ -503,34 +1295,66 @@ class DictProxy(BaseProxy):
             items.extend((k, self._pickler.dumps(kwargs[k])))
         
         if len(items) > 0:
-            self._client.execute_command('HMSET', self._oid, *items)
+            self._mutate('execute_command', 'HMSET', self._oid, *items)
+
+    @staticmethod
+    def _encode_key(k):
+        # fields as returned by redis
+        return k if isinstance(k, bytes) else str(k).encode()
+
+    @staticmethod
+    def _fetch_referent(client, oid):
+        return client.hgetall(oid)
 
     def keys(self):
-        return [k.decode() for k in self._client.hkeys(self._oid)]
+        def decode_keys(keys):
+            return [k.decode() for k in keys]
+
+        cached = self._cached()
+        if cached is not None:
+            return decode_keys(cached)
+        return self._read('hkeys', self._oid, then=decode_keys)
 
     def values(self):
-        return [self._pickler.loads(v) for v in self._client.hvals(self._oid)]
+        def loads_values(values):
+            return [self._pickler.loads(v) for v in values]
+
+        cached = self._cached()
+        if cached is not None:
+            return loads_values(cached.values())
+        return self._read('hvals', self._oid, then=loads_values)
 
     def items(self):
-        raw_dict = self._client.hgetall(self._oid)
-        items = []
-        for k, v in raw_dict.items():
-            items.append((k.decode(), self._pickler.loads(v)))
-        return items
+        def loads_items(raw_dict):
+            items = []
+            for k, v in raw_dict.items():
+                items.append((k.decode(), self._pickler.loads(v)))
+            return items
+
+        cached = self._cached()
+        if cached is not None:
+            return loads_items(cached)
+        return self._read('hgetall', self._oid, then=loads_items)
 
     def clear(self):
-        self._client.delete(self._oid)
+        self._mutate('delete', self._oid)
 
     def copy(self):
-        # TODO: use lua script
-        return type(self)(self.items())
+        selfcopy = type(self)()
+        self._read_script(self._lua_copy, keys=[self._oid, selfcopy._oid])
+        return selfcopy
 
     def todict(self):
-        raw_dict = self._client.hgetall(self._oid)
-        py_dict = {}
-        for k, v in raw_dict.items():
-            py_dict[k.decode()] = self._pickler.loads(v)
-        return py_dict
+        def loads_dict(raw_dict):
+            py_dict = {}
+            for k, v in raw_dict.items():
+                py_dict[k.decode()] = self._pickler.loads(v)
+            return py_dict
+
+        cached = self._cached()
+        if cached is not None:
+            return loads_dict(cached)
+        return self._read('hgetall', self._oid, then=loads_dict)
 
 
 class NamespaceProxy(BaseProxy):
@@ -570,12 +1394,11 @@ class ValueProxy(BaseProxy):
             self.set(value)
 
     def get(self):
-        serialized = self._client.get(self._oid)
-        return self._pickler.loads(serialized)
+        return self._read('get', self._oid, then=self._pickler.loads)
 
     def set(self, value):
         serialized = self._pickler.dumps(value)
-        self._client.set(self._oid, serialized)
+        self._mutate('set', self._oid, serialized)
 
     value = property(get, set)
 
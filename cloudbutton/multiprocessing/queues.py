@@ -10,12 +10,7 @@
 __all__ = ['Queue', 'SimpleQueue', 'JoinableQueue']
 
 import sys
-import os
-import threading
-import collections
 import time
-import weakref
-import errno
 
 from queue import Empty, Full
 
@@ -27,200 +22,7 @@ from . import synchronize
 from . import context
 _ForkingPickler = context.reduction.ForkingPickler
 
-from .util import debug, info, Finalize, register_after_fork, is_exiting
-
-#
-# Queue type using a pipe, buffer and thread
-#
-
-class Queue:
-
-    def __init__(self):
-        self._reader, self._writer = connection.Pipe(duplex=False)
-        self._opid = os.getpid()
-        
-        # For use by concurrent.futures
-        self._ignore_epipe = False
-
-        self._after_fork()
-
-    def __getstate__(self):
-        return (self._ignore_epipe,  self._reader, 
-                self._writer, self._opid, self._ref)
-
-    def __setstate__(self, state):
-        (self._ignore_epipe, self._reader,
-         self._writer, self._opid, self._ref) = state
-        self._after_fork()
-
-    def _after_fork(self):
-        debug('Queue._after_fork()')
-        self._notempty = threading.Condition(threading.Lock())
-        self._buffer = collections.deque()
-        self._thread = None
-        self._jointhread = None
-        self._joincancelled = False
-        self._closed = False
-        self._close = None
-        self._send_bytes = self._writer.send_bytes
-        self._recv_bytes = self._reader.recv_bytes
-        self._poll = self._reader.poll
-
-    def put(self, obj, block=True, timeout=None):
-        assert not self._closed
-
-        with self._notempty:
-            if self._thread is None:
-                self._start_thread()
-            self._buffer.append(obj)
-            self._notempty.notify()
-
-    def get(self, block=True, timeout=None):
-        if block and timeout is None:
-            res = self._recv_bytes()
-        else:
-            if block:
-                if not self._poll(timeout):
-                    raise Empty
-            elif not self._poll():
-                raise Empty
-            res = self._recv_bytes()
-
-        return _ForkingPickler.loads(res)
-
-    def qsize(self):
-        return len(self._reader)
-
-    def empty(self):
-        return not self._poll()
-
-    def full(self):
-        return False
-
-    def get_nowait(self):
-        return self.get(False)
-
-    def put_nowait(self, obj):
-        return self.put(obj, False)
-
-    def close(self):
-        self._closed = True
-        try:
-            self._reader.close()
-        finally:
-            close = self._close
-            if close:
-                self._close = None
-                close()
-
-    def join_thread(self):
-        debug('Queue.join_thread()')
-        assert self._closed
-        if self._jointhread:
-            self._jointhread()
-
-    def cancel_join_thread(self):
-        debug('Queue.cancel_join_thread()')
-        self._joincancelled = True
-        try:
-            self._jointhread.cancel()
-        except AttributeError:
-            pass
-
-    def _start_thread(self):
-        debug('Queue._start_thread()')
-
-        # Start thread which transfers data from buffer to pipe
-        self._buffer.clear()
-        self._thread = threading.Thread(
-            target=type(self)._feed,
-            args=(self._buffer, self._notempty, self._send_bytes,
-                  self._writer.close, self._ignore_epipe),
-            name='QueueFeederThread'
-            )
-        self._thread.daemon = True
-
-        debug('doing self._thread.start()')
-        self._thread.start()
-        debug('... done self._thread.start()')
-
-        if not self._joincancelled:
-            self._jointhread = Finalize(
-                self._thread, type(self)._finalize_join,
-                [weakref.ref(self._thread)],
-                exitpriority=-5
-                )
-
-        # Send sentinel to the thread queue object when garbage collected
-        self._close = Finalize(
-            self, type(self)._finalize_close,
-            [self._buffer, self._notempty],
-            exitpriority=10
-            )
-
-    @staticmethod
-    def _finalize_join(twr):
-        debug('joining queue thread')
-        thread = twr()
-        if thread is not None:
-            thread.join()
-            debug('... queue thread joined')
-        else:
-            debug('... queue thread already dead')
-
-    @staticmethod
-    def _finalize_close(buffer, notempty):
-        debug('telling queue thread to quit')
-        with notempty:
-            buffer.append(_sentinel)
-            notempty.notify()
-
-    @staticmethod
-    def _feed(buffer, notempty, send_bytes, close, ignore_epipe):
-        debug('starting thread to feed data to pipe')
-        nacquire = notempty.acquire
-        nrelease = notempty.release
-        nwait = notempty.wait
-        bpopleft = buffer.popleft
-        sentinel = _sentinel
-
-        while 1:
-            try:
-                nacquire()
-                try:
-                    if not buffer:
-                        nwait()
-                finally:
-                    nrelease()
-                try:
-                    while 1:
-                        obj = bpopleft()
-                        if obj is sentinel:
-                            debug('feeder thread got sentinel -- exiting')
-                            close()
-                            return
-
-                        obj = _ForkingPickler.dumps(obj)
-                        send_bytes(obj)
-
-                except IndexError:
-                    pass
-            except Exception as e:
-                if ignore_epipe and getattr(e, 'errno', 0) == errno.EPIPE:
-                    return
-                # Since this runs in a daemon thread the resources it uses
-                # may be become unusable while the process is cleaning up.
-                # We ignore errors which happen after the process has
-                # started to cleanup.
-                if is_exiting():
-                    info('error in queue thread: %s', e)
-                    return
-                else:
-                    import traceback
-                    traceback.print_exc()
-
-_sentinel = object()
-
+from .util import register_after_fork
 
 #
 # Simplified Queue type
@@ -228,8 +30,11 @@ _sentinel = object()
 
 class SimpleQueue:
 
-    def __init__(self):
-        self._reader, self._writer = connection.Pipe(duplex=False)
+    def __init__(self, reliable=False):
+        # A reliable queue keeps each object until the process that
+        # got it acknowledges it, or gives it to another process
+        conn_type = connection.REDIS_STREAM_CONN if reliable else connection.REDIS_LIST_CONN
+        self._reader, self._writer = connection.Pipe(duplex=False, conn_type=conn_type)
         self._closed = False
         self._ref = util.RemoteReference(
             referenced=[self._reader._handle, self._reader._subhandle],
@@ -244,9 +49,14 @@ class SimpleQueue:
         self._writer.send_bytes(obj)
 
     def get(self):
+        self._ack()
         res = self._reader.recv_bytes()
         return _ForkingPickler.loads(res)
 
+    def _ack(self):
+        # The objects got before are done once the next ones are requested
+        self._reader.ack()
+
     def qsize(self):
         return len(self._reader)
 
@@ -268,25 +78,92 @@ class SimpleQueue:
             self._closed = True
 
 
-Queue = SimpleQueue
+#
+# Queue type with a maximum size, timeouts and batched operations
+#
+
+class Queue(SimpleQueue):
+
+    def __init__(self, maxsize=0, reliable=False):
+        super().__init__(reliable)
+        self._maxsize = maxsize
+        # Free slots of a bounded queue
+        self._slots = synchronize.BoundedSemaphore(maxsize) if maxsize > 0 else None
+
+    def put(self, obj, block=True, timeout=None):
+        self.put_many([obj], block, timeout)
+
+    def put_many(self, objs, block=True, timeout=None):
+        '''
+        Put several objects into the queue in a single request. In a
+        bounded queue, either all the objects are put or none of them,
+        and there can not be more objects than its maxsize.
+        '''
+        assert not self._closed
+        objs = [_ForkingPickler.dumps(obj) for obj in objs]
+        self._acquire_slots(len(objs), block, timeout)
+        self._writer.send_bytes_many(objs)
+
+    def _acquire_slots(self, n, block, timeout):
+        if self._slots is None or n == 0:
+            return
+        if n > self._maxsize:
+            raise ValueError('cannot put {} objects into a queue of maxsize {}'
+                             .format(n, self._maxsize))
+        if not self._slots._acquire_many(n, block, timeout):
+            raise Full
+
+    def get(self, block=True, timeout=None):
+        return self.get_many(1, block, timeout)[0]
+
+    def get_many(self, maxitems, block=True, timeout=None):
+        '''
+        Remove and return up to maxitems objects from the queue in a
+        single request, waiting for the first one if block is True.
+        '''
+        self._ack()
+        res = self._reader.recv_bytes_many(maxitems, block, timeout)
+        if len(res) == 0:
+            raise Empty
+        if self._slots is not None:
+            self._slots.release(len(res))
+        return [_ForkingPickler.loads(obj) for obj in res]
+
+    def full(self):
+        return self._maxsize > 0 and self.qsize() >= self._maxsize
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def put_nowait(self, obj):
+        return self.put(obj, False)
 
 #
 # A queue type which also supports join() and task_done() methods
 #
 
-class JoinableQueue(SimpleQueue):
+class JoinableQueue(Queue):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, maxsize=0, reliable=False):
+        super().__init__(maxsize, reliable)
         self._unfinished_tasks = synchronize.Semaphore(0)
         self._cond = synchronize.Condition()
 
-    def put(self, obj):
+    def put_many(self, objs, block=True, timeout=None):
+        assert not self._closed
+        objs = [_ForkingPickler.dumps(obj) for obj in objs]
+        # Waiting for free slots must not hold the condition
+        self._acquire_slots(len(objs), block, timeout)
         with self._cond:
-            super().put(obj)
-            self._unfinished_tasks.release()
+            self._writer.send_bytes_many(objs)
+            self._unfinished_tasks.release(len(objs))
+
+    def _ack(self):
+        # Objects are acknowledged by task_done()
+        pass
 
     def task_done(self):
+        self._reader.ack(1)
         with self._cond:
             if not self._unfinished_tasks.acquire(False):
                 raise ValueError('task_done() called too many times')
@@ -31,16 +31,31 @@ class SemLock:
 
     # KEYS[1] - semlock name
     # ARGV[1] - max value
+    # ARGV[2] - increment
     # return new semlock value
-    # only increments its value if
-    # it is not above the max value
+    # only increments its value up
+    # to the max value
     LUA_RELEASE_SCRIPT = """
         local current_value = tonumber(redis.call('llen', KEYS[1]))
-        if current_value >= tonumber(ARGV[1]) then
-            return current_value
+        local n = math.min(tonumber(ARGV[2]), tonumber(ARGV[1]) - current_value)
+        for i=1,n do
+            redis.call('rpush', KEYS[1], '')
         end
-        redis.call('rpush', KEYS[1], '')
-        return current_value + 1
+        return current_value + math.max(n, 0)
+    """
+
+    # KEYS[1] - semlock name
+    # ARGV[1] - decrement
+    # return 1 if the value has been decremented,
+    # which happens only if it is not lower than
+    # the decrement
+    LUA_ACQUIRE_MANY_SCRIPT = """
+        local n = tonumber(ARGV[1])
+        if tonumber(redis.call('llen', KEYS[1])) < n then
+            return 0
+        end
+        redis.call('ltrim', KEYS[1], n, -1)
+        return 1
     """
 
     def __init__(self, value=1, max_value=1):
@@ -52,16 +67,18 @@ class SemLock:
 
         self._lua_release = self._client.register_script(Semaphore.LUA_RELEASE_SCRIPT)
         util.make_stateless_script(self._lua_release)
+        self._lua_acquire_many = self._client.register_script(SemLock.LUA_ACQUIRE_MANY_SCRIPT)
+        util.make_stateless_script(self._lua_acquire_many)
 
         self._ref = util.RemoteReference(self._name, client=self._client)
 
     def __getstate__(self):
         return (self._name, self._max_value, self._client,
-            self._lua_release, self._ref)
+            self._lua_release, self._lua_acquire_many, self._ref)
 
     def __setstate__(self, state):
         (self._name, self._max_value, self._client,
-            self._lua_release, self._ref) = state
+            self._lua_release, self._lua_acquire_many, self._ref) = state
 
     def __enter__(self):
         self.acquire()
@@ -74,16 +91,34 @@ class SemLock:
         value = self._client.llen(self._name)
         return int(value)
 
-    def acquire(self, block=True):
-        if block:
-            self._client.blpop([self._name])
-            return True
+    def acquire(self, block=True, timeout=None):
+        if block and (timeout is None or timeout > 0):
+            res = self._client.blpop([self._name], util.blocking_timeout(timeout, self._client))
+            return res is not None
         else:
             return self._client.lpop(self._name) is not None
-        
-    def release(self):
+
+    def _acquire_many(self, n, block=True, timeout=None):
+        '''
+        Decrement the value by n at once, waiting until it is possible
+        if block is True. Nothing is held while waiting, so concurrent
+        callers can not deadlock each other.
+        '''
+        if n == 1:
+            return self.acquire(block, timeout)
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while True:
+            if self._lua_acquire_many(keys=[self._name], args=[n],
+                                      client=self._client):
+                return True
+            if not block or (timeout is not None and time.monotonic() >= deadline):
+                return False
+            time.sleep(0.1)
+
+    def release(self, n=1):
         self._lua_release(keys=[self._name],
-                          args=[self._max_value],
+                          args=[self._max_value, n],
                           client=self._client)
 
     def __repr__(self):
@@ -126,9 +161,9 @@ class Lock(SemLock):
         super().__setstate__(state)
         self.owned = False
 
-    def acquire(self, block=True):
-        res = super().acquire(block)
-        self.owned = True
+    def acquire(self, block=True, timeout=None):
+        res = super().acquire(block, timeout)
+        self.owned = self.owned or res
         return res
 
     def release(self):
@@ -141,8 +176,8 @@ class Lock(SemLock):
 
 class RLock(Lock):
 
-    def acquire(self, block=True):
-        return self.owned or super().acquire(block)
+    def acquire(self, block=True, timeout=None):
+        return self.owned or super().acquire(block, timeout)
 
 
 #
@@ -279,6 +314,32 @@ class Event:
 
 class Barrier(threading.Barrier):
 
+    # KEYS[1] - barrier state
+    # KEYS[2] - barrier count
+    # return {state, index}, the caller only
+    # enters the barrier if it is filling
+    LUA_ENTER_SCRIPT = """
+        local state = tonumber(redis.call('get', KEYS[1]))
+        if state ~= 0 then
+            return {state, -1}
+        end
+        return {state, redis.call('incr', KEYS[2]) - 1}
+    """
+
+    # KEYS[1] - barrier state
+    # KEYS[2] - barrier count
+    # return 1 if the last process left a draining or
+    # resetting barrier, which is filling again
+    LUA_EXIT_SCRIPT = """
+        local count = redis.call('decr', KEYS[2])
+        local state = tonumber(redis.call('get', KEYS[1]))
+        if count == 0 and (state == -1 or state == 1) then
+            redis.call('set', KEYS[1], 0)
+            return 1
+        end
+        return 0
+    """
+
     def __init__(self, parties, action=None, timeout=None):
         self._cond = Condition()
         self._client = self._cond._client
@@ -294,6 +355,43 @@ class Barrier(threading.Barrier):
         self._state = 0 #0 filling, 1, draining, -1 resetting, -2 broken
         self._count = 0
 
+        self._lua_enter = self._client.register_script(Barrier.LUA_ENTER_SCRIPT)
+        util.make_stateless_script(self._lua_enter)
+        self._lua_exit = self._client.register_script(Barrier.LUA_EXIT_SCRIPT)
+        util.make_stateless_script(self._lua_exit)
+
+    def wait(self, timeout=None):
+        if timeout is None:
+            timeout = self._timeout
+        with self._cond:
+            index = self._enter()
+            try:
+                # We release the barrier if we are the last one
+                if index + 1 == self._parties:
+                    self._release()
+                else:
+                    self._wait(timeout)
+                return index
+            finally:
+                self._exit()
+
+    def _enter(self):
+        state, index = self._lua_enter(keys=[self._state_handle, self._count_handle],
+                                       client=self._client)
+        while state in (-1, 1):
+            # It is draining or resetting, wait until done
+            self._cond.wait()
+            state, index = self._lua_enter(keys=[self._state_handle, self._count_handle],
+                                           client=self._client)
+        if state < 0:
+            raise threading.BrokenBarrierError
+        return index
+
+    def _exit(self):
+        if self._lua_exit(keys=[self._state_handle, self._count_handle],
+                          client=self._client):
+            self._cond.notify_all()
+
     @property
     def _state(self):
         return int(self._client.get(self._state_handle))
@@ -9,6 +9,7 @@
 
 import os
 import itertools
+import math
 import sys
 import weakref
 import atexit
@@ -421,6 +422,35 @@ def spawnv_passfds(path, args, passfds):
         os.close(errpipe_write)
 
 
+#
+# Redis connection pools shared by all the clients of this process
+#
+
+_redis_pools = {}
+_redis_pools_lock = threading.Lock()
+
+
+def get_redis_pool(*args, **kwargs):
+    """
+    Returns the connection pool of the given connection parameters, shared
+    by all the redis clients of this process. If max_connections is set,
+    clients wait for a free connection instead of failing when all of them
+    are in use.
+    """
+    pool_key = repr((args, sorted(kwargs.items())))
+    with _redis_pools_lock:
+        if pool_key not in _redis_pools:
+            # Let redis translate the parameters into the pool arguments
+            pool = redis.StrictRedis(*args, **kwargs).connection_pool
+            if kwargs.get('max_connections'):
+                pool = redis.BlockingConnectionPool(max_connections=kwargs['max_connections'],
+                                                    timeout=None,
+                                                    connection_class=pool.connection_class,
+                                                    **pool.connection_kwargs)
+            _redis_pools[pool_key] = pool
+        return _redis_pools[pool_key]
+
+
 #
 # Picklable redis client
 #
@@ -429,7 +459,7 @@ class PicklableRedis(redis.StrictRedis):
     def __init__(self, *args, **kwargs):
         self._args = args
         self._kwargs = kwargs
-        super().__init__(*self._args, **self._kwargs)
+        super().__init__(connection_pool=get_redis_pool(*self._args, **self._kwargs))
 
     def __getstate__(self):
         return (self._args, self._kwargs)
@@ -446,6 +476,22 @@ def get_redis_client(**overwrites):
     return PicklableRedis(**conn_params)
 
 
+#
+# Object storage client of this process, for the data
+# too large for redis. Created on first use
+#
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        from cloudbutton.cloud_proxy import CloudStorage
+        _storage = CloudStorage()
+    return _storage
+
+
 #
 # Unique id for redis keys/hashes
 #
@@ -454,6 +500,35 @@ def get_uuid(length=12):
     return uuid.uuid1().hex[:length]
 
 
+#
+# Timeout of the blocking redis commands (BLPOP, ...), which wait
+# forever with 0 and only take whole seconds before redis 6, so
+# fractional timeouts are rounded up to the next second on older
+# servers. The version of every server is asked once per process
+#
+
+_float_timeouts = {}
+_float_timeouts_lock = threading.Lock()
+
+
+def blocking_timeout(timeout, client):
+    if timeout is None:
+        return 0
+    pool_kwargs = client.connection_pool.connection_kwargs
+    server = (pool_kwargs.get('host'), pool_kwargs.get('port'), pool_kwargs.get('path'))
+    with _float_timeouts_lock:
+        if server not in _float_timeouts:
+            try:
+                version = client.info('server')['redis_version']
+                _float_timeouts[server] = int(version.split('.')[0]) >= 6
+            except redis.exceptions.ResponseError:
+                # INFO may be disabled, assume an old server
+                _float_timeouts[server] = False
+    if _float_timeouts[server]:
+        return timeout
+    return max(1, math.ceil(timeout))
+
+
 #
 # Make stateless redis Lua script (redis.client.Script)
 # Just to ensure no redis client is cache'd and avoid 
@@ -140,6 +140,18 @@ class TestMethods:
                     counter[word] += 1
         return counter
 
+    @staticmethod
+    def my_map_function_obj_pack(obj, id):
+        counter = {}
+        for cloudobject in obj:
+            for word, count in TestMethods.my_map_function_obj(cloudobject, id).items():
+                counter[word] = counter.get(word, 0) + count
+        return counter
+
+    @staticmethod
+    def my_map_function_parquet(obj):
+        return sum(obj.table.column('x').to_pylist())
+
     @staticmethod
     def my_map_function_url(url):
         print('I am processing the object from {}'.format(url.path))
@@ -354,6 +366,79 @@ class TestPywren(unittest.TestCase):
         result = ex.get_result()
         self.assertEqual(result, self.__class__.cos_result_to_compare)
 
+    def test_storage_bulk(self):
+        print('Testing bulk storage operations...')
+        internal_storage = InternalStorage(STORAGE_CONFIG)
+        prefix = PREFIX + '-bulk/'
+        items = {prefix + str(i).zfill(4): str(i).encode() for i in range(100)}
+        internal_storage.put_objects(items)
+        keys = sorted(items) + [prefix + 'missing']
+        self.assertEqual(internal_storage.get_objects(keys), [items[key] for key in sorted(items)] + [None])
+        self.assertEqual(internal_storage.head_objects([prefix + 'missing']), [None])
+        self.assertEqual(internal_storage.delete_prefixes([prefix]), 100)
+
+    def test_storage_cache(self):
+        print('Testing the storage cache...')
+        internal_storage = InternalStorage(dict(STORAGE_CONFIG, cache={'memory_size': 1024 ** 2}))
+        key = PREFIX + '-cache/func'
+        internal_storage.put_func(key, b'func')
+        self.assertEqual(internal_storage.get_func(key), b'func')
+        self.assertEqual(internal_storage.get_func(key), b'func')
+        self.assertEqual(internal_storage.get_cache_stats()['hits'], 1)
+        # The cache is shared by the instances with the same configuration
+        other_storage = InternalStorage(dict(STORAGE_CONFIG, cache={'memory_size': 1024 ** 2}))
+        self.assertEqual(other_storage.get_func(key), b'func')
+        self.assertEqual(other_storage.get_cache_stats()['hits'], 2)
+        internal_storage.delete_cobject(key=key)
+
+    def test_map_reduce_obj_bucket_packed(self):
+        print('Testing map_reduce() over a bucket with packed objects...')
+        sb = STORAGE_CONFIG['backend']
+        data_prefix = sb + '://' + STORAGE_CONFIG['bucket'] + '/' + PREFIX + '/'
+        ex = FunctionExecutor(config=CONFIG)
+        futures = ex.map_reduce(TestMethods.my_map_function_obj_pack, data_prefix, TestMethods.my_reduce_function,
+                                min_partition_bytes=64 * 1024 ** 2)
+        result = ex.get_result(futures)
+        self.assertEqual(result, self.__class__.cos_result_to_compare)
+        self.assertEqual(len(futures), 2)
+
+        ex = FunctionExecutor(config=CONFIG)
+        futures = ex.map_reduce(TestMethods.my_map_function_obj_pack, data_prefix, TestMethods.my_reduce_function,
+                                min_partition_bytes=64 * 1024 ** 2, reducer_one_per_object=True)
+        result = ex.get_result(futures)
+        self.assertEqual(result, [self.__class__.cos_result_to_compare] * 5)
+        self.assertEqual(len(futures), 6)
+
+    def test_map_reduce_parquet_row_groups(self):
+        print('Testing map_reduce() over the row groups of a Parquet object...')
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from cloudbutton.engine.job.partitioner import ParquetRowGroups
+
+        buf = pa.BufferOutputStream()
+        pq.write_table(pa.table({'x': list(range(1000)), 'y': [str(i) for i in range(1000)]}),
+                       buf, row_group_size=100)
+        key = PREFIX + '-parquet/data.parquet'
+        STORAGE.put_object(bucket_name=STORAGE_CONFIG['bucket'], key=key,
+                           data=buf.getvalue().to_pybytes())
+        data = STORAGE_CONFIG['backend'] + '://' + STORAGE_CONFIG['bucket'] + '/' + key
+        record_format = ParquetRowGroups(columns=['x'], filters=[('x', '>=', 250)])
+
+        ex = FunctionExecutor(config=CONFIG)
+        futures = ex.map_reduce(TestMethods.my_map_function_parquet, data, TestMethods.simple_reduce_function,
+                                record_format=record_format)
+        result = ex.get_result(futures)
+        self.assertEqual(result, sum(range(250, 1000)))
+        self.assertEqual(len(futures), 2)
+
+        ex = FunctionExecutor(config=CONFIG)
+        futures = ex.map_reduce(TestMethods.my_map_function_parquet, data, TestMethods.simple_reduce_function,
+                                record_format=record_format, chunk_n=2)
+        result = ex.get_result(futures)
+        self.assertEqual(result, sum(range(250, 1000)))
+        self.assertEqual(len(futures), 3)
+        STORAGE.delete_object(bucket_name=STORAGE_CONFIG['bucket'], key=key)
+
     def test_chunks_bucket(self):
         print('Testing chunks on a bucket...')
         sb = STORAGE_CONFIG['backend']
@@ -372,6 +457,17 @@ class TestPywren(unittest.TestCase):
         self.assertEqual(result, self.__class__.cos_result_to_compare)
         self.assertEqual(len(futures), 11)
 
+    def test_chunks_bucket_record_format(self):
+        print('Testing chunks on a bucket with exact record boundaries...')
+        sb = STORAGE_CONFIG['backend']
+        data_prefix = sb + '://' + STORAGE_CONFIG['bucket'] + '/' + PREFIX + '/'
+
+        ex = FunctionExecutor(config=CONFIG)
+        futures = ex.map_reduce(TestMethods.my_map_function_obj, data_prefix, TestMethods.my_reduce_function,
+                                chunk_size=1 * 1024 ** 2, record_format=b'\n')
+        result = ex.get_result(futures)
+        self.assertEqual(result, self.__class__.cos_result_to_compare)
+
     def test_chunks_bucket_one_reducer_per_object(self):
         print('Testing chunks on a bucket with one reducer per object...')
         sb = STORAGE_CONFIG['backend']
@@ -400,6 +496,22 @@ class TestPywren(unittest.TestCase):
             result = ex.get_result()
             self.assertEqual(result, self.__class__.cos_result_to_compare)
 
+    def test_sort(self):
+        print('Testing sort()...')
+        sb = STORAGE_CONFIG['backend']
+        data_prefix = sb + '://' + STORAGE_CONFIG['bucket'] + '/' + PREFIX + '/'
+        ex = FunctionExecutor(config=CONFIG)
+        futures = ex.sort(data_prefix, num_partitions=3)
+        cloudobjects = ex.get_result(futures)
+        self.assertEqual(len(cloudobjects), 3)
+
+        records = []
+        for cloudobject in cloudobjects:
+            records.extend(STORAGE.get_object(cloudobject.bucket, cloudobject.key).split())
+            STORAGE.delete_object(cloudobject.bucket, cloudobject.key)
+        self.assertEqual(records, sorted(records))
+        self.assertEqual(len(records), self.__class__.cos_result_to_compare)
+
 
 def print_help():
     print("Available test functions:")